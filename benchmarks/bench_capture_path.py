@@ -0,0 +1,378 @@
+"""
+Throughput of the hot paths, from the data packets to the L1 coordinates, on synthetic HALO data.
+
+Capture (per data packet): RawFrameData parse, `unpack_raw_frame_spokes`, `process_data` (with the writer
+thread) and `_write_raw_frame_data`. Processing (per spoke, on .raw files written by the RadarDataWriter), along
+the L0 path of `_radar_processing_L0`: `load_raw_file`, `iter_raw_frames`, `assemble_rotations`, `L0ScanWriter`
+and the whole `radar_processing_L0`, then `integrate_scan` and `compute_lonlat_coordinates` on the L0 file.
+
+Each benchmark runs in its own (forked) process. The time is the best of `--repeat` runs, the setup is not timed.
+The run RSS is the peak memory of the runs above the memory before them (setup and the forked parent memory
+excluded), and the process peak RSS includes them. Results are printed and saved as JSON with the machine description,
+to compare releases and hardware (Pi vs workstation):
+
+    python benchmarks/bench_capture_path.py --rotations 8 --output results.json
+    python benchmarks/bench_capture_path.py --only process_data assemble_rotations
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import resource
+import tempfile
+import subprocess
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import xarray as xr
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from piradar.navico.navico_structure import RawFrameData, unpack_raw_frame_spokes
+from piradar.navico.navico_controller import (
+    NavicoRadarController,
+    MulticastInterfaces,
+    MulticastAddress,
+    NavicoRadarType,
+    RadarDataWriter,
+    FrameData,
+)
+from piradar.navico.navico_simulator import synthetic_data_packets, SPOKES_PER_ROTATION, SPOKES_PER_PACKET
+from tools.unpack_utils import RawSweepFile, load_raw_file, FRAME_SIZE
+from tools.processing_L0 import (
+    _radar_processing_L0,
+    make_L0_path,
+    iter_raw_frames,
+    assemble_rotations,
+    L0ScanWriter,
+)
+from tools.processing_L1 import integrate_scan, sort_by_azimuth, add_radius_coords, compute_lonlat_coordinates
+from tools import grid_utils
+
+PACKETS_PER_ROTATION = SPOKES_PER_ROTATION // SPOKES_PER_PACKET
+LOST_PACKET_INTERVAL = 100  # 1 packet out of LOST_PACKET_INTERVAL is lost, to exercise the missing spokes fill.
+RANGE = 1000  # meters
+LAT, LON, HEADING = 48.5, -68.5, 15
+STATION = "bench"
+
+
+def make_packets(n_rotations: int) -> list[bytes]:
+    return [packet.tobytes() for packet in synthetic_data_packets(n_rotations=n_rotations, _range=RANGE)]
+
+
+def make_frames(packets: list[bytes]) -> list[FrameData]:
+    """FrameData as made by `process_data`."""
+    frames = []
+    for packet in packets:
+        spokes = unpack_raw_frame_spokes(packet)
+        frames.append(FrameData(
+            time=int(time.time()),
+            number_of_spokes=spokes.size,
+            gain=50,
+            _range=RANGE,
+            heading=0,
+            spokes=spokes,
+        ))
+    return frames
+
+
+def write_raw_files(frames: list[FrameData], output_dir: Path) -> list[str]:
+    """One .raw file per rotation (as sector recordings), with some packets lost."""
+    data_writer = RadarDataWriter()
+    paths = []
+    for i, frame in enumerate(frames):
+        if i % LOST_PACKET_INTERVAL == LOST_PACKET_INTERVAL // 2:
+            continue
+        path = output_dir.joinpath(f"20250101T000000_s{i // PACKETS_PER_ROTATION + 1:02d}.raw")
+        data_writer._write_raw_frame_data(output_file=path, sector_data=frame)
+        if str(path) not in paths:
+            paths.append(str(path))
+    data_writer._close_raw_file()
+    return paths
+
+
+def make_controller(output_dir: Path, data_writer: RadarDataWriter) -> NavicoRadarController:
+    address = MulticastAddress("0.0.0.0", 0)
+    controller = NavicoRadarController(
+        multicast_interfaces=MulticastInterfaces(data=address, send=address, report=address, interface="0.0.0.0"),
+        report_output_dir=output_dir,
+        connect_timeout=0,
+        auto_connect=False,
+        data_writer=data_writer,
+    )
+    controller.reports.system.radar_type = NavicoRadarType.navicoHALO
+    controller.reports.setting.gain = 50
+    return controller
+
+
+def processing_L0(raw_files: list[str], out_path: Path) -> Path:
+    _, _, L0_path = _radar_processing_L0(
+        raw_files, out_path=out_path, station=STATION, heading=HEADING, lat=LAT, lon=LON, time_offset=0
+    )
+    return L0_path
+
+
+def write_L0(rotations: list[dict], path: Path):
+    """As `_radar_processing_L0`: the first rotation is only used for the coordinates."""
+    writer = L0ScanWriter(path=path, ts="20250101T000000", heading=HEADING, lat=LAT, lon=LON)
+    writer.accumulate(rotations[0])
+    with writer:
+        for rotation in rotations[1:]:
+            writer.append(rotation)
+
+
+def make_volume(raw_files: list[str], tmp_dir: Path) -> xr.Dataset:
+    """L0 dataset of the raw files."""
+    return xr.load_dataset(processing_L0(raw_files, tmp_dir), engine="h5netcdf")
+
+
+# Each benchmark: setup(n_rotations, tmp_dir) -> (run, n_items, n_bytes). `run()` is timed.
+
+def bench_raw_frame_data_parse(n_rotations: int, tmp_dir: Path):
+    packets = make_packets(n_rotations)
+    return lambda: [RawFrameData(packet) for packet in packets], len(packets), sum(map(len, packets))
+
+
+def bench_unpack_raw_frame_spokes(n_rotations: int, tmp_dir: Path):
+    packets = make_packets(n_rotations)
+    return lambda: [unpack_raw_frame_spokes(packet) for packet in packets], len(packets), sum(map(len, packets))
+
+
+def bench_process_data(n_rotations: int, tmp_dir: Path):
+    packets = make_packets(n_rotations)
+
+    def run():
+        data_writer = RadarDataWriter()
+        data_writer.start_thread()
+        controller = make_controller(tmp_dir, data_writer)
+        controller.data_recorder.start_sector_recording(
+            output_file=tmp_dir.joinpath("process_data"), number_of_sector_to_record=10 ** 6
+        )
+        for packet in packets:
+            controller.receive_stats.update(packet)
+            controller.process_data(in_data=packet)
+        data_writer.close_raw_file(stream=controller)
+        data_writer.stop()
+        data_writer.writer_thread.join()
+
+    return run, len(packets), sum(map(len, packets))
+
+
+def bench_write_raw_frame_data(n_rotations: int, tmp_dir: Path):
+    frames = make_frames(make_packets(n_rotations))
+    path = tmp_dir.joinpath("write_raw_frame_data")
+
+    def run():
+        path.with_suffix(".raw").unlink(missing_ok=True)
+        data_writer = RadarDataWriter()
+        for frame in frames:
+            data_writer._write_raw_frame_data(output_file=path, sector_data=frame)
+        data_writer._close_raw_file()
+
+    return run, len(frames), sum(frame.spokes.nbytes for frame in frames)
+
+
+def _raw_files_setup(n_rotations: int, tmp_dir: Path):
+    """.raw files, their number of spokes and bytes."""
+    raw_files = write_raw_files(make_frames(make_packets(n_rotations)), tmp_dir)
+    n_bytes = sum(os.path.getsize(raw_file) for raw_file in raw_files)
+    return raw_files, n_bytes // FRAME_SIZE * SPOKES_PER_PACKET, n_bytes
+
+
+def bench_load_raw_file(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    run = lambda: [load_raw_file(raw_file, is4bits=False) for raw_file in raw_files]
+    return run, n_spokes, n_bytes
+
+
+def bench_iter_raw_frames(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    return lambda: sum(1 for _ in iter_raw_frames(raw_files)), n_spokes, n_bytes
+
+
+def bench_assemble_rotations(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    frames = []
+    for raw_file in raw_files:
+        with RawSweepFile(raw_file) as sweep:
+            frames.append(sweep.frames.copy())
+    frames = np.concatenate(frames)  # iterated like `iter_raw_frames`, without the file reads.
+    return lambda: list(assemble_rotations(frames)), n_spokes, n_bytes
+
+
+def bench_L0_scan_writer(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    rotations = list(assemble_rotations(iter_raw_frames(raw_files)))
+    path = tmp_dir.joinpath("L0_scan_writer.nc")
+
+    def run():
+        path.unlink(missing_ok=True)
+        write_L0(rotations, path)
+
+    return run, n_spokes, n_bytes
+
+
+def bench_radar_processing_L0(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    L0_path = make_L0_path(tmp_dir, STATION, raw_files)
+
+    def run():
+        L0_path.unlink(missing_ok=True)
+        processing_L0(raw_files, tmp_dir)
+
+    return run, n_spokes, n_bytes
+
+
+def bench_integrate_scan(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    dataset = make_volume(raw_files, tmp_dir)
+    return lambda: integrate_scan(dataset), n_spokes, n_bytes
+
+
+def bench_compute_lonlat_coordinates(n_rotations: int, tmp_dir: Path):
+    raw_files, n_spokes, n_bytes = _raw_files_setup(n_rotations, tmp_dir)
+    dataset = add_radius_coords(sort_by_azimuth(integrate_scan(make_volume(raw_files, tmp_dir))))
+
+    def run():
+        grid_utils._grids.clear()  # each repeat computes the grid, not only the first one.
+        return compute_lonlat_coordinates(dataset.copy())
+
+    return run, dataset.sizes['azimuth'], dataset.nbytes
+
+
+BENCHMARKS = {
+    "raw_frame_data_parse": (bench_raw_frame_data_parse, "packets"),
+    "unpack_raw_frame_spokes": (bench_unpack_raw_frame_spokes, "packets"),
+    "process_data": (bench_process_data, "packets"),
+    "write_raw_frame_data": (bench_write_raw_frame_data, "packets"),
+    "load_raw_file": (bench_load_raw_file, "spokes"),
+    "iter_raw_frames": (bench_iter_raw_frames, "spokes"),
+    "assemble_rotations": (bench_assemble_rotations, "spokes"),
+    "L0_scan_writer": (bench_L0_scan_writer, "spokes"),
+    "radar_processing_L0": (bench_radar_processing_L0, "spokes"),
+    "integrate_scan": (bench_integrate_scan, "spokes"),
+    "compute_lonlat_coordinates": (bench_compute_lonlat_coordinates, "azimuths"),
+}
+
+
+def _proc_status_bytes(field: str) -> int | None:
+    """`VmRSS` or `VmHWM` (peak) of /proc/self/status in bytes, None if not available (not Linux)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def process_peak_rss() -> int:
+    """Bytes (ru_maxrss is in kilobytes on Linux), since the process started (forked parent memory included)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def peak_rss() -> int:
+    """Bytes, since the last `reset_peak_rss`."""
+    peak = _proc_status_bytes("VmHWM")
+    return peak if peak is not None else process_peak_rss()
+
+
+def current_rss() -> int:
+    """Bytes. The peak RSS if the current one is not available."""
+    rss = _proc_status_bytes("VmRSS")
+    return rss if rss is not None else peak_rss()
+
+
+def reset_peak_rss():
+    """The peak RSS is reset to the current RSS (Linux >= 4.0), so it only covers what follows."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def run_benchmark(name: str, n_rotations: int, repeat: int) -> dict:
+    """Runs in its own process."""
+    setup, unit = BENCHMARKS[name]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run, n_items, n_bytes = setup(n_rotations, Path(tmp_dir))
+
+        rss_0 = current_rss()
+        reset_peak_rss()
+        run_times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            run()
+            run_times.append(time.perf_counter() - t0)
+        run_peak_rss = max(peak_rss() - rss_0, 0)
+
+    best_time = min(run_times)
+    return {
+        "name": name,
+        "unit": unit,
+        "items": n_items,
+        "bytes": n_bytes,
+        "time": best_time,
+        "times": run_times,
+        "items_per_s": n_items / best_time,
+        "MB_per_s": n_bytes / best_time / 1e6,
+        "run_peak_rss_MB": run_peak_rss / 1e6,
+        "process_peak_rss_MB": process_peak_rss() / 1e6,
+    }
+
+
+def machine_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {
+        "date": datetime.datetime.now(datetime.UTC).isoformat(timespec="seconds"),
+        "commit": commit,
+        "hostname": platform.node(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="Capture path benchmarks")
+    parser.add_argument("--rotations", type=int, default=8, help="Synthetic rotations (2048 spokes each).")
+    parser.add_argument("--repeat", type=int, default=3, help="The best time of the repeats is reported.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--output", type=str, default=None, help="JSON results file.")
+    args = parser.parse_args()
+
+    print(f"{'benchmark':<28} {'items/s':>12} {'unit':>8} {'MB/s':>8} {'run RSS MB':>11} {'process peak RSS MB':>20}")
+    results = []
+    for name in args.only:
+        with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("fork")) as executor:
+            result = executor.submit(run_benchmark, name, args.rotations, args.repeat).result()
+        results.append(result)
+        print(
+            f"{result['name']:<28} {result['items_per_s']:>12.0f} {result['unit']:>8} {result['MB_per_s']:>8.1f} "
+            f"{result['run_peak_rss_MB']:>11.1f} {result['process_peak_rss_MB']:>20.1f}"
+        )
+
+    if args.output:
+        report = {"machine": machine_info(), "rotations": args.rotations, "repeat": args.repeat, "results": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Throughput of several radars recorded by a single process with a shared RadarDataWriter.
+
+Each simulated radar feeds synthetic HALO data packets to its own NavicoRadarController from its own thread
+(as the data threads do), and the frames of every radar are written by the shared writer thread. Reports the
+packets/s of the whole process and the packets per CPU second (throughput per core).
+
+    python benchmarks/bench_multi_radar.py --radars 1 2 4 --packets 2000
+"""
+import sys
+import time
+import struct
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from piradar.navico.navico_structure import RAW_SPOKE_DTYPE, RawFrameData
+from piradar.navico.navico_controller import (
+    NavicoRadarController,
+    MulticastInterfaces,
+    MulticastAddress,
+    RadarDataWriter,
+    WRITER_QUEUE_SIZE,
+)
+
+SPOKES_PER_PACKET = RawFrameData.number_of_spokes
+N_SPOKE_NUMBERS = 4096
+
+
+def make_data_packets(n_packets: int, seed: int = 0) -> list[bytes]:
+    """Synthetic HALO data packets (valid spokes, 1 km range) covering `n_packets * 32` consecutive spokes."""
+    rng = np.random.default_rng(seed)
+    packet_header = struct.pack("<5BBH", 0, 0, 0, 0, 0, SPOKES_PER_PACKET, RAW_SPOKE_DTYPE.itemsize)
+
+    packets = []
+    for i in range(n_packets):
+        spoke_number = (i * SPOKES_PER_PACKET + np.arange(SPOKES_PER_PACKET)) % N_SPOKE_NUMBERS
+        spokes = np.zeros(SPOKES_PER_PACKET, dtype=RAW_SPOKE_DTYPE)
+        spokes['header']['header_size'] = 24
+        spokes['header']['status'] = 0x02
+        spokes['header']['spoke_number'] = spoke_number
+        spokes['header']['angle'] = spoke_number
+        spokes['header']['large_range'] = 0x80
+        spokes['header']['small_range'] = 4000
+        spokes['data'] = rng.integers(0, 256, (SPOKES_PER_PACKET, 512), dtype=np.uint8)
+        packets.append(packet_header + spokes.tobytes())
+    return packets
+
+
+def make_controller(name: str, output_dir: Path, data_writer: RadarDataWriter) -> NavicoRadarController:
+    address = MulticastAddress("0.0.0.0", 0)
+    controller = NavicoRadarController(
+        multicast_interfaces=MulticastInterfaces(data=address, send=address, report=address, interface="0.0.0.0"),
+        report_output_dir=output_dir,
+        connect_timeout=0,
+        auto_connect=False,
+        data_writer=data_writer,
+    )
+    controller.reports.setting.gain = 0
+    controller.data_recorder.start_sector_recording(
+        output_file=output_dir.joinpath(name, "bench"), number_of_sector_to_record=10 ** 6
+    )
+    return controller
+
+
+def run(n_radars: int, packets: list[bytes]) -> dict:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_writer = RadarDataWriter(queue_size=WRITER_QUEUE_SIZE * n_radars)
+        data_writer.start_thread()
+
+        controllers = [make_controller(f"radar_{i}", Path(tmp_dir), data_writer) for i in range(n_radars)]
+
+        def feed(controller: NavicoRadarController):
+            for packet in packets:
+                controller.receive_stats.update(packet)
+                controller.process_data(in_data=packet)
+
+        threads = [threading.Thread(target=feed, args=(controller,)) for controller in controllers]
+
+        cpu_time_0, wall_time_0 = time.process_time(), time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        data_writer.stop()
+        data_writer.writer_thread.join()
+        cpu_time, wall_time = time.process_time() - cpu_time_0, time.perf_counter() - wall_time_0
+
+    n_packets = n_radars * len(packets)
+    return {
+        "radars": n_radars,
+        "packets": n_packets,
+        "wall_time": wall_time,
+        "cpu_time": cpu_time,
+        "packets_per_s": n_packets / wall_time,
+        "packets_per_cpu_s": n_packets / cpu_time,
+        "MB_per_s": data_writer.stats.bytes_written / wall_time / 1e6,
+        "max_queue_depth": data_writer.stats.max_queue_depth,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="Multi radar throughput benchmark")
+    parser.add_argument("--radars", type=int, nargs="+", default=[1, 2, 4], help="Number of radars to simulate.")
+    parser.add_argument("--packets", type=int, default=2000, help="Packets per radar.")
+    args = parser.parse_args()
+
+    packets = make_data_packets(args.packets)
+
+    print(f"{'radars':>6} {'packets/s':>10} {'packets/cpu s':>14} {'MB/s':>8} {'max queue':>10}")
+    for n_radars in args.radars:
+        result = run(n_radars, packets)
+        print(
+            f"{result['radars']:>6} {result['packets_per_s']:>10.0f} {result['packets_per_cpu_s']:>14.0f} "
+            f"{result['MB_per_s']:>8.1f} {result['max_queue_depth']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -144,6 +144,7 @@ cd "$PIRADAR_INSTALL_DIR"
 
 mkdir -p "$INSTALL_DIR/piradar"
 cp -r "$SCRIPT_DIR/piradar"    "$PIRADAR_INSTALL_DIR/piradar/"
+cp -r "$SCRIPT_DIR/tools"      "$PIRADAR_INSTALL_DIR/piradar/"
 cp    "$SCRIPT_DIR/setup.py"   "$PIRADAR_INSTALL_DIR/piradar/"
 cp    "$SCRIPT_DIR/requirements.txt" "$PIRADAR_INSTALL_DIR/piradar/"
 cp -r "$SCRIPT_DIR/installer"  "$PIRADAR_INSTALL_DIR/piradar/"
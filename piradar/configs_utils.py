@@ -1,6 +1,8 @@
 from pathlib import Path
 import configparser
 
+from piradar.network import DATA_RCVBUF_SIZE
+
 bool_map = {'True': True, 'False': False}
 
 
@@ -17,6 +19,29 @@ def load_configs(configs_dir):
     return {**navico_config, **network_config, **piradar_config}
 
 
+def parse_radar_settings(section) -> dict:
+    settings = dict(section)
+
+    settings['range'] = int(section['range'])
+    settings['antenna_height'] = float(section['antenna_height'])
+
+    settings['bearing'] = float(section['bearing'])
+
+    settings['gain'] = int(section['gain'])
+    settings['gain_auto'] = as_bool(section['gain_auto'])
+
+    settings['sea_clutter'] = int(section['sea_clutter'])
+    settings['sea_clutter_auto'] = as_bool(section['sea_clutter_auto'])
+
+    settings['rain_clutter'] = int(section['rain_clutter'])
+    settings['rain_clutter_auto'] = as_bool(section['rain_clutter_auto'])
+
+    settings['side_lobe_suppression'] = int(section['side_lobe_suppression'])
+    settings['side_lobe_suppression_auto'] = as_bool(section['side_lobe_suppression_auto'])
+
+    return settings
+
+
 def load_navico_config(config_path):
     config = configparser.ConfigParser()
 
@@ -24,22 +49,14 @@ def load_navico_config(config_path):
 
     fconfig = config._sections
 
-    fconfig['RADAR_SETTINGS']['range'] = int(config['RADAR_SETTINGS']['range'])
-    fconfig['RADAR_SETTINGS']['antenna_height'] = float(config['RADAR_SETTINGS']['antenna_height'])
-
-    fconfig['RADAR_SETTINGS']['bearing'] = float(config['RADAR_SETTINGS']['bearing'])
-
-    fconfig['RADAR_SETTINGS']['gain'] = int(config['RADAR_SETTINGS']['gain'])
-    fconfig['RADAR_SETTINGS']['gain_auto'] = as_bool(config['RADAR_SETTINGS']['gain_auto'])
+    radar_settings = dict(config['RADAR_SETTINGS'])
 
-    fconfig['RADAR_SETTINGS']['sea_clutter'] = int(config['RADAR_SETTINGS']['sea_clutter'])
-    fconfig['RADAR_SETTINGS']['sea_clutter_auto'] = as_bool(config['RADAR_SETTINGS']['sea_clutter_auto'])
+    # Optional [RADAR_SETTINGS_<group>] sections: settings of a radar group overriding [RADAR_SETTINGS].
+    for section in config.sections():
+        if section.startswith('RADAR_SETTINGS_'):
+            fconfig[section] = parse_radar_settings({**radar_settings, **dict(config[section])})
 
-    fconfig['RADAR_SETTINGS']['rain_clutter'] = int(config['RADAR_SETTINGS']['rain_clutter'])
-    fconfig['RADAR_SETTINGS']['rain_clutter_auto'] = as_bool(config['RADAR_SETTINGS']['rain_clutter_auto'])
-
-    fconfig['RADAR_SETTINGS']['side_lobe_suppression'] = int(config['RADAR_SETTINGS']['side_lobe_suppression'])
-    fconfig['RADAR_SETTINGS']['side_lobe_suppression_auto'] = as_bool(config['RADAR_SETTINGS']['side_lobe_suppression_auto'])
+    fconfig['RADAR_SETTINGS'] = parse_radar_settings(radar_settings)
 
     for i in range(4):
         fconfig[f'SECTOR_BLANKING_{i}']['enable'] = as_bool(config[f'SECTOR_BLANKING_{i}']['enable'])
@@ -60,6 +77,13 @@ def load_network_config(config_path):
     fconfig['NETWORK']['data_port'] = int(config['NETWORK']['data_port'])
     fconfig['NETWORK']['send_port'] = int(config['NETWORK']['send_port'])
 
+    # Optional, for config files made before this option existed.
+    fconfig['NETWORK']['data_rcvbuf_size'] = int(config['NETWORK'].get('data_rcvbuf_size', DATA_RCVBUF_SIZE))
+    fconfig['NETWORK']['data_batch_size'] = int(config['NETWORK'].get('data_batch_size', 1))
+    fconfig['NETWORK']['data_ring_size'] = int(config['NETWORK'].get('data_ring_size', 0))
+    fconfig['NETWORK']['data_capture_process'] = as_bool(config['NETWORK'].get('data_capture_process', 'False'))
+    fconfig['NETWORK']['radar_groups'] = config['NETWORK'].get('radar_groups', '').replace(',', ' ').split()
+
     return fconfig
 
 
@@ -76,6 +100,25 @@ def load_piradar_config(config_path):
     fconfig['SCAN']['scan_interval'] = int(config['SCAN']['scan_interval'])
     fconfig['SCAN']['scan_count'] = int(config['SCAN']['scan_count'])
 
+    if not config.has_section('L0_CONVERSION'):  # for config files made before this section existed.
+        fconfig['L0_CONVERSION'] = {'enable': 'False'}
+
+    fconfig['L0_CONVERSION']['enable'] = as_bool(fconfig['L0_CONVERSION']['enable'])
+    if fconfig['L0_CONVERSION']['enable']:
+        fconfig['L0_CONVERSION']['heading'] = float(config['L0_CONVERSION']['heading'])
+        fconfig['L0_CONVERSION']['lat'] = float(config['L0_CONVERSION']['lat'])
+        fconfig['L0_CONVERSION']['lon'] = float(config['L0_CONVERSION']['lon'])
+        fconfig['L0_CONVERSION']['cpu_budget'] = float(config['L0_CONVERSION']['cpu_budget'])
+
+    if not config.has_section('METRICS'):  # for config files made before this section existed.
+        fconfig['METRICS'] = {'enable': 'False'}
+
+    fconfig['METRICS']['enable'] = as_bool(fconfig['METRICS']['enable'])
+    if fconfig['METRICS']['enable']:
+        fconfig['METRICS']['path'] = fconfig['METRICS'].get('path') or None
+        fconfig['METRICS']['socket_path'] = fconfig['METRICS'].get('socket_path') or None
+        fconfig['METRICS']['interval'] = float(config['METRICS'].get('interval', 5))
+
     return fconfig
 
 
@@ -2,7 +2,14 @@ import time
 
 import lgpio
 
-GPIO_CLAIM = lgpio.gpiochip_open(0)
+GPIO_CLAIM = None  # opened on first use, see `claim_gpio`.
+
+
+def claim_gpio():
+    global GPIO_CLAIM
+    if GPIO_CLAIM is None:
+        GPIO_CLAIM = lgpio.gpiochip_open(0)
+    return GPIO_CLAIM
 
 
 class RaspIoSwitch:
@@ -10,7 +17,7 @@ class RaspIoSwitch:
         self.io_pin = io_pin
         self.is_up = False
 
-        lgpio.gpio_claim_output(GPIO_CLAIM, io_pin)
+        lgpio.gpio_claim_output(claim_gpio(), io_pin)
 
         self.off()
 
@@ -48,7 +55,10 @@ class RaspIoLED(RaspIoSwitch):
 
 
 def release_gpio():
-    lgpio.gpiochip_close(GPIO_CLAIM)
+    global GPIO_CLAIM
+    if GPIO_CLAIM is not None:
+        lgpio.gpiochip_close(GPIO_CLAIM)
+        GPIO_CLAIM = None
 
 
 class GPIOController:
@@ -128,4 +138,19 @@ class GPIOController:
         release_gpio() # maybe not be nescessary but hey.
 
 
-gpio_controller = GPIOController()
+class LazyGPIOController:
+    """
+    The GPIOController is only created (GPIO chip opened, pins claimed and switched off) on first use, so
+    importing this module (e.g. from a child process) doesn't touch the GPIO.
+    """
+
+    def __init__(self):
+        self._controller: GPIOController = None
+
+    def __getattr__(self, name):
+        if self._controller is None:
+            self._controller = GPIOController()
+        return getattr(self._controller, name)
+
+
+gpio_controller = LazyGPIOController()
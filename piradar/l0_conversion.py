@@ -0,0 +1,170 @@
+"""
+On-device L0 conversion.
+
+Finished raw scans are converted to L0 NetCDF by a background process while the radar is idle between scans.
+
+- The process runs at the lowest priority (nice 19) and its CPU usage is kept under a budget (fraction of one core)
+  by sleeping between rotations.
+- The conversion is paused while a scan is being recorded, so it never delays the scheduled scans.
+"""
+import os
+import signal
+import logging
+import time
+import multiprocessing as mp
+from pathlib import Path
+
+from tools.processing_L0 import _radar_processing_L0
+
+PAUSE_SLEEP = 0.5
+
+
+class CpuBudget:
+    """
+    Called between each rotation. Sleeps so that the CPU time used stays under `cpu_budget` (fraction of one core)
+    and blocks while `pause_event` is set.
+    """
+
+    def __init__(self, cpu_budget: float, pause_event: mp.Event):
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1)
+        self.pause_event = pause_event
+        self._cpu_time_0 = time.process_time()
+
+    def __call__(self, *args):
+        cpu_time = time.process_time() - self._cpu_time_0
+        time.sleep(cpu_time * (1 / self.cpu_budget - 1))
+
+        self.wait_for_idle()
+
+        self._cpu_time_0 = time.process_time()
+
+    def wait_for_idle(self):
+        while self.pause_event.is_set():
+            time.sleep(PAUSE_SLEEP)
+
+
+class L0Converter:
+    def __init__(
+            self,
+            output_dir: str,
+            station: str,
+            heading: float,
+            lat: float,
+            lon: float,
+            cpu_budget: float = 0.5,
+            niceness: int = 19,
+    ):
+        """
+
+        Parameters
+        ----------
+        output_dir:
+            L0 files are written to `output_dir/station/YYYY-MM-DD/`
+        cpu_budget:
+            Fraction of one core the conversion can use.
+        niceness:
+            Added to the process niceness.
+        """
+        self.output_dir = output_dir
+        self.station = station
+        self.heading = heading
+        self.lat = lat
+        self.lon = lon
+        self.cpu_budget = cpu_budget
+        self.niceness = niceness
+
+        # Fork is used so that the (main) scheduled_scan script is not re-imported by the child process.
+        # The process must be started before any other thread is.
+        self._mp_context = mp.get_context("fork")
+        self.jobs = self._mp_context.Queue()
+        self.is_scanning = self._mp_context.Event()
+        self.process = None
+
+    def start(self):
+        self.process = self._mp_context.Process(
+            name="L0",
+            target=l0_conversion_loop,
+            args=(
+                self.jobs,
+                self.is_scanning,
+                self.output_dir,
+                self.heading,
+                self.lat,
+                self.lon,
+                self.cpu_budget,
+                self.niceness,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        logging.debug("L0 conversion process started")
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.jobs.put(None)
+        self.process.join()
+        self.process = None
+
+    def pause(self):
+        """Call when a scan starts."""
+        self.is_scanning.set()
+
+    def resume(self):
+        """Call when a scan is done."""
+        self.is_scanning.clear()
+
+    def submit(self, raw_files: list[str], station: str = None):
+        """
+        The raw files must be complete: submit them once the writer has closed them.
+
+        `station` overrides the converter station (e.g. one per radar group).
+        """
+        if not raw_files:
+            return
+        self.jobs.put((station or self.station, [str(raw_file) for raw_file in sorted(raw_files)]))
+
+
+def l0_conversion_loop(
+        jobs: mp.Queue,
+        is_scanning: mp.Event,
+        output_dir: str,
+        heading: float,
+        lat: float,
+        lon: float,
+        cpu_budget: float,
+        niceness: int,
+):
+    # The parent handles the termination and the cleanup (gpio).
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    os.nice(niceness)
+
+    cpu_budget = CpuBudget(cpu_budget=cpu_budget, pause_event=is_scanning)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        station, raw_files = job
+
+        cpu_budget.wait_for_idle()
+
+        ts = Path(raw_files[0]).stem.split("_")[0]
+        out_path = Path(output_dir).joinpath(station, f"{ts[:4]}-{ts[4:6]}-{ts[6:8]}")
+        out_path.mkdir(parents=True, exist_ok=True)
+
+        try:
+            _radar_processing_L0(
+                raw_files=raw_files,
+                out_path=out_path,
+                station=station,
+                heading=heading,
+                lat=lat,
+                lon=lon,
+                time_offset=0,
+                rotation_callback=cpu_budget,
+            )
+        except Exception as e:
+            logging.error(f"L0 conversion failed for {ts}: {e}")
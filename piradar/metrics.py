@@ -0,0 +1,245 @@
+"""
+In-process metrics: counters, gauges and histograms, dumped periodically as JSON for the operator.
+
+The metrics are updated from the hot paths (data threads, writer thread). A counter can be incremented by several
+threads (e.g. the data threads of several radars), so `inc` takes a lock: `+=` is not atomic and increments could
+be lost. Setting a gauge is a single attribute change, and a histogram is only observed by the writer thread, so
+they don't lock. A snapshot may be a few updates behind, which is fine for monitoring.
+
+    from piradar.metrics import registry
+
+    packets = registry.counter("packets_received", "Data packets received.")
+    packets.inc()
+
+    dumper = MetricsDumper(registry, path="/run/piradar/metrics.json", interval=5)
+    dumper.start()
+
+The JSON file is replaced atomically (`cat` it, or `watch -n 1 cat ...`). With `socket_path`, the last snapshot
+is also served to each client of a Unix socket (`socat - UNIX-CONNECT:/run/piradar/metrics.sock`).
+"""
+import os
+import json
+import time
+import socket
+import bisect
+import logging
+import threading
+from pathlib import Path
+from typing import Callable
+
+DUMP_INTERVAL = 5  # seconds
+
+# Seconds, upper bounds of the buckets.
+LATENCY_BUCKETS = [1e-4, 3e-4, 1e-3, 3e-3, 1e-2, 3e-2, 1e-1, 3e-1, 1, 3]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1):
+        with self._lock:
+            self.value += n
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self.value}
+
+
+class Gauge:
+    """Last value set, or the value returned by `function` at snapshot time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str = "", function: Callable[[], float] = None):
+        self.name = name
+        self.description = description
+        self.function = function
+        self.value = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def snapshot(self) -> dict:
+        return {"type": self.kind, "value": self.function() if self.function is not None else self.value}
+
+
+class Histogram:
+    """Count of the values in each bucket (upper bounds, the last bucket is unbounded), sum and max."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets: list[float] = None):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets or LATENCY_BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count else None
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.kind,
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.mean,
+            "max": self.max,
+            "buckets": [[le, count] for le, count in zip(self.buckets + ["inf"], self.counts)],
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Gauge | Histogram] = {}
+        self._lock = threading.Lock()  # only for the registration.
+        self.start_time = time.time()
+
+    def _get_or_create(self, cls, name: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description=description)
+
+    def gauge(self, name: str, description: str = "", function: Callable[[], float] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, description=description, function=function)
+
+    def histogram(self, name: str, description: str = "", buckets: list[float] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, description=description, buckets=buckets)
+
+    def __getitem__(self, name: str):
+        return self._metrics[name]
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            "time": now,
+            "uptime": now - self.start_time,
+            "pid": os.getpid(),
+            "metrics": {metric.name: metric.snapshot() for metric in metrics},
+        }
+
+
+def _json_default(value):
+    """numpy scalars."""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+# Process wide registry.
+registry = MetricsRegistry()
+
+
+class MetricsDumper:
+    def __init__(
+            self,
+            registry: MetricsRegistry = registry,
+            path: str = None,
+            socket_path: str = None,
+            interval: float = DUMP_INTERVAL,
+    ):
+        """
+
+        Parameters
+        ----------
+        path:
+            JSON file, replaced every `interval` seconds.
+        socket_path:
+            Unix socket. Each client receives the last snapshot (JSON) and is disconnected.
+        """
+        self.registry = registry
+        self.path = Path(path) if path else None
+        self.socket_path = socket_path
+        self.interval = interval
+
+        self.stop_flag = False
+        self.dump_thread: threading.Thread = None
+        self.socket_thread: threading.Thread = None
+        self.server_socket: socket.socket = None
+
+        self._last_dump = b"{}"
+
+    def start(self):
+        self.stop_flag = False
+        self.dump_thread = threading.Thread(name="metrics", target=self.dump_loop, daemon=True)
+        self.dump_thread.start()
+
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server_socket.bind(self.socket_path)
+            self.server_socket.listen()
+            self.server_socket.settimeout(1)
+            self.socket_thread = threading.Thread(name="metrics_sock", target=self.serve, daemon=True)
+            self.socket_thread.start()
+
+        logging.debug("Metrics dumper started")
+
+    def stop(self):
+        self.stop_flag = True
+        for thread in [self.dump_thread, self.socket_thread]:
+            if thread is not None:
+                thread.join()
+        if self.server_socket is not None:
+            self.server_socket.close()
+            os.unlink(self.socket_path)
+            self.server_socket = None
+        self.dump()  # last values.
+
+    def dump(self):
+        self._last_dump = json.dumps(self.registry.snapshot(), indent=1, default=_json_default).encode()
+        if self.path is None:
+            return
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(self._last_dump)
+            os.replace(tmp_path, self.path)  # readers never see a partial file.
+        except OSError as e:
+            logging.warning(f"Failed to write the metrics: {e}")
+
+    def dump_loop(self):
+        while not self.stop_flag:
+            self.dump()
+            time_0 = time.monotonic()
+            while not self.stop_flag and time.monotonic() - time_0 < self.interval:
+                time.sleep(0.1)
+
+    def serve(self):
+        while not self.stop_flag:
+            try:
+                client, _ = self.server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            with client:
+                try:
+                    client.sendall(self._last_dump)
+                except OSError:
+                    pass
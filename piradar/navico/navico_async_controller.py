@@ -0,0 +1,270 @@
+"""
+asyncio variant of the NavicoRadarController.
+
+The report, data and send multicast groups are asyncio datagram endpoints driven by a single event loop, so
+one process can drive several radars without a listener thread per socket. The keep alive and the command
+sender are tasks. Writing the raw files is still done by the (per radar) RadarDataWriter thread.
+
+Usage:
+
+    radar = AsyncNavicoRadarController(multicast_interfaces=..., report_output_dir=..., connect_timeout=60)
+    if await radar.start():
+        await radar.set_gain(50)
+        await radar.transmit(get_report=True)
+        ...
+        await radar.stop()
+
+Commands can also be called without being awaited; the packets are still sent in order.
+"""
+import asyncio
+import logging
+import functools
+import socket
+
+from piradar.network import create_udp_socket, create_udp_multicast_receiver_socket
+from piradar.navico.navico_controller import (
+    NavicoRadarController,
+    MulticastInterfaces,
+    RadarDataWriter,
+    wake_up_navico_radar,
+    WAKE_UP_SLEEP,
+    SEND_SLEEP,
+)
+
+NAVICO_COMMANDS = [
+    "stay_on_cmd",
+    "get_reports",
+    "transmit",
+    "standby",
+    "set_range",
+    "set_bearing",
+    "set_gain",
+    "set_gain_auto",
+    "set_antenna_height",
+    "set_scan_speed",
+    "set_sea_state",
+    "set_sea_clutter",
+    "set_sea_clutter_auto",
+    "set_rain_clutter",
+    "set_rain_clutter_auto",
+    "set_side_lobe_suppression",
+    "set_side_lobe_suppression_auto",
+    "set_interference_rejection",
+    "set_local_interference_filter",
+    "set_mode",
+    "set_target_expansion",
+    "set_target_separation",
+    "set_noise_rejection",
+    "set_doppler_mode",
+    "set_doppler_speed",
+    "set_light",
+    "set_target_boost",
+    "sea_clutter_nudge",
+    "set_sector_blanking",
+    "enable_sector_blanking",
+]
+
+
+class ReportProtocol(asyncio.DatagramProtocol):
+    def __init__(self, radar_controller: "AsyncNavicoRadarController"):
+        self.radar_controller = radar_controller
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) >= 2:
+            self.radar_controller.radar_was_detected = True
+            self.radar_controller.process_report(raw_packet=data)
+
+    def error_received(self, exc):
+        logging.error(f"Report socket error: {exc}")
+
+
+class DataProtocol(asyncio.DatagramProtocol):
+    def __init__(self, radar_controller: "AsyncNavicoRadarController"):
+        self.radar_controller = radar_controller
+
+    def datagram_received(self, data: bytes, addr):
+        self.radar_controller.is_receiving_data = True
+        self.radar_controller.receive_stats.update(data)
+        try:
+            self.radar_controller.process_data(in_data=data)
+        except Exception as e:
+            logging.error(f"Error Raise when trying to process data: {e}")
+
+    def error_received(self, exc):
+        logging.error(f"Data socket error: {exc}")
+
+
+class AsyncNavicoRadarController(NavicoRadarController):
+    """
+    Same reports, recorder and writer as the NavicoRadarController, but the sockets are asyncio endpoints.
+
+    Must be created, started and stopped from the event loop. `start()` replaces the connection made by the
+    NavicoRadarController on init.
+    """
+
+    def __init__(
+            self, multicast_interfaces: MulticastInterfaces,
+            report_output_dir: str,
+            connect_timeout: float,
+            keep_alive_interval: int = 10,
+            data_writer: RadarDataWriter = None,
+    ):
+        super().__init__(
+            multicast_interfaces=multicast_interfaces,
+            report_output_dir=report_output_dir,
+            connect_timeout=connect_timeout,
+            keep_alive_interval=keep_alive_interval,
+            auto_connect=False,
+            data_writer=data_writer,
+        )
+        self.report_transport: asyncio.DatagramTransport = None
+        self.data_transport: asyncio.DatagramTransport = None
+        self.send_transport: asyncio.DatagramTransport = None
+
+        self.send_queue: asyncio.Queue = None
+        self.send_task: asyncio.Task = None
+        self.keep_alive_task: asyncio.Task = None
+
+    async def start(self) -> bool:
+        """Open the endpoints, wait for the radar and start the keep alive. Returns `is_connected`."""
+        if self.is_connected:
+            return True
+
+        loop = asyncio.get_running_loop()
+
+        self.stop_flag = False
+
+        self.report_transport, _ = await loop.create_datagram_endpoint(
+            lambda: ReportProtocol(self),
+            sock=create_udp_multicast_receiver_socket(
+                interface_address=self.address_set.interface,
+                group_address=self.address_set.report.address,
+                group_port=self.address_set.report.port
+            )
+        )
+        self.data_transport, _ = await loop.create_datagram_endpoint(
+            lambda: DataProtocol(self),
+            sock=create_udp_multicast_receiver_socket(
+                interface_address=self.address_set.interface,
+                group_address=self.address_set.data.address,
+                group_port=self.address_set.data.port,
+                rcvbuf_size=self.data_rcvbuf_size,
+            )
+        )
+        send_socket = create_udp_socket()
+        send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 32)
+        self.send_transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, sock=send_socket)
+        logging.debug("Endpoints opened")
+
+        self.send_queue = asyncio.Queue()
+        self.send_task = asyncio.create_task(self._send_loop(), name="send")
+        if self.owns_data_writer:
+            self.data_writer.start_thread()
+
+        logging.info("Waiting for radar ...")
+        for _nct in range(int(self.connect_timeout / WAKE_UP_SLEEP)):
+            if self.radar_was_detected:
+                logging.info("Radar detected on network")
+                self.is_connected = True
+                break
+            logging.info(f"Waiting for radar ({_nct + 1})")
+            await asyncio.to_thread(wake_up_navico_radar)
+            await asyncio.sleep(WAKE_UP_SLEEP)
+        else:
+            logging.info("Could not connect. Radar was not detected.")
+            await self._close()
+            return False
+
+        self.keep_alive_task = asyncio.create_task(self._keep_alive(), name="keep")
+        await self.get_reports()
+
+        return True
+
+    async def stop(self):
+        if not self.is_connected:
+            return
+        await self._close()
+
+    async def _close(self):
+        self.data_recorder.stop_recording_data()
+
+        logging.info("Disconnect all called.")
+        self.stop_flag = True
+        for task in [self.keep_alive_task, self.send_task]:
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*[task for task in [self.keep_alive_task, self.send_task] if task is not None],
+                             return_exceptions=True)
+        self.keep_alive_task = self.send_task = None
+        while not self.send_queue.empty():  # commands not sent.
+            packed_data = self.send_queue.get_nowait()
+            if isinstance(packed_data, asyncio.Future):
+                packed_data.cancel()
+
+        for transport in [self.report_transport, self.data_transport, self.send_transport]:
+            transport.close()
+        logging.info("All endpoints closed")
+
+        if self.owns_data_writer:
+            self.data_writer.stop()  # pending data is written before the thread exits.
+            await asyncio.to_thread(self.data_writer.writer_thread.join)
+            logging.info("Writer thread closed")
+
+        self.is_connected = False
+
+    def connect(self):
+        """The blocking connection (listener threads) doesn't apply: the sockets are endpoints of the event loop."""
+        raise RuntimeError(
+            "AsyncNavicoRadarController is connected from the event loop: use `await radar.start()`."
+        )
+
+    def disconnect(self):
+        raise RuntimeError(
+            "AsyncNavicoRadarController is disconnected from the event loop: use `await radar.stop()`."
+        )
+
+    def send_pack_data(self, packed_data):
+        """Queued. The packets are sent in order, SEND_SLEEP apart, by the send task."""
+        self.send_queue.put_nowait(packed_data)
+
+    def commands_sent(self) -> asyncio.Future:
+        """Future done once every packet queued so far has been sent."""
+        future = asyncio.get_running_loop().create_future()
+        self.send_queue.put_nowait(future)
+        return future
+
+    async def _send_loop(self):
+        address = (self.address_set.send.address, self.address_set.send.port)
+        while True:
+            packed_data = await self.send_queue.get()
+            if isinstance(packed_data, asyncio.Future):
+                if not packed_data.done():
+                    packed_data.set_result(None)
+                continue
+
+            try:
+                self.send_transport.sendto(packed_data, address)
+                logging.debug(f"Sending: {packed_data} to {address}")
+            except OSError as e:
+                logging.error(f"Failed to send command {packed_data}. Error: {e}")
+            await asyncio.sleep(SEND_SLEEP)  # not to overwhelm.
+
+    async def _keep_alive(self):
+        while True:
+            await self.stay_on_cmd()
+            await asyncio.sleep(self.keep_alive_interval)
+
+
+def _awaitable_command(command):
+    """The command queues its packets, the returned future is done once they are sent."""
+    @functools.wraps(command)
+    def wrapper(self: AsyncNavicoRadarController, *args, **kwargs) -> asyncio.Future:
+        command(self, *args, **kwargs)
+        return self.commands_sent()
+    return wrapper
+
+
+# Commands call each other (e.g. `transmit(get_report=True)` calls `get_reports()`). The wrappers are not
+# coroutines, so the nested calls still queue their packets without having to be awaited.
+for _command in NAVICO_COMMANDS:
+    setattr(AsyncNavicoRadarController, _command, _awaitable_command(getattr(NavicoRadarController, _command)))
@@ -20,6 +20,8 @@ Decoded from B201
 236.6.7.14 6662
 
 """
+import os
+import signal
 import logging
 import time
 import datetime
@@ -27,25 +29,57 @@ import struct
 import socket
 import threading
 import queue
+import collections
+import multiprocessing as mp
 
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from piradar.network import create_udp_socket, create_udp_multicast_receiver_socket, ip_address_to_string
+import numpy as np
+
+from piradar.network import create_udp_socket, create_udp_multicast_receiver_socket, ip_address_to_string, \
+    enable_kernel_drop_counter, unpack_kernel_drop_counter, BatchReceiver, DATA_RCVBUF_SIZE
+from piradar.ring_buffer import PacketRing, SharedPacketRing
+from piradar.metrics import registry
 from piradar.navico.navico_structure import *
 from piradar.navico.navico_command import *
 
 HOST = ''
 RCV_BUFF = 65535
+DATA_RING_SLOT_SIZE = 2 ** 15  # bytes, a data packet is 17160 bytes.
+DATA_CAPTURE_RING_SIZE = 256  # slots (power of 2), used by the capture process if `data_ring_size` is not set.
+CAPTURE_START_TIMEOUT = 30  # seconds, for the capture process to open its data socket.
 
 ENTRY_GROUP_ADDRESS = '236.6.7.5'
 ENTRY_GROUP_PORT = 6878
 
+RAW_FILE_BUFFER_SIZE = 2 ** 20  # bytes. The raw file is written when its buffer is full ...
+RAW_FILE_FLUSH_INTERVAL = 1  # seconds. ... or at this interval.
+
+WRITER_QUEUE_SIZE = 1024  # ~16 MB of frames.
+WRITER_OVERFLOW_POLICIES = ["block", "drop_oldest", "spill"]
+IOV_MAX = os.sysconf("SC_IOV_MAX")
+
 WAKE_UP_SLEEP = 0.5
-REPORT_SLEEP = 1e-3
-DATA_SLEEP = 1e-4  # 1e-5 didn't seem to be enough.
 SEND_SLEEP = 1e-2
 
+# Process wide metrics (see piradar.metrics), since the start of the process.
+PACKETS_RECEIVED = registry.counter("packets_received", "Data packets received.")
+BYTES_RECEIVED = registry.counter("bytes_received", "Data packets bytes received.")
+LOST_SPOKES = registry.counter("lost_spokes", "Spokes missing from the received data packets.")
+KERNEL_DROPS = registry.gauge("kernel_drops", "Data packets dropped by the kernel (SO_RXQ_OVFL), per socket.")
+LAST_DATA_TIME = registry.gauge("last_data_time", "Unix time of the last data packet.")
+SECONDS_SINCE_LAST_DATA = registry.gauge(
+    "seconds_since_last_data", "Seconds since the last data packet.",
+    function=lambda: time.time() - LAST_DATA_TIME.value if LAST_DATA_TIME.value is not None else None,
+)
+SPOKES_DECODED = registry.counter("spokes_decoded", "Valid spokes decoded (while recording).")
+INVALID_SPOKES = registry.counter("invalid_spokes", "Spokes discarded because of their status.")
+FRAMES_WRITTEN = registry.counter("frames_written", "Frames added to the raw files.")
+BYTES_WRITTEN = registry.counter("bytes_written", "Bytes written to the raw files.")
+WRITE_LATENCY = registry.histogram("write_latency", "Seconds per raw file write (writev).")
+WRITER_QUEUE_DEPTH = registry.gauge("writer_queue_depth", "Writer tasks waiting (queue and spill).")
+
 
 class NavicoRadarType:
     navico4G = "4G"
@@ -97,6 +131,11 @@ DOPPLER_MODE_STR2VAL_MAP = {"off": 0, "normal": 1, "approaching_only": 2}
 SCAN_SPEED_VAL2STR_MAP = {0: "low", 1: "medium", 2: "high"}
 SCAN_SPEED_STR2VAL_MAP = {"low": 0, "medium": 1, "high": 2}
 
+VALID_SPOKE_STATUS = [0x02, 0x12]  # and not 0x12 #according to NavicoReceive
+
+# Spoke record of the .raw files: "<HH512B" (spoke_number, angle, intensities)
+RAW_FILE_SPOKE_DTYPE = np.dtype([("spoke_number", "<u2"), ("angle", "<u2"), ("intensities", "u1", (512,))])
+
 @dataclass
 class MulticastAddress:
     address: str | int
@@ -212,24 +251,129 @@ class Reports:
     serial = SerialNumberReport()
 
 
-@dataclass
-class SpokeData:
-    spoke_number: int = None
-    heading: float = None
-    angle: float = None
-    _range: float = None
-    intensities: list[float] = None
-
-
 @dataclass
 class FrameData:
-    time: str = None
+    time: int = None
     number_of_spokes: int = None
     gain: int = None
-    spoke_data: list[SpokeData] = None
+    _range: int = None  # range of the first valid spoke.
+    heading: int = None  # heading of the first valid spoke.
+    spokes: np.ndarray = None  # RAW_SPOKE_DTYPE records of the valid spokes (view of the received packet).
 
-    def __post_init__(self):
-        self.spoke_data = []
+
+# Offsets, in a data packet, of the spoke_number and angle of its first spoke.
+_SPOKE_NUMBER_OFFSET = RAW_FRAME_HEADER_SIZE + RAW_SPOKE_HEADER_DTYPE.fields['spoke_number'][1]
+_ANGLE_OFFSET = RAW_FRAME_HEADER_SIZE + RAW_SPOKE_HEADER_DTYPE.fields['angle'][1]
+
+
+@dataclass
+class ReceiveStats:
+    """
+    Data packets received.
+
+    Lost spokes are inferred from the spoke_number gaps between consecutive packets and logged per rotation.
+    A rotation ends when the angle wraps around (a HALO rotation is 2048 spokes, half of the spoke_number
+    range, so spoke_number wraps every other rotation). Packets dropped by the kernel (receive buffer full, i.e. the data thread doesn't keep
+    up) are counted with SO_RXQ_OVFL when available. Lost spokes that are not explained by kernel drops
+    (32 spokes per packet) were lost before reaching the Pi.
+    """
+    packets: int = 0
+    bytes_received: int = 0
+    spokes: int = 0
+    lost_spokes: int = 0
+    rotations: int = 0
+    rotation_lost_spokes: int = 0
+    kernel_drop_counter: int = 0  # since the socket was created.
+    kernel_drop_counter_0: int = 0  # at the start of the stats.
+    rotation_kernel_drop_counter_0: int = 0
+    start_time: float = field(default_factory=time.monotonic)
+    _next_spoke_number: int = None
+    _last_angle: int = None
+
+    @property
+    def kernel_drops(self):
+        return self.kernel_drop_counter - self.kernel_drop_counter_0
+
+    def reset(self):
+        """Starts new stats, the kernel drop counter of the socket is kept."""
+        self.__init__(
+            kernel_drop_counter=self.kernel_drop_counter,
+            kernel_drop_counter_0=self.kernel_drop_counter,
+            rotation_kernel_drop_counter_0=self.kernel_drop_counter,
+        )
+
+    def update_kernel_drop_counter(self, counter: int):
+        self.kernel_drop_counter = counter
+        KERNEL_DROPS.set(counter)
+
+    def update(self, packet: bytes | bytearray | memoryview):
+        self.packets += 1
+        self.bytes_received += len(packet)
+        PACKETS_RECEIVED.inc()
+        BYTES_RECEIVED.inc(len(packet))
+        LAST_DATA_TIME.set(time.time())
+
+        if len(packet) < _ANGLE_OFFSET + 2:
+            return
+
+        number_of_spokes = packet[5]
+        # From the first spoke header.
+        spoke_number = packet[_SPOKE_NUMBER_OFFSET] | packet[_SPOKE_NUMBER_OFFSET + 1] << 8
+        angle = packet[_ANGLE_OFFSET] | packet[_ANGLE_OFFSET + 1] << 8
+
+        if self._next_spoke_number is not None:
+            lost_spokes = (spoke_number - self._next_spoke_number) % 4096
+            self.lost_spokes += lost_spokes
+            LOST_SPOKES.inc(lost_spokes)
+            self.rotation_lost_spokes += lost_spokes
+
+        if self._last_angle is not None and angle < self._last_angle:  # wrapped
+            self._log_rotation()
+
+        self._next_spoke_number = (spoke_number + number_of_spokes) % 4096
+        self._last_angle = angle
+        self.spokes += number_of_spokes
+
+    def _log_rotation(self):
+        if self.rotation_lost_spokes:
+            kernel_drops = self.kernel_drop_counter - self.rotation_kernel_drop_counter_0
+            logging.warning(f"Rotation {self.rotations}: {self.rotation_lost_spokes} spokes lost, "
+                            f"{kernel_drops} packets dropped by the kernel.")
+        self.rotations += 1
+        self.rotation_lost_spokes = 0
+        self.rotation_kernel_drop_counter_0 = self.kernel_drop_counter
+
+    @property
+    def elapsed_time(self):
+        return time.monotonic() - self.start_time
+
+    @property
+    def packet_rate(self):
+        return self.packets / self.elapsed_time
+
+    @property
+    def drop_rate(self):
+        return self.lost_spokes / (self.spokes + self.lost_spokes) if self.spokes else 0
+
+    def summary(self) -> str:
+        return (f"{self.packets} packets ({self.packet_rate:.1f} packets/s, {self.bytes_received / self.elapsed_time / 1e6:.2f} MB/s), "
+                f"{self.lost_spokes} lost spokes (drop rate {self.drop_rate:.2%}), {self.kernel_drops} kernel drops")
+
+
+@dataclass
+class WriterStats:
+    frames_written: int = 0
+    bytes_written: int = 0
+    writes: int = 0  # number of writev
+    write_time: float = 0  # seconds
+    max_write_time: float = 0  # seconds
+    max_queue_depth: int = 0
+    dropped_frames: int = 0  # drop_oldest policy
+    spilled_tasks: int = 0
+
+    @property
+    def mean_write_time(self):
+        return self.write_time / self.writes if self.writes else 0
 
 
 @dataclass
@@ -262,10 +406,41 @@ class NavicoRadarController:
             report_output_dir: str,
             connect_timeout: float,
             keep_alive_interval: int = 10,
+            auto_connect: bool = True,
+            data_writer: "RadarDataWriter" = None,
+            data_rcvbuf_size: int = DATA_RCVBUF_SIZE,
+            data_batch_size: int = 1,
+            data_ring_size: int = 0,
+            data_capture_process: bool = False,
     ):
+        """
+        Parameters
+        ----------
+        data_rcvbuf_size:
+            Kernel receive buffer size (bytes) of the data socket.
+        data_batch_size:
+            If > 1, the data packets are received (recvmmsg) and processed in batches of up to this size.
+        data_ring_size:
+            If > 0, the data thread only receives the packets into a ring buffer of this many slots
+            (DATA_RING_SLOT_SIZE bytes each), and a `decode` thread processes them.
+        data_capture_process:
+            The data packets are received by another process (its own GIL and core) and passed through a
+            shared memory ring of `data_ring_size` (power of 2, default DATA_CAPTURE_RING_SIZE) slots to the
+            `decode` thread.
+        data_writer:
+            Writer shared with other controllers. Its thread is started and stopped by its owner.
+            By default, the controller has its own writer.
+        """
         self.address_set = multicast_interfaces
         self.report_output_dir = report_output_dir
         self.keep_alive_interval = keep_alive_interval
+        self.data_rcvbuf_size = data_rcvbuf_size
+        self.data_batch_size = data_batch_size
+        self.data_capture_process = data_capture_process
+        self.data_ring_size = data_ring_size or (DATA_CAPTURE_RING_SIZE if data_capture_process else 0)
+        self.data_ring: PacketRing = None
+        if self.data_ring_size > 0 and not data_capture_process:
+            self.data_ring = PacketRing(self.data_ring_size, DATA_RING_SLOT_SIZE)
         self.connect_timeout = connect_timeout
         self.raw_reports_path = {
             report_id: Path(self.report_output_dir).joinpath(f"raw_report_{hex(report_id)}.raw")
@@ -276,12 +451,18 @@ class NavicoRadarController:
 
         self.data_socket = None
         self.report_socket = None
+        self.has_kernel_drop_counter = False
 
         self.data_thread: threading.Thread = None
+        self.decode_thread: threading.Thread = None
+        self.capture_process: mp.Process = None
+        self.capture_stop_event: mp.Event = None
         self.report_thread: threading.Thread = None
         self.keep_alive_thread: threading.Thread = None
 
-        self.data_writer = RadarDataWriter(self)
+        self.owns_data_writer = data_writer is None
+        self.data_writer = RadarDataWriter() if self.owns_data_writer else data_writer
+        self.receive_stats = ReceiveStats()
         self.data_recorder = RadarDataRecorder(self)
 
         self.radar_was_detected = False
@@ -309,11 +490,12 @@ class NavicoRadarController:
             3: self.reports.blanking.sector_3,
         }
 
-        self.connect()
-        if self.is_connected:
-            self.start_keep_alive_thread()
+        if auto_connect:
+            self.connect()
+            if self.is_connected:
+                self.start_keep_alive_thread()
 
-            self.get_reports()
+                self.get_reports()
 
     def connect(self):
         if self.is_connected:
@@ -321,12 +503,14 @@ class NavicoRadarController:
 
         self.stop_flag = False
         self.init_report_socket()
-        self.init_data_socket()
+        if not self.data_capture_process:  # opened by the capture process.
+            self.init_data_socket()
         self.init_send_socket()
 
-        self.start_report_thread()
         self.start_data_thread()
-        self.data_writer.start_thread()
+        self.start_report_thread()
+        if self.owns_data_writer:
+            self.data_writer.start_thread()
 
         logging.info("Waiting for radar ...")
         for _nct in range(int(self.connect_timeout / WAKE_UP_SLEEP)):
@@ -350,18 +534,26 @@ class NavicoRadarController:
         self.data_recorder.stop_recording_data()
 
         logging.info("Disconnect all called.")
-        self.data_writer.writing_queue.queue.clear()
         self.stop_flag = True
         self.report_thread.join()
-        self.data_thread.join()
-        self.data_writer.writer_thread.join()
+        if self.data_thread is not None:
+            self.data_thread.join()
+        self.stop_capture_process()
+        if self.decode_thread is not None:
+            self.decode_thread.join()
+        if isinstance(self.data_ring, SharedPacketRing):
+            self.data_ring.close()
+        if self.owns_data_writer:
+            self.data_writer.stop()  # pending data is written before the thread exits.
+            self.data_writer.writer_thread.join()
         if self.keep_alive_thread is not None:
             self.keep_alive_thread.join()
 
         logging.info("All threads closed")
 
         self.report_socket.close()
-        self.data_socket.close()
+        if self.data_socket is not None:
+            self.data_socket.close()
         self.send_socket.close()
         logging.info("All sockets closed")
 
@@ -385,8 +577,10 @@ class NavicoRadarController:
         self.data_socket = create_udp_multicast_receiver_socket(
             interface_address=self.address_set.interface,
             group_address=self.address_set.data.address,
-            group_port=self.address_set.data.port
+            group_port=self.address_set.data.port,
+            rcvbuf_size=self.data_rcvbuf_size,
         )
+        self.has_kernel_drop_counter = enable_kernel_drop_counter(self.data_socket)
         logging.debug("Data socket initialized")
 
     def start_report_thread(self):
@@ -395,10 +589,68 @@ class NavicoRadarController:
         logging.debug("Report thread started")
 
     def start_data_thread(self):
-        self.data_thread = threading.Thread(name="data", target=self.data_listen, daemon=True)
+        if self.data_capture_process:
+            if self.capture_process is None:  # not already started before the other threads (see MultiRadarController).
+                self.start_capture_process()
+            self.decode_thread = threading.Thread(name="decode", target=self.data_decode_from_ring, daemon=True)
+            self.decode_thread.start()
+            logging.debug("Decode thread started")
+            return
+
+        if self.data_ring is not None:
+            target = self.data_listen_to_ring
+            self.decode_thread = threading.Thread(name="decode", target=self.data_decode_from_ring, daemon=True)
+            self.decode_thread.start()
+            logging.debug("Decode thread started")
+        elif self.data_batch_size > 1:
+            target = self.data_listen_batch
+        else:
+            target = self.data_listen
+        self.data_thread = threading.Thread(name="data", target=target, daemon=True)
         self.data_thread.start()
         logging.debug("Data thread started")
 
+    def start_capture_process(self):
+        # Fork is used so that the (main) scheduled_scan script is not re-imported by the child process.
+        # The process must be started before any other thread is: a running thread could hold a lock in the child.
+        if threading.active_count() > 1:
+            logging.warning("Capture process forked while other threads are running.")
+        mp_context = mp.get_context("fork")
+        self.data_ring = SharedPacketRing(self.data_ring_size, DATA_RING_SLOT_SIZE, mp_context=mp_context)
+        self.capture_stop_event = mp_context.Event()
+        capture_ready = mp_context.Event()
+        self.capture_process = mp_context.Process(
+            name="capture",
+            target=data_capture_loop,
+            args=(
+                self.data_ring.name,
+                self.data_ring.n_slots,
+                self.data_ring.slot_size,
+                self.data_ring.data_available,
+                self.data_ring.lock,
+                self.capture_stop_event,
+                capture_ready,
+                self.address_set.interface,
+                self.address_set.data.address,
+                self.address_set.data.port,
+                self.data_rcvbuf_size,
+            ),
+            daemon=True,
+        )
+        self.capture_process.start()
+        # Packets sent before the data socket of the child is opened are lost.
+        if capture_ready.wait(CAPTURE_START_TIMEOUT):
+            logging.debug("Capture process started")
+        else:
+            logging.warning("Capture process data socket not opened.")
+
+    def stop_capture_process(self):
+        if self.capture_process is None:
+            return
+        self.capture_stop_event.set()
+        self.capture_process.join()
+        self.capture_process = None
+
     def start_keep_alive_thread(self):
         self.keep_alive_thread = threading.Thread(name="keep", target=self.keep_alive, daemon=True)
         self.keep_alive_thread.start()
@@ -470,42 +722,112 @@ class NavicoRadarController:
     #             self.stop_recording_data()
 
     def report_listen(self):
+        buffer = memoryview(bytearray(RCV_BUFF))
         while not self.stop_flag:  # have thread specific flags as well
             try:
-                raw_packet = self.report_socket.recv(RCV_BUFF)  # 1 second socket timeout
+                n_bytes = self.report_socket.recv_into(buffer)  # blocks, 1 second socket timeout
             except socket.timeout:
                 continue
 
-            if raw_packet and len(raw_packet) >= 2:
+            if n_bytes >= 2:
                 self.radar_was_detected = True
-                self.process_report(raw_packet=raw_packet)
-
-            time.sleep(REPORT_SLEEP)
+                self.process_report(raw_packet=bytes(buffer[:n_bytes]))  # copy, the reports are kept.
+
+    def receive_data_into(self, buffer: memoryview) -> int:
+        """Blocks, 1 second socket timeout (raises socket.timeout)."""
+        if self.has_kernel_drop_counter:
+            n_bytes, ancdata, _, _ = self.data_socket.recvmsg_into([buffer], socket.CMSG_SPACE(4))
+            kernel_drop_counter = unpack_kernel_drop_counter(ancdata)
+            if kernel_drop_counter is not None:
+                self.receive_stats.update_kernel_drop_counter(kernel_drop_counter)
+        else:
+            n_bytes = self.data_socket.recv_into(buffer)
+        self.is_receiving_data = True
+        return n_bytes
 
     def data_listen(self):
+        buffer = memoryview(bytearray(RCV_BUFF))
         while not self.stop_flag:  # have thread specific flags as well
             try:
-                raw_packet = self.data_socket.recv(RCV_BUFF)  # 1 second socket timeout
-                self.is_receiving_data = True
+                n_bytes = self.receive_data_into(buffer)
             except socket.timeout:
                 continue
 
-            if raw_packet:
+            if n_bytes:
                 logging.debug("Data received")
+                self.receive_stats.update(buffer[:n_bytes])
                 try:
-                    self.process_data(in_data=raw_packet)
+                    # copy, the frames (views of the packet) are queued to the writer.
+                    self.process_data(in_data=bytes(buffer[:n_bytes]))
                 except Exception as e:
                     logging.error(f"Error Raise when trying to process data: {e}")
                     continue
 
-            time.sleep(DATA_SLEEP)
+    def data_listen_batch(self):
+        receiver = BatchReceiver(self.data_socket, batch_size=self.data_batch_size, slot_size=RCV_BUFF)
+        while not self.stop_flag:  # have thread specific flags as well
+            packets = receiver.receive(timeout=1)
+            if not packets:
+                continue
+            self.is_receiving_data = True
+
+            if receiver.kernel_drop_counter is not None:
+                self.receive_stats.update_kernel_drop_counter(receiver.kernel_drop_counter)
+
+            logging.debug(f"Data received ({len(packets)} packets)")
+            self.process_data_batch(packets)
+
+    def data_listen_to_ring(self):
+        """Only receives, the packets are processed by the decode thread."""
+        overflow_buffer = memoryview(bytearray(RCV_BUFF))
+        while not self.stop_flag:  # have thread specific flags as well
+            slot = self.data_ring.write_slot()
+            try:
+                if slot is None:  # the decode thread doesn't keep up.
+                    self.receive_data_into(overflow_buffer)
+                    self.data_ring.drop()
+                    continue
+                n_bytes = self.receive_data_into(slot)
+            except socket.timeout:
+                continue
+
+            if n_bytes:
+                self.data_ring.commit(n_bytes)
+
+    def data_decode_from_ring(self):
+        while not self.stop_flag:
+            packet = self.data_ring.read(timeout=1)
+            if packet is None:
+                continue
+            if self.data_capture_process:
+                self.is_receiving_data = True
+                self.receive_stats.update_kernel_drop_counter(self.data_ring.kernel_drop_counter)
+            self.receive_stats.update(packet)
+            try:
+                # copy, the frames (views of the packet) are queued to the writer.
+                in_data = bytes(packet)
+            finally:
+                self.data_ring.release()
+            try:
+                self.process_data(in_data=in_data)
+            except Exception as e:
+                logging.error(f"Error Raise when trying to process data: {e}")
+
+    def process_data_batch(self, packets: list[memoryview]):
+        for packet in packets:
+            self.receive_stats.update(packet)
+            try:
+                # copy, the frames (views of the packet) are queued to the writer.
+                self.process_data(in_data=bytes(packet))
+            except Exception as e:
+                logging.error(f"Error Raise when trying to process data: {e}")
 
     def process_report(self, raw_packet):
         # TODO DECODE ALL MISSING
         report_id = struct.unpack("!H", raw_packet[:2])[0]
         logging.debug(f"report received: {raw_packet[:2]}")
         if report_id in REPORTS_IDS:
-            self.data_writer.write_report(report_id=report_id, raw_packet=raw_packet)
+            self.data_writer.write_report(report_path=self.raw_reports_path[report_id], raw_packet=raw_packet)
         else:
             logging.debug(f"report {raw_packet[:2]} unknown")
             return
@@ -675,66 +997,49 @@ class NavicoRadarController:
     def process_data(self, in_data):
         # This loop should be unlocked if other processes need to unpacked data (arp)
         if self.data_recorder.is_recording:
-            raw_frame = RawFrameData(in_data)  # PACKET MIGHT BE BROKEN FIXME
-
-            logging.debug(f"Number of spokes in sector: {raw_frame.number_of_spokes}")
-
-            time_stamp = datetime.datetime.now(datetime.UTC)
+            spokes = unpack_raw_frame_spokes(in_data)  # PACKET MIGHT BE BROKEN FIXME
 
-            frame_data = FrameData()
-            frame_data.time = int(time_stamp.timestamp())  # seconds "<L"
-            frame_data.number_of_spokes = raw_frame.number_of_spokes
-            frame_data.gain = self.reports.setting.gain
+            logging.debug(f"Number of spokes in sector: {spokes.size}")
 
-            for raw_spoke in raw_frame.spokes:
-                spoke_data = SpokeData()
+            valid = np.isin(spokes['header']['status'], VALID_SPOKE_STATUS)
+            if not valid.all():
+                n_invalid = int(np.count_nonzero(~valid))
+                INVALID_SPOKES.inc(n_invalid)
+                logging.warning(f"Invalid Spoke ({n_invalid}/{valid.size})")
+                spokes = spokes[valid]
+            SPOKES_DECODED.inc(spokes.size)
 
-                spoke_data.spoke_number = raw_spoke.spoke_number
-
-                # record the raw data as is.
-                spoke_data.heading = raw_spoke.heading
-                spoke_data.angle = raw_spoke.angle
-
-                if raw_spoke.status in [0x02, 0x12]:  # Valid # and not 0x12 #according to NavicoReceive
-                    if self.reports.system.radar_type == NavicoRadarType.navicoBR24:
-                        logging.warning("Navico BR24 is not tested")
-                        spoke_data._range = raw_spoke.small_range * (10 / 2 ** (1 / 2))
-
-                    else:
-                        if raw_spoke.large_range == 0x80:
-                            if raw_spoke.small_range == 0xffff:
-                                spoke_data._range = 0
-                            else:
-                                spoke_data._range = raw_spoke.small_range / 4
-
-                        elif self.reports.system.radar_type in [NavicoRadarType.navico4G, NavicoRadarType.navico3G]:
-                            spoke_data._range = raw_spoke.large_range * 64
-
-                        else:  #elif self.reports.system.radar_type == NavicoRadarType.navicoHALO:
-                            spoke_data._range = raw_spoke.large_range * raw_spoke.small_range / 512
+            if spokes.size == 0:
+                return
 
-                    spoke_data._range = int(spoke_data._range)  # save as integer. meter precision is fine.
+            if self.reports.system.radar_type == NavicoRadarType.navicoBR24:
+                logging.warning("Navico BR24 is not tested")
 
-                    spoke_data.intensities = raw_spoke.data
+            time_stamp = datetime.datetime.now(datetime.UTC)
 
-                    frame_data.spoke_data.append(spoke_data)
-                else:
-                    logging.warning("Invalid Spoke")
+            frame_data = FrameData(
+                time=int(time_stamp.timestamp()),  # seconds "<L"
+                number_of_spokes=valid.size,
+                gain=self.reports.setting.gain,
+                _range=int(compute_spoke_range(spokes['header'], self.reports.system.radar_type)[0]),
+                heading=int(spokes['header']['heading'][0]),
+                spokes=spokes,
+            )
 
-            last_angle = frame_data.spoke_data[-1].angle
+            last_angle = int(spokes['header']['angle'][-1])
 
             if self.data_recorder.is_recording_sector:
                 self.data_recorder.check_sector_recording_conditions(angle=last_angle)
                 output_file = self.data_recorder.output_file
             else:
-                first_angle = frame_data.spoke_data[0].angle
+                first_angle = int(spokes['header']['angle'][0])
                 _ts = time_stamp.strftime("%Y%m%dT%H%M%S%f")
                 filename = f"{_ts}_{first_angle}_{last_angle}"
                 output_file = str(Path(self.data_recorder.output_dir) / filename)
 
             if self.data_recorder.is_recording: # check again since it could be stop by check sector recording.
                 if self.data_recorder.sector_count > 0: # first sector is not recorded.
-                    self.data_writer.write_frame(output_file=output_file, frame_data=frame_data)
+                    self.data_writer.write_frame(output_file=output_file, frame_data=frame_data, stream=self)
 
     #### Belows are all the commands method ####
 
@@ -985,6 +1290,82 @@ class NavicoRadarController:
             self.get_reports()
 
 
+def compute_spoke_range(spokes_header: np.ndarray, radar_type: str) -> np.ndarray:
+    """Range (integer meters) of each spoke from RAW_SPOKE_HEADER_DTYPE records."""
+    large_range = spokes_header['large_range'].astype(np.float64)
+    small_range = spokes_header['small_range'].astype(np.float64)
+
+    if radar_type == NavicoRadarType.navicoBR24:
+        _range = small_range * (10 / 2 ** (1 / 2))
+
+    else:
+        if radar_type in [NavicoRadarType.navico4G, NavicoRadarType.navico3G]:
+            _range = large_range * 64
+        else:  #elif radar_type == NavicoRadarType.navicoHALO:
+            _range = large_range * small_range / 512
+
+        _range = np.where(large_range == 0x80, np.where(small_range == 0xffff, 0, small_range / 4), _range)
+
+    return _range.astype(int)  # save as integer. meter precision is fine.
+
+
+def data_capture_loop(
+        ring_name: str,
+        n_slots: int,
+        slot_size: int,
+        data_available: mp.Event,
+        lock: mp.Lock,
+        stop_event: mp.Event,
+        ready: mp.Event,
+        interface_address: str,
+        group_address: str,
+        group_port: int,
+        rcvbuf_size: int,
+):
+    """Capture process: receives the data packets into the shared memory ring. Nothing else."""
+    # The parent handles the termination.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    ring = SharedPacketRing(n_slots, slot_size, name=ring_name, data_available=data_available, lock=lock)
+    data_socket = create_udp_multicast_receiver_socket(
+        interface_address=interface_address,
+        group_address=group_address,
+        group_port=group_port,
+        rcvbuf_size=rcvbuf_size,
+    )
+    has_kernel_drop_counter = enable_kernel_drop_counter(data_socket)
+    ready.set()
+    ancbufsize = socket.CMSG_SPACE(4)
+    overflow_buffer = memoryview(bytearray(RCV_BUFF))
+
+    while not stop_event.is_set():
+        slot = ring.write_slot()
+        is_full = slot is None  # the decode thread doesn't keep up.
+        if is_full:
+            slot = overflow_buffer
+
+        try:
+            if has_kernel_drop_counter:
+                n_bytes, ancdata, _, _ = data_socket.recvmsg_into([slot], ancbufsize)  # 1 second socket timeout
+                kernel_drop_counter = unpack_kernel_drop_counter(ancdata)
+                if kernel_drop_counter is not None:
+                    ring.kernel_drop_counter = kernel_drop_counter
+            else:
+                n_bytes = data_socket.recv_into(slot)
+        except socket.timeout:
+            continue
+
+        if is_full:
+            ring.drop()
+        elif n_bytes:
+            ring.commit(n_bytes)
+
+    data_socket.close()
+    del slot
+    ring.close()
+
+
 def wake_up_navico_radar():
     # this may not be usefull
     cmd = struct.pack("2B", 0x01, 0xb1)
@@ -998,14 +1379,58 @@ def wake_up_navico_radar():
     send_socket.close()
 
 
+@dataclass
+class OpenRawFile:
+    path: Path
+    fd: int
+    pending: list = field(default_factory=list)  # buffers not yet written.
+    pending_size: int = 0
+
+
 class RadarDataWriter:
-    def __init__(self, radar_controller):
-        self.radar_controller: NavicoRadarController = radar_controller
+    """
+    Each wake-up, the writer thread drains every queued task. The frames are buffered and written with
+    a single `os.writev` per file when RAW_FILE_BUFFER_SIZE is reached, every RAW_FILE_FLUSH_INTERVAL,
+    when frames are written to another file or when `close_raw_file()` is called.
+
+    A writer can be shared by several controllers (radars). Each one writes its frames to its own `stream`
+    (the controller), which has at most one raw file open at a time.
+
+    The queue is bounded (`queue_size`). When it is full, `overflow_policy`:
+        - "block": the caller (the data thread) waits.
+        - "drop_oldest": the oldest queued frame is dropped. Close and report tasks are never dropped: if
+          there is no frame to drop, the caller waits.
+        - "spill": tasks are kept in an unbounded (RAM) overflow until the writer catches up.
+    """
+    def __init__(self, queue_size: int = WRITER_QUEUE_SIZE, overflow_policy: str = "spill"):
+        if overflow_policy not in WRITER_OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy. Valid policies: {WRITER_OVERFLOW_POLICIES}")
+
         self.writer_thread: threading.Thread = None
-        self.writing_queue = queue.Queue()
+        self.writing_queue = queue.Queue(maxsize=queue_size)
+        self.overflow_policy = overflow_policy
         self.stop_flag = False
 
+        self.stats = WriterStats()
+
+        self._spill = collections.deque()
+        self._spill_lock = threading.Lock()
+
+        # Only accessed by the writer thread.
+        self._raw_files: dict[object, OpenRawFile] = {}  # {stream: file}
+        self._last_flush = time.monotonic()
+
+    @property
+    def queue_depth(self):
+        return self.writing_queue.qsize() + len(self._spill)
+
+    @property
+    def is_running(self):
+        return self.writer_thread is not None and self.writer_thread.is_alive()
+
     def start_thread(self):
+        if self.is_running:
+            return
         self.stop_flag = False
         self.writer_thread = threading.Thread(name="writer", target=self.loop, daemon=True)
         self.writer_thread.start()
@@ -1015,49 +1440,188 @@ class RadarDataWriter:
         self.stop_flag = True
 
     def loop(self):
-        while not (self.radar_controller.stop_flag or self.stop_flag):
+        while not self.stop_flag:
             try:
-                _write_task, *args = self.writing_queue.get(timeout=0.1) # this need to be short too.
-                _write_task(*args)
+                tasks = [self.writing_queue.get(timeout=0.1)]  # this need to be short too.
+            except queue.Empty:
+                tasks = []
+
+            self._run_tasks(tasks + self._drain())
+            WRITER_QUEUE_DEPTH.set(self.queue_depth)
+
+            if time.monotonic() - self._last_flush > RAW_FILE_FLUSH_INTERVAL:
+                self._flush_raw_files()
+
+        # Clean shutdown: write everything that was queued.
+        self._run_tasks(self._drain())
+        for stream in list(self._raw_files):
+            self._close_raw_file(stream)
+
+    def write_frame(self, output_file: str, frame_data: FrameData, stream=None):
+        self._put((self._write_raw_frame_data, output_file, frame_data, stream))
+
+    def write_report(self, report_path: Path, raw_packet: bytearray):
+        self._put((self._write_raw_report_packet, report_path, raw_packet))
+
+    def close_raw_file(self, stream=None, closed: threading.Event = None) -> threading.Event:
+        """
+        Close the raw file of the stream once the frames already queued are written.
+
+        Returns `closed` (a new event if None), set by the writer thread once the file is closed: its frames are
+        then all written.
+        """
+        closed = closed if closed is not None else threading.Event()
+        self._put((self._close_raw_file, stream, closed))
+        return closed
+
+    def _put(self, task: tuple):
+        match self.overflow_policy:
+            case "block":
+                self.writing_queue.put(task)
+            case "drop_oldest":
+                while True:
+                    try:
+                        self.writing_queue.put_nowait(task)
+                        break
+                    except queue.Full:
+                        if not self._drop_oldest_frame():
+                            self.writing_queue.put(task)  # only close and report tasks queued.
+                            break
+            case "spill":
+                with self._spill_lock:
+                    # Once spilling, everything goes to the spill to keep the order.
+                    if self._spill:
+                        self._spill.append(task)
+                        self.stats.spilled_tasks += 1
+                    else:
+                        try:
+                            self.writing_queue.put_nowait(task)
+                        except queue.Full:
+                            logging.warning("Writer queue full. Spilling to memory.")
+                            self._spill.append(task)
+                            self.stats.spilled_tasks += 1
+
+        queue_depth = self.queue_depth
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, queue_depth)
+        WRITER_QUEUE_DEPTH.set(queue_depth)
+
+    def _drop_oldest_frame(self) -> bool:
+        """Remove the oldest frame task from the queue. False if there is none."""
+        with self.writing_queue.mutex:
+            for index, task in enumerate(self.writing_queue.queue):
+                if task[0] == self._write_raw_frame_data:
+                    del self.writing_queue.queue[index]
+                    self.writing_queue.unfinished_tasks -= 1
+                    self.stats.dropped_frames += 1
+                    return True
+        return False
+
+    def _drain(self) -> list:
+        """Every queued task, then the spilled ones (which are always the most recent)."""
+        tasks = []
+        while True:
+            try:
+                tasks.append(self.writing_queue.get_nowait())
             except queue.Empty:
-                time.sleep(0.01) # this need to be short
+                break
+
+        if self._spill:
+            with self._spill_lock:
+                tasks.extend(self._spill)
+                self._spill.clear()
+
+        return tasks
+
+    def _run_tasks(self, tasks: list):
+        for _write_task, *args in tasks:
+            try:
+                _write_task(*args)
             except Exception as e:
                 logging.error(f"Unexpected error on writer thread: {e}.")
 
-    def write_frame(self, output_file: str, frame_data: FrameData):
-        self.writing_queue.put((self._write_raw_frame_data, output_file, frame_data))
-
-    def write_report(self, report_id: str, raw_packet: bytearray):
-        self.writing_queue.put((self._write_raw_report_packet, report_id, raw_packet))
-
-    @staticmethod
-    def _write_raw_frame_data(output_file: str, sector_data: FrameData):
-        with open(Path(output_file).with_suffix(".raw"), "ba") as f:
-            packed_frame_header = b"FH" + struct.pack(
-                "<LBHHH",
-                sector_data.time,
-                sector_data.number_of_spokes,
-                sector_data.spoke_data[0]._range,  #
-                sector_data.spoke_data[0].heading,
-                sector_data.gain,
-            )
-            f.write(packed_frame_header)
-            f.write(b"SD")
-            for spoke_data in sector_data.spoke_data:
-                packed_spoke_data = struct.pack(
-                    "<HH512B",
-                    spoke_data.spoke_number,
-                    spoke_data.angle,
-                    *spoke_data.intensities
-                )
-
-                f.write(packed_spoke_data)
-
-    def _write_raw_report_packet(self, report_id: str, raw_report: bytearray):
-        with open(self.radar_controller.raw_reports_path[report_id], "wb") as f:
+    def _flush_raw_files(self):
+        for raw_file in self._raw_files.values():
+            self._flush_raw_file(raw_file)
+        self._last_flush = time.monotonic()
+
+    def _flush_raw_file(self, raw_file: OpenRawFile):
+        if not raw_file.pending:
+            return
+
+        pending, raw_file.pending, raw_file.pending_size = raw_file.pending, [], 0
+
+        t0 = time.perf_counter()
+        n_bytes = writev_all(raw_file.fd, pending)
+        write_time = time.perf_counter() - t0
+
+        self.stats.writes += 1
+        self.stats.bytes_written += n_bytes
+        BYTES_WRITTEN.inc(n_bytes)
+        WRITE_LATENCY.observe(write_time)
+        self.stats.write_time += write_time
+        self.stats.max_write_time = max(self.stats.max_write_time, write_time)
+
+    def _close_raw_file(self, stream=None, closed: threading.Event = None):
+        try:
+            raw_file = self._raw_files.pop(stream, None)
+            if raw_file is not None:
+                self._flush_raw_file(raw_file)
+                os.close(raw_file.fd)
+        finally:
+            if closed is not None:
+                closed.set()
+
+    def _write_raw_frame_data(self, output_file: str, sector_data: FrameData, stream=None):
+        path = Path(output_file).with_suffix(".raw")
+        raw_file = self._raw_files.get(stream)
+        if raw_file is None or raw_file.path != path:
+            self._close_raw_file(stream)  # frames of a new file means the previous one is done.
+            raw_file = OpenRawFile(path=path, fd=os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644))
+            self._raw_files[stream] = raw_file
+
+        spoke_records = np.empty(sector_data.spokes.size, dtype=RAW_FILE_SPOKE_DTYPE)
+        spoke_records['spoke_number'] = sector_data.spokes['header']['spoke_number']
+        spoke_records['angle'] = sector_data.spokes['header']['angle']
+        spoke_records['intensities'] = sector_data.spokes['data']
+
+        packed_frame_header = b"FH" + struct.pack(
+            "<LBHHH",
+            sector_data.time,
+            sector_data.number_of_spokes,
+            sector_data._range,  #
+            sector_data.heading,
+            sector_data.gain,
+        ) + b"SD"
+
+        raw_file.pending.append(packed_frame_header)
+        raw_file.pending.append(spoke_records.view(np.uint8))
+        raw_file.pending_size += len(packed_frame_header) + spoke_records.nbytes
+        self.stats.frames_written += 1
+        FRAMES_WRITTEN.inc()
+
+        if raw_file.pending_size >= RAW_FILE_BUFFER_SIZE:
+            self._flush_raw_file(raw_file)
+
+    def _write_raw_report_packet(self, report_path: Path, raw_report: bytearray):
+        with open(report_path, "wb") as f:
             f.write(raw_report)
 
 
+def writev_all(fd: int, buffers: list) -> int:
+    """`os.writev` the buffers (IOV_MAX at a time), resuming after partial writes. Returns the number of bytes written."""
+    n_bytes = 0
+    for i in range(0, len(buffers), IOV_MAX):
+        chunk = collections.deque(memoryview(buffer) for buffer in buffers[i:i + IOV_MAX])
+        while chunk:
+            written = os.writev(fd, chunk)
+            n_bytes += written
+            while chunk and written >= chunk[0].nbytes:
+                written -= chunk.popleft().nbytes
+            if chunk:
+                chunk[0] = chunk[0][written:]
+    return n_bytes
+
+
 class RecorderAngleCounter:
     def __init__(self):
         self.first: int = None
@@ -1098,7 +1662,13 @@ class RadarDataRecorder:
         self._filename0: str = None
         self.output_file: str = None # use for sector
 
+        # Set by the writer thread once the raw file of the recording is closed (see `stop_recording_data`).
+        self.raw_file_closed = threading.Event()
+        self.raw_file_closed.set()
+
         # Sector Recording #
+        self._sector_lost_spokes_0: int = 0
+        self._sector_kernel_drops_0: int = 0
         self.angle_counter: RecorderAngleCounter = None
         self.sector_count: int = None
         self.number_of_sector_to_record: int = None
@@ -1109,8 +1679,11 @@ class RadarDataRecorder:
             return
 
         logging.info('Data recording started')
+        self.radar_controller.receive_stats.reset()
+        self._sector_lost_spokes_0 = self._sector_kernel_drops_0 = 0
         self.number_of_sector_to_record = number_of_sector_to_record
         self.sector_count = 0
+        self.raw_file_closed = threading.Event()
         self.is_recording = True
         self.is_recording_sector = True
 
@@ -1128,13 +1701,16 @@ class RadarDataRecorder:
             return
         self.output_dir = output_dir
         self.is_recording_sector = False
+        self.raw_file_closed = threading.Event()
         self.is_recording = True
+        self.radar_controller.receive_stats.reset()
 
     def update_filename(self, counter: int):
         self.output_file = Path(self.output_dir).joinpath(self._filename0 + f"_s{counter:02d}")
 
     def check_sector_recording_conditions(self, angle):
         if self.angle_counter.update(angle=angle) == 1:
+            self.log_sector_drops()
             self.sector_count += 1
             self.update_filename(self.sector_count)
             #self.spoke_counter.reset()
@@ -1145,15 +1721,32 @@ class RadarDataRecorder:
                 logging.info("Sector recorded count reached.")
                 self.stop_recording_data()
 
+    def log_sector_drops(self):
+        receive_stats = self.radar_controller.receive_stats
+        lost_spokes = receive_stats.lost_spokes - self._sector_lost_spokes_0
+        kernel_drops = receive_stats.kernel_drops - self._sector_kernel_drops_0
+        _log = logging.warning if lost_spokes or kernel_drops else logging.info
+        _log(f"Sector {self.sector_count}: {lost_spokes} spokes lost, {kernel_drops} packets dropped by the kernel.")
+
+        self._sector_lost_spokes_0 = receive_stats.lost_spokes
+        self._sector_kernel_drops_0 = receive_stats.kernel_drops
+
     def stop_recording_data(self):
         if not self.is_recording:
             logging.warning('Data recording already stopped')
             return
 
         logging.info('Data recording stopped')
+        logging.info(f"Data received: {self.radar_controller.receive_stats.summary()}")
+        if self.radar_controller.data_ring is not None:
+            logging.info(f"Data {self.radar_controller.data_ring.summary()}")
         self.is_recording = False
         self.is_recording_sector = False
 
+        # `raw_file_closed` was made when the recording started, so it can be waited on as soon as
+        # `is_recording` is False.
+        self.radar_controller.data_writer.close_raw_file(stream=self.radar_controller, closed=self.raw_file_closed)
+
 
 def format_path_with_dt_subdir(file_path: str) -> str:
     ts = datetime.datetime.now(datetime.UTC)
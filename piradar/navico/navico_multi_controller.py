@@ -0,0 +1,150 @@
+"""
+Several radars, or both groups (A/B) of a HALO (e.g. dual range), recorded by a single piradar process.
+
+Each radar has its own NavicoRadarController (sockets, reports, recorder) and output tree `<output_dir>/<name>/`,
+but they share a single RadarDataWriter thread: the disk writes of all radars are batched and scheduled together.
+The scheduled scans use it when `radar_groups` is set in the network config.
+
+Usage:
+
+    groups = locate_radar_groups(interface="192.168.1.100")  # {"A": MulticastInterfaces, "B": ...}
+    radars = MultiRadarController(radars=groups, report_output_dir=..., connect_timeout=60)
+    radars["A"].set_range(1000)
+    radars["B"].set_range(5000)
+    radars.start_sector_recording(output_dir=..., time_stamp="20250101T000000", number_of_sector_to_record=5)
+    radars.wait_for_recording()
+    radars.disconnect()
+"""
+import logging
+import time
+from pathlib import Path
+
+from piradar.navico.navico_controller import (
+    NavicoRadarController,
+    MulticastInterfaces,
+    RadarDataWriter,
+    WRITER_QUEUE_SIZE,
+)
+from piradar.navico.navico_locate import NavicoLocator
+
+
+def locate_radar_groups(interface: str, timeout: float = 30) -> dict[str, MulticastInterfaces]:
+    """Multicast groups A and B from the radar report 01B2. Empty if the radar was not located."""
+    navico_locator = NavicoLocator(interface=interface, timeout=timeout)
+    navico_locator.get_report_01b2()
+    if not navico_locator.is_located:
+        return {}
+    return {"A": navico_locator.groupA, "B": navico_locator.groupB}
+
+
+class MultiRadarController:
+    def __init__(
+            self,
+            radars: dict[str, MulticastInterfaces],
+            report_output_dir: str,
+            connect_timeout: float,
+            keep_alive_interval: int = 10,
+            overflow_policy: str = "spill",
+            **controller_kwargs,
+    ):
+        """
+
+        Parameters
+        ----------
+        radars:
+            {name: multicast interfaces}. The name is used for the output (data and report) directories.
+        report_output_dir:
+            Reports are written to `report_output_dir/name/`.
+        controller_kwargs:
+            Passed to each NavicoRadarController (e.g. `data_rcvbuf_size`, `data_capture_process`).
+        """
+        self.data_writer = RadarDataWriter(queue_size=WRITER_QUEUE_SIZE * len(radars), overflow_policy=overflow_policy)
+
+        self.controllers: dict[str, NavicoRadarController] = {}
+        try:
+            for name, multicast_interfaces in radars.items():
+                report_path = Path(report_output_dir).joinpath(name)
+                report_path.mkdir(parents=True, exist_ok=True)
+
+                self.controllers[name] = NavicoRadarController(
+                    multicast_interfaces=multicast_interfaces,
+                    report_output_dir=report_path,
+                    connect_timeout=connect_timeout,
+                    keep_alive_interval=keep_alive_interval,
+                    auto_connect=False,
+                    data_writer=self.data_writer,
+                    **controller_kwargs,
+                )
+
+            # The capture processes are forked before any thread is started.
+            for controller in self.controllers.values():
+                if controller.data_capture_process:
+                    controller.start_capture_process()
+
+            self.data_writer.start_thread()
+
+            for name, controller in self.controllers.items():
+                logging.info(f"Connecting radar {name}")
+                controller.connect()
+                if controller.is_connected:
+                    controller.start_keep_alive_thread()
+                    controller.get_reports()
+        except BaseException:
+            # The radars already connected (threads, capture processes, writer) are stopped.
+            logging.error("Failed to connect the radars. Disconnecting them.")
+            self.disconnect()
+            raise
+
+    def __getitem__(self, name: str) -> NavicoRadarController:
+        return self.controllers[name]
+
+    @property
+    def is_connected(self):
+        return all(controller.is_connected for controller in self.controllers.values())
+
+    @property
+    def is_receiving_data(self):
+        return all(controller.is_receiving_data for controller in self.controllers.values())
+
+    @is_receiving_data.setter
+    def is_receiving_data(self, value: bool):
+        for controller in self.controllers.values():
+            controller.is_receiving_data = value
+
+    @property
+    def is_recording(self):
+        return any(controller.data_recorder.is_recording for controller in self.controllers.values())
+
+    def start_sector_recording(self, output_dir: str, time_stamp: str, number_of_sector_to_record: int):
+        """Each radar records to `output_dir/name/YYYYMMDD/HH/{time_stamp}_sXX.raw`"""
+        for name, controller in self.controllers.items():
+            controller.data_recorder.start_sector_recording(
+                output_file=Path(output_dir).joinpath(name, time_stamp),
+                number_of_sector_to_record=number_of_sector_to_record,
+            )
+
+    def stop_recording_data(self):
+        for controller in self.controllers.values():
+            if controller.data_recorder.is_recording:
+                controller.data_recorder.stop_recording_data()
+
+    def wait_for_recording(self, timeout: float = None) -> bool:
+        """Returns False if the recording was stopped by the timeout."""
+        start_time = time.monotonic()
+        while self.is_recording:
+            if timeout is not None and time.monotonic() - start_time > timeout:
+                logging.warning("Recording timed out.")
+                self.stop_recording_data()
+                return False
+            time.sleep(.1)
+        return True
+
+    def disconnect(self):
+        for controller in self.controllers.values():
+            controller.disconnect()
+            controller.stop_capture_process()  # still running if the radar was not connected.
+
+        if not self.data_writer.is_running:
+            return
+        self.data_writer.stop()  # pending data is written before the thread exits.
+        self.data_writer.writer_thread.join()
@@ -0,0 +1,280 @@
+"""
+Radar simulator: multicasts data packets and reports on a local interface (e.g. loopback), so that the capture
+stack (NavicoRadarController, RadarDataRecorder, RadarDataWriter) can run without a radar.
+
+The data packets are either rebuilt from recorded `.raw` files or synthetic. They are sent at the rate of a
+radar turning at `rpm` times `speed`: `speed=1` is real time, `speed=0` sends as fast as possible (to measure
+the maximum packet rate the capture stack sustains). The 01C4 (status) and 02C4 (settings) reports are sent
+every REPORT_INTERVAL seconds, which is enough for the controller to detect the radar and connect.
+
+The packets are HALO packets (the range is encoded as such), set the controller radar type accordingly.
+
+Usage:
+
+    interfaces = MulticastInterfaces(
+        data=MulticastAddress("239.254.2.0", 6678),
+        send=MulticastAddress("239.254.2.0", 6680),
+        report=MulticastAddress("239.254.2.0", 6679),
+        interface="127.0.0.1",
+    )
+    simulator = RadarSimulator(multicast_interfaces=interfaces, rpm=24, speed=1)
+    simulator.start_report_thread()
+    simulator.play(raw_file_to_data_packets("20250101T000000_s1.raw"))
+    simulator.stop()
+
+or
+
+    python -m piradar.navico.navico_simulator --interface 127.0.0.1 --raw *.raw --speed 0
+"""
+import time
+import struct
+import socket
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from piradar.network import create_udp_socket
+from piradar.navico.navico_structure import RAW_SPOKE_DTYPE, RawFrameData, RadarReport01C4, RadarReport02C4
+from piradar.navico.navico_controller import (
+    MulticastInterfaces,
+    MulticastAddress,
+    RADAR_STATUS_STR2VAL_MAP,
+    MODE_STR2VAL_MAP,
+    RadarStatus,
+)
+from tools.unpack_utils import RawSweepFile
+
+SPOKES_PER_PACKET = RawFrameData.number_of_spokes
+SPOKES_PER_ROTATION = 2048  # HALO, angles 0-4094 by steps of 2.
+N_SPOKE_NUMBERS = 4096
+
+DEFAULT_RPM = 24
+REPORT_INTERVAL = 1  # seconds
+
+# Data packet: RawFrameData header ("<5BBH") and spokes.
+DATA_PACKET_DTYPE = np.dtype([
+    ("stuff", "u1", (5,)),
+    ("number_of_spokes", "u1"),
+    ("scanline_size", "<u2"),
+    ("spokes", RAW_SPOKE_DTYPE, (SPOKES_PER_PACKET,)),
+])
+
+DEFAULT_MULTICAST_INTERFACES = MulticastInterfaces(
+    data=MulticastAddress("239.254.2.0", 6678),
+    send=MulticastAddress("239.254.2.0", 6680),
+    report=MulticastAddress("239.254.2.0", 6679),
+    interface="127.0.0.1",
+)
+
+
+def make_data_packets(spoke_number: np.ndarray, angle: np.ndarray, intensity: np.ndarray, _range: np.ndarray,
+                      heading: np.ndarray = None) -> np.ndarray:
+    """
+    (n_packets,) DATA_PACKET_DTYPE array (`packets[i].tobytes()` is a data packet).
+
+    Parameters
+    ----------
+    spoke_number, angle:
+        (n_packets, 32)
+    intensity:
+        (n_packets, 32, 512) uint8
+    _range:
+        (n_packets,) meters, encoded as HALO large/small range.
+    heading:
+        (n_packets,) raw spoke heading. 0 if None.
+    """
+    packets = np.zeros(len(spoke_number), dtype=DATA_PACKET_DTYPE)
+    packets['number_of_spokes'] = SPOKES_PER_PACKET
+    packets['scanline_size'] = RAW_SPOKE_DTYPE.itemsize
+
+    header = packets['spokes']['header']
+    header['header_size'] = 24
+    header['status'] = 0x02
+    header['spoke_number'] = spoke_number
+    header['u00'] = 0x4400
+    header['angle'] = angle
+    header['large_range'] = 512  # HALO: range = large_range * small_range / 512
+    header['small_range'] = np.asarray(_range)[:, None]
+    header['heading'] = 0 if heading is None else np.asarray(heading)[:, None]
+    header['u02'] = 0xffffffff
+    packets['spokes']['data'] = intensity
+
+    return packets
+
+
+def raw_file_to_data_packets(raw_file: str) -> np.ndarray:
+    """Data packets rebuilt from the frames of a `.raw` file (one packet per frame)."""
+    with RawSweepFile(raw_file) as sweep:
+        frames = sweep.frames
+        return make_data_packets(
+            spoke_number=frames['spokes']['spoke_number'],
+            angle=frames['spokes']['angle'],
+            intensity=frames['spokes']['intensity'],
+            _range=frames['header']['range'],
+            heading=frames['header']['heading'],
+        )
+
+
+def synthetic_data_packets(n_rotations: int, _range: int = 1000, seed: int = 0) -> np.ndarray:
+    """Data packets of `n_rotations` rotations with random intensities."""
+    n_packets = n_rotations * SPOKES_PER_ROTATION // SPOKES_PER_PACKET
+    spoke_index = np.arange(n_packets * SPOKES_PER_PACKET).reshape(n_packets, SPOKES_PER_PACKET)
+    rng = np.random.default_rng(seed)
+    return make_data_packets(
+        spoke_number=spoke_index % N_SPOKE_NUMBERS,
+        angle=(2 * spoke_index) % N_SPOKE_NUMBERS,
+        intensity=rng.integers(0, 256, (n_packets, SPOKES_PER_PACKET, 512), dtype=np.uint8),
+        _range=np.full(n_packets, _range),
+    )
+
+
+def make_report_01c4(status: str = RadarStatus.transmit) -> bytes:
+    report = bytearray(RadarReport01C4.size)
+    report[:3] = bytes([0x01, 0xc4, RADAR_STATUS_STR2VAL_MAP[status]])
+    return bytes(report)
+
+
+def make_report_02c4(_range: int = 1000, gain: int = 50, mode: str = "custom") -> bytes:
+    """`_range` in meters."""
+    report = bytearray(RadarReport02C4.expected_size)
+    report[:2] = bytes([0x02, 0xc4])
+    offsets = RadarReport02C4.field_offsets
+    struct.pack_into("<L", report, offsets[2], int(_range * 10))  # decimeters
+    struct.pack_into("<B", report, offsets[4], MODE_STR2VAL_MAP[mode])
+    struct.pack_into("<B", report, offsets[7], gain)
+    return bytes(report)
+
+
+class RadarSimulator:
+    def __init__(
+            self,
+            multicast_interfaces: MulticastInterfaces = DEFAULT_MULTICAST_INTERFACES,
+            rpm: float = DEFAULT_RPM,
+            speed: float = 1,
+            _range: int = 1000,
+            gain: int = 50,
+    ):
+        """
+
+        Parameters
+        ----------
+        rpm:
+            Rotations per minute of the simulated radar.
+        speed:
+            Packet rate relative to the `rpm`. 1: real time. 0: as fast as possible.
+        _range, gain:
+            Sent in the 02C4 report.
+        """
+        self.address_set = multicast_interfaces
+        self.rpm = rpm
+        self.speed = speed
+        self.reports = [make_report_01c4(), make_report_02c4(_range=_range, gain=gain)]
+
+        self.send_socket = create_udp_socket()
+        self.send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.send_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.send_socket.setsockopt(
+            socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.address_set.interface)
+        )
+
+        self.stop_flag = False
+        self.report_thread: threading.Thread = None
+
+        self.packets_sent = 0
+        self.send_time = 0
+
+    @property
+    def packet_interval(self) -> float:
+        """Seconds between two data packets. 0 if `speed` is 0."""
+        if not self.speed:
+            return 0
+        return 60 / self.rpm / (SPOKES_PER_ROTATION / SPOKES_PER_PACKET) / self.speed
+
+    @property
+    def packet_rate(self) -> float:
+        return self.packets_sent / self.send_time if self.send_time else 0
+
+    def start_report_thread(self):
+        self.report_thread = threading.Thread(name="report", target=self.send_reports, daemon=True)
+        self.report_thread.start()
+
+    def send_reports(self):
+        address = (self.address_set.report.address, self.address_set.report.port)
+        while not self.stop_flag:
+            for report in self.reports:
+                self.send_socket.sendto(report, address)
+            time.sleep(REPORT_INTERVAL)
+
+    def play(self, packets: np.ndarray, loops: int = 1):
+        """Send the data packets (DATA_PACKET_DTYPE array or list of bytes), `loops` times."""
+        address = (self.address_set.data.address, self.address_set.data.port)
+        if isinstance(packets, np.ndarray):
+            buffer, size = memoryview(packets.tobytes()), packets.itemsize
+            packets = [buffer[i * size: (i + 1) * size] for i in range(len(packets))]
+        interval = self.packet_interval
+
+        start_time = next_time = time.perf_counter()
+        for _ in range(loops):
+            for packet in packets:
+                if self.stop_flag:
+                    break
+                if interval:  # the schedule is absolute so the sleep inaccuracy doesn't add up.
+                    next_time += interval
+                    delay = next_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                try:
+                    self.send_socket.sendto(packet, address)
+                except OSError as e:  # e.g. ENOBUFS when sending as fast as possible.
+                    logging.warning(f"Failed to send data packet: {e}")
+                    continue
+                self.packets_sent += 1
+        self.send_time += time.perf_counter() - start_time
+
+    def stop(self):
+        self.stop_flag = True
+        if self.report_thread is not None:
+            self.report_thread.join()
+        self.send_socket.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="Navico radar simulator")
+    parser.add_argument("--interface", default=DEFAULT_MULTICAST_INTERFACES.interface, help="Interface address.")
+    parser.add_argument("--raw", nargs="+", default=None, help="Raw files to replay. Synthetic data if not given.")
+    parser.add_argument("--rotations", type=int, default=10, help="Number of synthetic rotations.")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM)
+    parser.add_argument("--speed", type=float, default=1, help="1: real time, 0: as fast as possible.")
+    parser.add_argument("--loops", type=int, default=1)
+    parser.add_argument("--range", type=int, default=1000, help="Range (meters) of the synthetic data and report.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.raw:
+        packets = np.concatenate([raw_file_to_data_packets(raw_file) for raw_file in args.raw])
+    else:
+        packets = synthetic_data_packets(n_rotations=args.rotations, _range=args.range)
+
+    multicast_interfaces = MulticastInterfaces(
+        data=DEFAULT_MULTICAST_INTERFACES.data,
+        send=DEFAULT_MULTICAST_INTERFACES.send,
+        report=DEFAULT_MULTICAST_INTERFACES.report,
+        interface=args.interface,
+    )
+    simulator = RadarSimulator(multicast_interfaces=multicast_interfaces, rpm=args.rpm, speed=args.speed,
+                               _range=args.range)
+    simulator.start_report_thread()
+    try:
+        simulator.play(packets, loops=args.loops)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+    logging.info(f"{simulator.packets_sent} data packets sent ({simulator.packet_rate:.0f} packets/s)")
+
+
+if __name__ == "__main__":
+    main()
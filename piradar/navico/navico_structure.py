@@ -3,6 +3,8 @@ import struct
 
 from dataclasses import dataclass, fields, field
 
+import numpy as np
+
 __all__ = [
     "REPORTS_IDS",
     "RadarReport01B2",
@@ -15,6 +17,10 @@ __all__ = [
     "RadarReport12C4",
     "RawFrameData",
     "RawSpokeData",
+    "RAW_SPOKE_HEADER_DTYPE",
+    "RAW_SPOKE_DTYPE",
+    "RAW_FRAME_HEADER_SIZE",
+    "unpack_raw_frame_spokes",
     # "HaloHeadingPacket",
     # "HaloMysteryPacket",
 ]
@@ -567,6 +573,34 @@ class RawFrameData:
         ]
 
 
+# Numpy equivalent of RawSpokeData.cformats. Used to decode all the spokes of a frame in one call.
+RAW_SPOKE_HEADER_DTYPE = np.dtype([
+    ("header_size", "u1"),
+    ("status", "u1"),
+    ("spoke_number", "<u2"),
+    ("u00", "<u2"),
+    ("large_range", "<u2"),
+    ("angle", "<u2"),
+    ("heading", "<u2"),
+    ("small_range", "<u2"),
+    ("rotation_range", "<u2"),
+    ("u02", "<u4"),
+    ("u03", "<u4"),
+])
+RAW_SPOKE_DTYPE = np.dtype([("header", RAW_SPOKE_HEADER_DTYPE), ("data", "u1", (512,))])
+
+RAW_FRAME_HEADER_SIZE = RawFrameData.header_size
+
+
+def unpack_raw_frame_spokes(data) -> np.ndarray:
+    """
+    Structured (RAW_SPOKE_DTYPE) view of the spokes of a frame packet. Nothing is copied, the
+    spokes data stay in `data`. Trailing bytes that do not make a full spoke are ignored.
+    """
+    number_of_spokes = (len(data) - RAW_FRAME_HEADER_SIZE) // RAW_SPOKE_DTYPE.itemsize
+    return np.frombuffer(data, dtype=RAW_SPOKE_DTYPE, count=max(number_of_spokes, 0), offset=RAW_FRAME_HEADER_SIZE)
+
+
 if __name__ == "__main__":
 
     report_filename = "E:\\report\\raw_report_0x6c4.raw"
@@ -1,3 +1,9 @@
+import sys
+import errno
+import select
+import logging
+import ctypes
+import ctypes.util
 import psutil
 import socket
 import struct
@@ -5,6 +11,11 @@ import struct
 
 HOST = ""
 RCV_SOCKET_BUFSIZE = 65535
+DATA_RCVBUF_SIZE = 8 * 2 ** 20  # kernel receive buffer of the radar data socket: ~500 packets, a few rotations.
+
+# Not exposed by the socket module. Linux values (asm-generic/socket.h).
+SO_RCVBUFFORCE = getattr(socket, "SO_RCVBUFFORCE", 33 if sys.platform == "linux" else None)
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL", 40 if sys.platform == "linux" else None)
 
 
 def get_local_addresses():
@@ -36,9 +47,55 @@ def create_udp_socket():
     return sock
 
 
-def create_udp_multicast_receiver_socket(interface_address, group_address, group_port):
+def set_receive_buffer_size(sock: socket.socket, size: int) -> int:
+    """
+    Kernel receive buffer (SO_RCVBUF) size in bytes. SO_RCVBUFFORCE is tried first since SO_RCVBUF is capped
+    by `net.core.rmem_max` (SO_RCVBUFFORCE requires root/CAP_NET_ADMIN). Returns the effective size.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RCVBUFFORCE, size)
+    except (OSError, TypeError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+
+    effective_size = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if sys.platform == "linux":
+        effective_size //= 2  # linux doubles the value (bookkeeping overhead).
+
+    if effective_size < size:
+        logging.warning(f"Receive buffer size capped to {effective_size} bytes (requested {size}). "
+                        f"Increase net.core.rmem_max or run as root.")
+    return effective_size
+
+
+def enable_kernel_drop_counter(sock: socket.socket) -> bool:
+    """
+    SO_RXQ_OVFL: the number of packets dropped by the kernel (receive buffer full) since the socket was
+    created is sent as ancillary data with the packets (see `unpack_kernel_drop_counter`).
+    Returns False if not available.
+    """
+    if SO_RXQ_OVFL is None:
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+    except OSError:
+        return False
+    return True
+
+
+def unpack_kernel_drop_counter(ancdata: list) -> int | None:
+    """Drop counter from the `recvmsg` ancillary data. None if it is not there (no drop since the socket was created)."""
+    for level, _type, data in ancdata:
+        if level == socket.SOL_SOCKET and _type == SO_RXQ_OVFL:
+            return int.from_bytes(data[:4], sys.byteorder)
+    return None
+
+
+def create_udp_multicast_receiver_socket(interface_address, group_address, group_port, rcvbuf_size: int = None):
     sock = create_udp_socket()
 
+    if rcvbuf_size is not None:
+        set_receive_buffer_size(sock, rcvbuf_size)
+
     sock.bind(("", group_port))
 
     mreq = struct.pack("4s4s", socket.inet_aton(group_address), socket.inet_aton(interface_address))
@@ -51,3 +108,130 @@ def ip_address_to_string(addr):
     return socket.inet_ntoa(struct.pack('!I', addr))
 
 
+class IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(IoVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class CMsgHdr(ctypes.Structure):
+    _fields_ = [("cmsg_len", ctypes.c_size_t), ("cmsg_level", ctypes.c_int), ("cmsg_type", ctypes.c_int)]
+
+
+def load_recvmmsg():
+    """libc `recvmmsg` (linux) or None."""
+    if sys.platform != "linux":
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        recvmmsg = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+class BatchReceiver:
+    """
+    Receives every datagram already queued on the socket (up to `batch_size`) with a single `recvmmsg` syscall,
+    into preallocated slots. Falls back to a `recvmsg_into` loop where `recvmmsg` is not available.
+
+    The returned packets are views of the slots: they are overwritten by the next `receive()`.
+    """
+
+    def __init__(self, sock: socket.socket, batch_size: int = 32, slot_size: int = RCV_SOCKET_BUFSIZE):
+        self.sock = sock
+        self.batch_size = batch_size
+        self.slot_size = slot_size
+
+        self.buffer = bytearray(batch_size * slot_size)
+        self.slots = [memoryview(self.buffer)[i * slot_size: (i + 1) * slot_size] for i in range(batch_size)]
+
+        self.kernel_drop_counter: int = None  # SO_RXQ_OVFL, if enabled on the socket.
+
+        self.poller = select.poll()
+        self.poller.register(sock, select.POLLIN)
+
+        self._recvmmsg = load_recvmmsg()
+        if self._recvmmsg is not None:
+            self._init_mmsghdr()
+
+    def _init_mmsghdr(self):
+        self._cmsg_space = socket.CMSG_SPACE(4)  # kernel drop counter (uint32)
+        self._control = ctypes.create_string_buffer(self.batch_size * self._cmsg_space)
+        self._c_buffer = (ctypes.c_char * len(self.buffer)).from_buffer(self.buffer)
+        self._iovecs = (IoVec * self.batch_size)()
+        self._msgs = (MMsgHdr * self.batch_size)()
+
+        buffer_address = ctypes.addressof(self._c_buffer)
+        control_address = ctypes.addressof(self._control)
+        for i in range(self.batch_size):
+            self._iovecs[i].iov_base = buffer_address + i * self.slot_size
+            self._iovecs[i].iov_len = self.slot_size
+            self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            self._msgs[i].msg_hdr.msg_iovlen = 1
+            self._msgs[i].msg_hdr.msg_control = control_address + i * self._cmsg_space
+
+    def receive(self, timeout: float) -> list[memoryview]:
+        """Blocks up to `timeout` seconds for the first datagram. Returns [] on timeout."""
+        if not self.poller.poll(timeout * 1000):
+            return []
+        if self._recvmmsg is not None:
+            return self._receive_mmsg()
+        return self._receive_loop()
+
+    def _receive_mmsg(self) -> list[memoryview]:
+        for msg in self._msgs:
+            msg.msg_hdr.msg_controllen = self._cmsg_space
+
+        n_msgs = self._recvmmsg(self.sock.fileno(), self._msgs, self.batch_size, socket.MSG_DONTWAIT, None)
+        if n_msgs < 0:
+            _errno = ctypes.get_errno()
+            if _errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(_errno, f"recvmmsg: {errno.errorcode.get(_errno)}")
+
+        packets = []
+        for i in range(n_msgs):
+            packets.append(self.slots[i][:self._msgs[i].msg_len])
+            self._read_kernel_drop_counter(i)
+        return packets
+
+    def _read_kernel_drop_counter(self, i: int):
+        msg_hdr = self._msgs[i].msg_hdr
+        if msg_hdr.msg_controllen < ctypes.sizeof(CMsgHdr) + 4:
+            return
+        cmsg = CMsgHdr.from_buffer(self._control, i * self._cmsg_space)
+        if cmsg.cmsg_level == socket.SOL_SOCKET and cmsg.cmsg_type == SO_RXQ_OVFL:
+            data_offset = i * self._cmsg_space + socket.CMSG_LEN(0)
+            self.kernel_drop_counter = ctypes.c_uint32.from_buffer(self._control, data_offset).value
+
+    def _receive_loop(self) -> list[memoryview]:
+        packets = []
+        for slot in self.slots:
+            if packets and not self.poller.poll(0):
+                break
+            try:
+                n_bytes, ancdata, _, _ = self.sock.recvmsg_into([slot], socket.CMSG_SPACE(4))
+            except (socket.timeout, BlockingIOError):
+                break
+            packets.append(slot[:n_bytes])
+            kernel_drop_counter = unpack_kernel_drop_counter(ancdata)
+            if kernel_drop_counter is not None:
+                self.kernel_drop_counter = kernel_drop_counter
+        return packets
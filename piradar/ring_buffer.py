@@ -0,0 +1,173 @@
+"""
+Fixed slots ring buffer of datagrams between a receive thread (producer) and a processing thread (consumer).
+
+The slots are preallocated in a single buffer: the producer receives directly into the next free slot
+(`socket.recv_into(ring.write_slot())`) and commits it. It is lock free: only the producer writes `head` and
+only the consumer writes `tail` (single producer, single consumer). An Event wakes the consumer up.
+
+SharedPacketRing is the same ring in `multiprocessing.shared_memory`, so the producer can be another process.
+Its `head` and `tail` are published under a multiprocessing Lock: without the GIL between the processes, nothing
+else orders the slot writes before the counter writes (e.g. on ARM).
+"""
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class PacketRing:
+    def __init__(self, n_slots: int, slot_size: int, buffer=None, data_available: threading.Event = None):
+        self.n_slots = n_slots
+        self.slot_size = slot_size
+
+        self.buffer = buffer if buffer is not None else bytearray(n_slots * slot_size)
+        self.slots = [memoryview(self.buffer)[i * slot_size: (i + 1) * slot_size] for i in range(n_slots)]
+        self.lengths = [0] * n_slots
+
+        self._init_counters()
+        self.max_occupancy = 0  # (consumer)
+
+        self._data_available = data_available or threading.Event()
+
+    def _init_counters(self):
+        self.head = 0  # slots committed (producer).
+        self.tail = 0  # slots released (consumer).
+        self.dropped = 0  # packets dropped because the ring was full (producer).
+
+    @property
+    def occupancy(self) -> int:
+        return self.head - self.tail
+
+    @property
+    def is_full(self) -> bool:
+        return self.occupancy >= self.n_slots
+
+    def write_slot(self) -> memoryview | None:
+        """Next free slot. None if the ring is full (call `drop()`)."""
+        if self.is_full:
+            return None
+        return self.slots[self.head % self.n_slots]
+
+    def commit(self, n_bytes: int):
+        """Publish the `n_bytes` written in the `write_slot()`."""
+        self.lengths[self.head % self.n_slots] = n_bytes
+        self.head += 1
+        self._data_available.set()
+
+    def drop(self):
+        self.dropped += 1
+
+    def read(self, timeout: float = None) -> memoryview | None:
+        """
+        Oldest packet (view of its slot), blocks up to `timeout` seconds. None on timeout.
+        The slot is not reused until `release()` is called.
+        """
+        if self.head == self.tail:
+            self._data_available.clear()
+            if self.head == self.tail:  # checked again since the producer could have committed before the clear.
+                self._data_available.wait(timeout)
+            if self.head == self.tail:
+                return None
+        self.max_occupancy = max(self.max_occupancy, self.occupancy)
+        index = self.tail % self.n_slots
+        return self.slots[index][:self.lengths[index]]
+
+    def release(self):
+        self.tail += 1
+
+    def summary(self) -> str:
+        return f"ring occupancy {self.occupancy}/{self.n_slots} (max {self.max_occupancy}), {self.dropped} dropped"
+
+
+class SharedPacketRing(PacketRing):
+    """
+    PacketRing in shared memory: [header (uint32): head, tail, dropped, kernel_drop_counter][lengths][slots]
+
+    The counters are uint32 and wrap around, so `n_slots` must be a power of 2. `head` and `tail` are read and
+    written holding `lock`: the lock release and acquire are the memory barriers making a slot visible to the
+    consumer once `head` is, and free to the producer once `tail` is.
+
+    Create it in the consumer process (`SharedPacketRing(n_slots, slot_size, mp_context=...)`) and attach to it in
+    the producer process (`SharedPacketRing(n_slots, slot_size, name=ring.name, data_available=ring.data_available,
+    lock=ring.lock)`), started with the same `mp_context`. The creator unlinks the shared memory on `close()`.
+    """
+    header_size = 4
+
+    def __init__(
+            self,
+            n_slots: int,
+            slot_size: int,
+            name: str = None,
+            data_available: mp.Event = None,
+            lock: mp.Lock = None,
+            mp_context: mp.context.BaseContext = None,
+    ):
+        if n_slots & (n_slots - 1):
+            raise ValueError("n_slots must be a power of 2.")
+
+        self.is_owner = name is None
+        header_nbytes = 4 * (self.header_size + n_slots)
+        if self.is_owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=header_nbytes + n_slots * slot_size)
+            mp_context = mp_context or mp.get_context()
+            data_available = mp_context.Event()
+            lock = mp_context.Lock()
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._lock = lock
+
+        self._header = np.ndarray((self.header_size,), dtype=np.uint32, buffer=self.shm.buf)
+
+        super().__init__(
+            n_slots=n_slots,
+            slot_size=slot_size,
+            buffer=self.shm.buf[header_nbytes: header_nbytes + n_slots * slot_size],
+            data_available=data_available,
+        )
+        self.lengths = np.ndarray((n_slots,), dtype=np.uint32, buffer=self.shm.buf, offset=4 * self.header_size)
+
+    def _init_counters(self):
+        if self.is_owner:
+            self._header[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def data_available(self) -> mp.Event:
+        return self._data_available
+
+    @property
+    def lock(self) -> mp.Lock:
+        return self._lock
+
+    def _get_synchronized(self, index: int) -> int:
+        with self._lock:
+            return int(self._header[index])
+
+    def _set_synchronized(self, index: int, value: int):
+        with self._lock:
+            self._header[index] = value % 2 ** 32
+
+    head = property(lambda self: self._get_synchronized(0), lambda self, value: self._set_synchronized(0, value))
+    tail = property(lambda self: self._get_synchronized(1), lambda self, value: self._set_synchronized(1, value))
+    dropped = property(lambda self: int(self._header[2]), lambda self, value: self._header.__setitem__(2, value % 2 ** 32))
+    kernel_drop_counter = property(
+        lambda self: int(self._header[3]), lambda self, value: self._header.__setitem__(3, value % 2 ** 32)
+    )
+
+    @property
+    def occupancy(self) -> int:
+        return (self.head - self.tail) % 2 ** 32
+
+    def close(self):
+        # The views (slots, counters) must be released before the shared memory can be closed.
+        self.slots = self.lengths = self._header = self.buffer = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # a packet (view) is still referenced, the memory is unmapped when the process exits.
+        if self.is_owner:
+            self.shm.unlink()
@@ -8,6 +8,7 @@ from pathlib import Path
 from piradar.logger import init_logging
 
 from piradar.navico.navico_controller import NavicoRadarController, RadarStatus
+from piradar.navico.navico_multi_controller import MultiRadarController
 
 from piradar.gpio_utils import gpio_controller
 
@@ -15,20 +16,53 @@ from piradar.scheduled_scan_utils import main_init_sequence, run_scheduled_scans
 
 from piradar.configs_utils import load_configs
 
-configure_exit_handling()
+from piradar.l0_conversion import L0Converter
+
+from piradar.metrics import MetricsDumper
+
+RAW_FILE_CLOSE_TIMEOUT = 30  # seconds
+
+
+def submit_to_l0_conversion(
+        radar_controller: NavicoRadarController, time_stamp: str, l0_converter: L0Converter, station: str = None
+):
+    # The raw files are complete once the writer thread has closed the last one.
+    if radar_controller.data_recorder.raw_file_closed.wait(timeout=RAW_FILE_CLOSE_TIMEOUT):
+        l0_converter.submit(
+            list(Path(radar_controller.data_recorder.output_dir).glob(f"{time_stamp}_s*.raw")),
+            station=station,
+        )
+    else:
+        logging.warning(f"Raw files of {time_stamp} not closed by the writer. Not converted to L0.")
+
+
+def stop_transmit(radar_controller: NavicoRadarController):
+    for _ in range(5):  # tries to shut down radar transmit 5 times at 1sec interval.
+        if radar_controller.reports.status.status is RadarStatus.standby:
+            return  # You want to scan to exit here !
+
+        radar_controller.standby()
+        radar_controller.get_reports()
+        time.sleep(1)
+
+    raise NavicoRadarError("Radar did not stopped transmitting.")
 
 
 def basic_scan(
         radar_controller: NavicoRadarController,
         dt: datetime.datetime,
         output_data_path: str,
-        number_of_sector_to_record: int
+        number_of_sector_to_record: int,
+        l0_converter: L0Converter = None,
 ):
     time_stamp = dt.astimezone(datetime.UTC).strftime("%Y%m%dT%H%M%S")
 
     if start_transmit(radar_controller) is True:
         output_file = Path(output_data_path).joinpath(f"{time_stamp}")
 
+        if l0_converter is not None:
+            l0_converter.pause()
+
         radar_controller.data_recorder.start_sector_recording(
             output_file=output_file,
             number_of_sector_to_record=number_of_sector_to_record,
@@ -41,22 +75,61 @@ def basic_scan(
 
         gpio_controller.is_transmitting_led()
 
-        for _ in range(5):  # tries to shut down radar transmit 5 times at 1sec interval.
-            if radar_controller.reports.status.status is RadarStatus.standby:
-                gpio_controller.led_off()
-                return  # You want to scan to exit here !
+        stop_transmit(radar_controller)
 
-            radar_controller.standby()
-            radar_controller.get_reports()
-            time.sleep(1)
+        if l0_converter is not None:
+            # The radar is back in standby before waiting for the raw files and resuming the conversion.
+            submit_to_l0_conversion(radar_controller, time_stamp, l0_converter)
+            l0_converter.resume()
 
-        raise NavicoRadarError("Radar did not stopped transmitting.")
+        gpio_controller.led_off()
 
     else:
         logging.error("Failed to start radar scan")
         raise NavicoRadarError("Radar did not start transmitting.")
 
 
+def multi_scan(
+        radars: MultiRadarController,
+        dt: datetime.datetime,
+        output_data_path: str,
+        number_of_sector_to_record: int,
+        l0_converter: L0Converter = None,
+):
+    """`basic_scan` of every radar (group) at once. Each one is recorded to `output_data_path/name/`."""
+    time_stamp = dt.astimezone(datetime.UTC).strftime("%Y%m%dT%H%M%S")
+
+    for name, radar_controller in radars.controllers.items():
+        if start_transmit(radar_controller) is not True:
+            logging.error(f"Failed to start radar {name} scan")
+            raise NavicoRadarError("Radar did not start transmitting.")
+
+    if l0_converter is not None:
+        l0_converter.pause()
+
+    radars.start_sector_recording(
+        output_dir=output_data_path,
+        time_stamp=time_stamp,
+        number_of_sector_to_record=number_of_sector_to_record,
+    )
+
+    gpio_controller.is_recording_led()
+
+    radars.wait_for_recording()
+
+    gpio_controller.is_transmitting_led()
+
+    for radar_controller in radars.controllers.values():
+        stop_transmit(radar_controller)
+
+    if l0_converter is not None:
+        for name, radar_controller in radars.controllers.items():
+            submit_to_l0_conversion(radar_controller, time_stamp, l0_converter, station=f"{l0_converter.station}_{name}")
+        l0_converter.resume()
+
+    gpio_controller.led_off()
+
+
 def parse_arguments():
     parser = argparse.ArgumentParser(prog='Halo Radar Scheduled Scan')
 
@@ -83,8 +156,29 @@ def main():
     config = load_configs(args.configs_dir)
 
     logging.info("Running Basic Program Script.")
+
+    l0_converter = None
+    if config['L0_CONVERSION']['enable']:
+        # Started first since the conversion process is forked (no other thread must be running).
+        l0_converter = L0Converter(
+            output_dir=Path(config['DRIVES']['drive_path']).joinpath(config['L0_CONVERSION']['l0_dir']),
+            station=config['L0_CONVERSION']['station'],
+            heading=config['L0_CONVERSION']['heading'],
+            lat=config['L0_CONVERSION']['lat'],
+            lon=config['L0_CONVERSION']['lon'],
+            cpu_budget=config['L0_CONVERSION']['cpu_budget'],
+        )
+        l0_converter.start()
+
     radar_controller, output_data_path, output_report_path = main_init_sequence(config)
 
+    if config['METRICS']['enable']:
+        MetricsDumper(
+            path=config['METRICS']['path'],
+            socket_path=config['METRICS']['socket_path'],
+            interval=config['METRICS']['interval'],
+        ).start()
+
     ## ERROR WILL BE RAISE IN HERE.
     # - Did not start to transmit
     # - Did not stop to transmit
@@ -92,13 +186,15 @@ def main():
     run_scheduled_scans(  # <- Watchdog for receiving data is hidden in here.
         radar_controller=radar_controller,
         scan_interval=config['SCAN']['scan_interval'],
-        scan_func=basic_scan,
+        scan_func=multi_scan if isinstance(radar_controller, MultiRadarController) else basic_scan,
         output_data_path=output_data_path,
         number_of_sector_to_record=config['SCAN']['scan_count'],
+        l0_converter=l0_converter,
     )
 
 
 if __name__ == "__main__":
+    configure_exit_handling()
     try:
         main()
     except Exception as e:
@@ -11,6 +11,7 @@ from dataclasses import dataclass
 
 from piradar.navico.navico_controller import NavicoRadarController, RadarStatus, RANGES_PRESETS, MulticastInterfaces, \
     MulticastAddress
+from piradar.navico.navico_multi_controller import MultiRadarController, locate_radar_groups
 
 from piradar.network import check_interface_inet_is_up
 
@@ -286,39 +287,37 @@ def valide_radar_settings(settings: RadarUserSettings, radar_controller: NavicoR
         logging.error(f"{key} was not set. Expected: {v1}, Actual: {v2}")
 
 
-def main_init_sequence(config: dict):
-    startup_timeout = config['TIMEOUTS']['radar_boot_timeout']
-    connect_timeout = config['TIMEOUTS']['raspberry_boot_timeout']
-
-    radar_user_settings = RadarUserSettings(
-        _range=config['RADAR_SETTINGS']['range'],
+def make_radar_user_settings(radar_settings: dict, config: dict) -> RadarUserSettings:
+    """`radar_settings`: [RADAR_SETTINGS] or a [RADAR_SETTINGS_<group>] section."""
+    return RadarUserSettings(
+        _range=radar_settings['range'],
 
-        bearing=config['RADAR_SETTINGS']['bearing'],
-        antenna_height=config['RADAR_SETTINGS']['antenna_height'],
+        bearing=radar_settings['bearing'],
+        antenna_height=radar_settings['antenna_height'],
 
-        gain=config['RADAR_SETTINGS']['gain'],
-        gain_auto=config['RADAR_SETTINGS']['gain_auto'],
+        gain=radar_settings['gain'],
+        gain_auto=radar_settings['gain_auto'],
 
-        sea_clutter=config['RADAR_SETTINGS']['sea_clutter'],
-        sea_clutter_auto=config['RADAR_SETTINGS']['sea_clutter_auto'],
+        sea_clutter=radar_settings['sea_clutter'],
+        sea_clutter_auto=radar_settings['sea_clutter_auto'],
 
-        rain_clutter=config['RADAR_SETTINGS']['rain_clutter'],
-        rain_clutter_auto=config['RADAR_SETTINGS']['rain_clutter_auto'],
+        rain_clutter=radar_settings['rain_clutter'],
+        rain_clutter_auto=radar_settings['rain_clutter_auto'],
 
-        side_lobe_suppression=config['RADAR_SETTINGS']['side_lobe_suppression'],
-        side_lobe_suppression_auto=config['RADAR_SETTINGS']['side_lobe_suppression_auto'],
+        side_lobe_suppression=radar_settings['side_lobe_suppression'],
+        side_lobe_suppression_auto=radar_settings['side_lobe_suppression_auto'],
 
-        sea_state=config['RADAR_SETTINGS']['sea_state'],
-        mode=config['RADAR_SETTINGS']['mode'],
+        sea_state=radar_settings['sea_state'],
+        mode=radar_settings['mode'],
 
-        noise_rejection=config['RADAR_SETTINGS']['noise_rejection'],
+        noise_rejection=radar_settings['noise_rejection'],
 
-        interference_rejection=config['RADAR_SETTINGS']['interference_rejection'],
-        # local_interference_filter=config['RADAR_SETTINGS']['local_interference_filter'],  # CANT BE SET IN HALO
+        interference_rejection=radar_settings['interference_rejection'],
+        # local_interference_filter=radar_settings['local_interference_filter'],  # CANT BE SET IN HALO
 
-        target_expansion=config['RADAR_SETTINGS']['target_expansion'],
-        # target_separation=config['RADAR_SETTINGS']['target_separation'], # CANT BE SET IN HALO
-        # target_boost=config['RADAR_SETTINGS']['target_boost'],  # CANT BE SET IN HALO
+        target_expansion=radar_settings['target_expansion'],
+        # target_separation=radar_settings['target_separation'], # CANT BE SET IN HALO
+        # target_boost=radar_settings['target_boost'],  # CANT BE SET IN HALO
 
         blanking_s0_enable=config['SECTOR_BLANKING_0']['enable'],
         blanking_s0_start=config['SECTOR_BLANKING_0']['start'],
@@ -337,6 +336,42 @@ def main_init_sequence(config: dict):
         blanking_s3_stop=config['SECTOR_BLANKING_3']['stop'],
     )
 
+
+def configure_radar(radar_controller: NavicoRadarController, radar_user_settings: RadarUserSettings, output_report_path):
+    if radar_controller.raw_reports.r01c4 is None:
+        logging.info(f"Radar status reports (01c4) was not received.")
+
+        raise Exception("Radar type not received. Communication Error")
+
+    gpio_controller.setting_radar_led()
+
+    set_user_radar_settings(radar_user_settings, radar_controller)
+    radar_controller.get_reports()
+    time.sleep(1)  # just to be sure all reports are in and analyzed.
+
+    valide_radar_settings(radar_user_settings, radar_controller)
+    write_radar_settings(radar_user_settings, radar_controller, output_report_path)
+    # DO SOMETHING LIKE PRINT REPORT WITH TIMESTAMP IF IT FAILS
+
+    # Not working on HALO fix me
+    # set_scan_speed(radar_controller=radar_controller, scan_speed=scan_speed, standby=True)
+
+    # disable since we are unable to set it yet...
+    for si in range(4):
+        radar_controller.enable_sector_blanking(si, False)
+
+    # this shoud be put in config. FIXME
+    # radar_controller.set_mode("custom")
+
+
+def main_init_sequence(config: dict):
+    """
+    Returns a NavicoRadarController, or a MultiRadarController if `radar_groups` are set (network config), and
+    the data and report paths.
+    """
+    startup_timeout = config['TIMEOUTS']['radar_boot_timeout']
+    connect_timeout = config['TIMEOUTS']['raspberry_boot_timeout']
+
     # scan_speed = config['RADAR_SETTINGS']['scan_speed'] # NOT USE FOR HALO
 
     ### NETWORK ###
@@ -353,6 +388,14 @@ def main_init_sequence(config: dict):
         send=MulticastAddress(*send_address),
         interface=interface_addr
     )
+    radar_groups = config['NETWORK']['radar_groups']
+
+    controller_kwargs = dict(
+        data_rcvbuf_size=config['NETWORK']['data_rcvbuf_size'],
+        data_batch_size=config['NETWORK']['data_batch_size'],
+        data_ring_size=config['NETWORK']['data_ring_size'],
+        data_capture_process=config['NETWORK']['data_capture_process'],
+    )
 
     ### Write data ###
     output_drive = config['DRIVES']['drive_path']
@@ -382,36 +425,34 @@ def main_init_sequence(config: dict):
     gpio_controller.radar_power.on()
     gpio_controller.waiting_for_radar_led()
 
-    radar_controller = NavicoRadarController(
-        multicast_interfaces=mcast_ifaces,
-        report_output_dir=output_report_path,
-        connect_timeout=connect_timeout  # the radar has 1 minutes to boot up and be available on the network
-    )
+    if radar_groups:
+        groups = locate_radar_groups(interface=interface_addr, timeout=connect_timeout)
+        missing_groups = [name for name in radar_groups if name not in groups]
+        if missing_groups:
+            logging.info(f"Radar report 01B2 was not received.")
 
-    if radar_controller.raw_reports.r01c4 is None:
-        logging.info(f"Radar status reports (01c4) was not received.")
+            raise Exception(f"Radar groups {missing_groups} not located. Communication Error")
 
-        raise Exception("Radar type not received. Communication Error")
+        radar_controller = MultiRadarController(
+            radars={name: groups[name] for name in radar_groups},
+            report_output_dir=output_report_path,
+            connect_timeout=connect_timeout,
+            **controller_kwargs,
+        )
 
-    gpio_controller.setting_radar_led()
+        for name, controller in radar_controller.controllers.items():
+            radar_settings = config.get(f'RADAR_SETTINGS_{name}', config['RADAR_SETTINGS'])
+            configure_radar(controller, make_radar_user_settings(radar_settings, config), output_report_path / name)
 
-    set_user_radar_settings(radar_user_settings, radar_controller)
-    radar_controller.get_reports()
-    time.sleep(1)  # just to be sure all reports are in and analyzed.
-
-    valide_radar_settings(radar_user_settings, radar_controller)
-    write_radar_settings(radar_user_settings, radar_controller, output_report_path)
-    # DO SOMETHING LIKE PRINT REPORT WITH TIMESTAMP IF IT FAILS
-
-    # Not working on HALO fix me
-    # set_scan_speed(radar_controller=radar_controller, scan_speed=scan_speed, standby=True)
-
-    # disable since we are unable to set it yet...
-    for si in range(4):
-        radar_controller.enable_sector_blanking(si, False)
-
-    # this shoud be put in config. FIXME
-    # radar_controller.set_mode("custom")
+    else:
+        radar_controller = NavicoRadarController(
+            multicast_interfaces=mcast_ifaces,
+            report_output_dir=output_report_path,
+            connect_timeout=connect_timeout,  # the radar has 1 minutes to boot up and be available on the network
+            **controller_kwargs,
+        )
+
+        configure_radar(radar_controller, make_radar_user_settings(config['RADAR_SETTINGS'], config), output_report_path)
 
     logging.info("Ready to record.")
     gpio_controller.ready_to_record_led()
@@ -0,0 +1,63 @@
+"""BatchReceiver on a loopback UDP socket, with recvmmsg and with the recvmsg_into fallback."""
+import socket
+
+import pytest
+
+from piradar.network import BatchReceiver, enable_kernel_drop_counter, load_recvmmsg
+
+BATCH_SIZE = 8
+N_PACKETS = 20
+
+
+@pytest.fixture
+def sockets():
+    receive_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receive_socket.bind(("127.0.0.1", 0))
+    send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    yield receive_socket, send_socket
+    receive_socket.close()
+    send_socket.close()
+
+
+def make_receiver(receive_socket: socket.socket, use_recvmmsg: bool) -> BatchReceiver:
+    if use_recvmmsg and load_recvmmsg() is None:
+        pytest.skip("recvmmsg not available")
+    receiver = BatchReceiver(receive_socket, batch_size=BATCH_SIZE, slot_size=2048)
+    if not use_recvmmsg:
+        receiver._recvmmsg = None
+    return receiver
+
+
+@pytest.mark.parametrize("use_recvmmsg", [True, False])
+def test_receive_batches(sockets, use_recvmmsg):
+    receive_socket, send_socket = sockets
+    receiver = make_receiver(receive_socket, use_recvmmsg)
+    enable_kernel_drop_counter(receive_socket)
+
+    sent = [bytes([i]) * (100 + i) for i in range(N_PACKETS)]
+    for packet in sent:
+        send_socket.sendto(packet, receive_socket.getsockname())
+
+    received = []
+    while len(received) < N_PACKETS:
+        packets = receiver.receive(timeout=1)
+        assert 0 < len(packets) <= BATCH_SIZE
+        received.extend(bytes(packet) for packet in packets)  # copies: the slots are reused.
+
+    assert received == sent
+    assert receiver.receive(timeout=0.05) == []
+    assert not receiver.kernel_drop_counter  # None until the kernel drops a packet.
+
+
+@pytest.mark.parametrize("use_recvmmsg", [True, False])
+def test_packets_are_slot_views(sockets, use_recvmmsg):
+    receive_socket, send_socket = sockets
+    receiver = make_receiver(receive_socket, use_recvmmsg)
+
+    send_socket.sendto(b"first", receive_socket.getsockname())
+    [packet] = receiver.receive(timeout=1)
+    assert bytes(packet) == b"first"
+
+    send_socket.sendto(b"second", receive_socket.getsockname())
+    receiver.receive(timeout=1)
+    assert bytes(packet) == b"secon"  # overwritten by the next receive.
@@ -0,0 +1,117 @@
+"""Columnar (.npz) indexes: binary-search time selection, matching the selection on the .csv index."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tools.processing_utils import (
+    RAW_INDEX_DTYPES,
+    load_index,
+    columnar_index_path,
+    sel_file_by_time_slice,
+)
+
+N_ROWS = 200
+T0 = pd.Timestamp("2025-01-01")
+
+RAW_INTERVALS = [
+    (None, None),
+    ("2025-01-01T01:00:00", "2025-01-01T02:00:00"),
+    (None, "2025-01-01T00:30:00"),
+    ("2025-01-01T05:00:00", None),
+    ("2025-01-01T01:30:00", "2025-01-01T01:30:00"),  # a single timestamp.
+]
+L1_INTERVALS = [
+    (None, None),
+    ("2025-01-02T00:30:00", "2025-01-02T02:00:00"),
+    (None, "2025-01-01T05:00:00"),
+    ("2025-01-08T20:00:00", None),
+]
+
+
+@pytest.fixture
+def raw_index(tmp_path):
+    rng = np.random.default_rng(0)
+    timestamps = T0 + pd.to_timedelta(rng.permutation(N_ROWS) * 120, "s")  # not sorted.
+    dataframe = pd.DataFrame({
+        'station': "st",
+        'timestamp': timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+        'path': [f"/raw/{t:%Y%m%d/%H}/{t:%Y%m%dT%H%M%S}_s01.raw" for t in timestamps],
+        'size': rng.integers(0, 10 ** 7, N_ROWS),
+        'mtime_ns': rng.integers(0, 2 * 10 ** 18, N_ROWS),
+        'n_frames': pd.array(rng.integers(0, 100, N_ROWS), dtype="Int64"),
+    })
+    dataframe.loc[5, 'n_frames'] = pd.NA
+    path = tmp_path.joinpath("st_raw_index.csv")
+    dataframe.to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def L1_index(tmp_path):
+    rng = np.random.default_rng(1)
+    start_times = pd.date_range(T0, periods=N_ROWS, freq="h")
+    end_times = start_times + pd.to_timedelta(59 * 60 + rng.integers(-3600, 3600, N_ROWS), "s")  # not sorted.
+    dataframe = pd.DataFrame({
+        'station': "st",
+        'start_time': start_times.astype(str),
+        'end_time': end_times.astype(str),
+        'number_of_scan': 60,
+        'path': [f"/L1/{i}.nc" for i in range(N_ROWS)],
+    })
+    path = tmp_path.joinpath("st_L1_index.csv")
+    dataframe.to_csv(path, index=False)
+    return path
+
+
+def csv_selection(path, start_time, end_time) -> pd.DataFrame:
+    return sel_file_by_time_slice(pd.read_csv(path, dtype=RAW_INDEX_DTYPES), start_time, end_time)
+
+
+@pytest.mark.parametrize("index", ["raw_index", "L1_index"])
+def test_same_selection_as_csv(index, request):
+    path = request.getfixturevalue(index)
+    intervals = RAW_INTERVALS if index == "raw_index" else L1_INTERVALS
+
+    for start_time, end_time in intervals:
+        selection = load_index(path, start_time, end_time)
+        expected = csv_selection(path, start_time, end_time)
+
+        assert columnar_index_path(path).is_file()
+        assert len(selection) > 0
+        assert list(selection['path']) == list(expected['path'])
+        time_column = 'timestamp' if 'timestamp' in selection else 'start_time'
+        assert selection[time_column].is_monotonic_increasing
+
+
+def test_raw_index_dtypes(raw_index):
+    selection = load_index(raw_index)
+    expected = pd.read_csv(raw_index, dtype=RAW_INDEX_DTYPES).sort_values('timestamp').reset_index(drop=True)
+
+    assert selection['n_frames'].dtype == "Int64"
+    assert selection['n_frames'].isna().sum() == 1
+    pd.testing.assert_series_equal(selection['n_frames'], expected['n_frames'])
+    np.testing.assert_array_equal(selection['mtime_ns'].to_numpy(np.int64), expected['mtime_ns'].to_numpy(np.int64))
+
+
+@pytest.mark.parametrize("start_time, end_time", [
+    ("2025-01-01T02:00:00", "2025-01-01T01:00:00"),  # start_time after end_time.
+    ("2030-01-01", None),
+    (None, "2020-01-01"),
+])
+def test_no_values(L1_index, raw_index, start_time, end_time):
+    for path in [raw_index, L1_index]:
+        with pytest.raises(ValueError, match="No values"):
+            load_index(path, start_time, end_time)
+
+
+def test_remade_when_csv_is_newer(raw_index):
+    assert len(load_index(raw_index)) == N_ROWS
+
+    dataframe = pd.read_csv(raw_index)
+    dataframe.iloc[:N_ROWS // 2].to_csv(raw_index, index=False)
+    npz_mtime_ns = os.stat(columnar_index_path(raw_index)).st_mtime_ns
+    os.utime(raw_index, ns=(npz_mtime_ns + 10 ** 9, npz_mtime_ns + 10 ** 9))
+
+    assert len(load_index(raw_index)) == N_ROWS // 2
@@ -0,0 +1,93 @@
+"""Incremental L0/L1 processing: up to date outputs are skipped, changed sources and old index rows are remade."""
+import os
+
+import pandas as pd
+
+from piradar.navico.navico_simulator import synthetic_data_packets
+from tools.processing_utils import make_raw_file_index, source_signature, signature_matches, read_index
+from tools.processing_L0 import radar_processing_L0
+from tools.processing_L1 import radar_processing_L1
+
+from test_processing import write_raw_file, PACKETS_PER_ROTATION
+
+STATION = "st"
+TIMESTAMPS = ["20250101T000000", "20250101T001000"]
+
+
+def test_signature_matches():
+    signature = {'n_sources': 2, 'source_size': 100, 'source_mtime_ns': 10}
+
+    assert signature_matches(dict(signature), signature)
+    assert not signature_matches({**signature, 'source_size': 101}, signature)
+    assert not signature_matches({**signature, 'source_mtime_ns': pd.NA}, signature)  # empty cell of an old index.
+    assert not signature_matches({'n_sources': 2}, signature)
+
+
+def test_source_signature(tmp_path):
+    paths = [tmp_path.joinpath(f"{i}.raw") for i in range(2)]
+    for i, path in enumerate(paths):
+        path.write_bytes(bytes(10 * (i + 1)))
+    group = pd.DataFrame({'path': [str(path) for path in paths + [tmp_path.joinpath("missing.raw")]]})
+
+    signature = source_signature(group)
+
+    assert signature == {
+        'n_sources': 3,
+        'source_size': 30,
+        'source_mtime_ns': max(os.stat(path).st_mtime_ns for path in paths),
+    }
+
+
+def output_mtimes(directory) -> dict[str, int]:
+    return {path.name: os.stat(path).st_mtime_ns for path in directory.rglob(f"{STATION}_L*.nc")}
+
+
+def test_incremental_L0_L1(tmp_path):
+    raw_dir = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+    packets = synthetic_data_packets(n_rotations=3)
+    packets['spokes']['data'] = 10  # constant intensities compress fast (L1).
+    for timestamp in TIMESTAMPS:
+        write_raw_file(raw_dir.joinpath(f"{timestamp}_s01.raw"), packets)
+
+    raw_index = tmp_path.joinpath(f"{STATION}_raw_index.csv")
+    L0_index = tmp_path.joinpath("L0", f"{STATION}_L0_index.csv")
+    L1_index = tmp_path.joinpath("L1", f"{STATION}_L1_index.csv")
+
+    def run():
+        make_raw_file_index(STATION, raw_dir, tmp_path, incremental=True)
+        radar_processing_L0(raw_index, tmp_path, STATION, None, None, 10.0, 48.5, -68.5, 0, incremental=True)
+        radar_processing_L1(STATION, L0_index, tmp_path, incremental=True)
+        return output_mtimes(tmp_path.joinpath("L0")), output_mtimes(tmp_path.joinpath("L1"))
+
+    L0_mtimes, L1_mtimes = run()
+    assert len(L0_mtimes) == len(TIMESTAMPS)
+    assert len(L1_mtimes) == 1
+
+    # Nothing changed: nothing is remade.
+    assert run() == (L0_mtimes, L1_mtimes)
+    assert len(pd.read_csv(L0_index)) == len(TIMESTAMPS)
+
+    # The raw file of the 2nd scan changed: its L0 and the L1 of the hour are remade.
+    write_raw_file(raw_dir.joinpath(f"{TIMESTAMPS[1]}_s01.raw"), packets, lost=[PACKETS_PER_ROTATION + 1])
+    new_L0_mtimes, new_L1_mtimes = run()
+    [first_L0, second_L0] = sorted(L0_mtimes)
+    assert new_L0_mtimes[first_L0] == L0_mtimes[first_L0]
+    assert new_L0_mtimes[second_L0] != L0_mtimes[second_L0]
+    assert new_L1_mtimes != L1_mtimes
+
+    # Rows of an index made before the signatures were recorded (empty cells) are remade.
+    L0_index_df = read_index(L0_index)
+    L0_index_df.loc[L0_index_df['path'].str.endswith(first_L0), ['n_sources', 'source_size', 'source_mtime_ns']] = pd.NA
+    L0_index_df.to_csv(L0_index, index=False)
+    L1_index_df = read_index(L1_index)
+    L1_index_df['n_sources'] = pd.NA
+    L1_index_df.to_csv(L1_index, index=False)
+
+    L0_mtimes, L1_mtimes = new_L0_mtimes, new_L1_mtimes
+    new_L0_mtimes, new_L1_mtimes = run()
+    assert new_L0_mtimes[first_L0] != L0_mtimes[first_L0]
+    assert new_L0_mtimes[second_L0] == L0_mtimes[second_L0]
+    assert new_L1_mtimes != L1_mtimes
+    assert not pd.read_csv(L0_index)[['n_sources', 'source_size', 'source_mtime_ns']].isna().any(axis=None)
+    assert len(pd.read_csv(L0_index)) == len(TIMESTAMPS)
@@ -0,0 +1,86 @@
+"""Metrics registry, concurrent counters and the JSON dumps (file and Unix socket)."""
+import json
+import time
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from piradar.metrics import MetricsRegistry, MetricsDumper
+
+N_THREADS = 4
+N_INCREMENTS = 100_000
+
+
+def test_counter_concurrent_increments():
+    counter = MetricsRegistry().counter("packets", "Packets.")
+
+    def increment():
+        for _ in range(N_INCREMENTS):
+            counter.inc()
+
+    threads = [threading.Thread(target=increment) for _ in range(N_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.value == N_THREADS * N_INCREMENTS
+
+
+def test_registry():
+    registry = MetricsRegistry()
+    counter = registry.counter("packets")
+    assert registry.counter("packets") is counter
+    with pytest.raises(ValueError):
+        registry.gauge("packets")
+
+    counter.inc(3)
+    registry.gauge("depth").set(np.int64(7))
+    registry.gauge("function", function=lambda: 1.5)
+    histogram = registry.histogram("latency", buckets=[0.1, 1])
+    for value in [0.05, 0.5, 5]:
+        histogram.observe(value)
+
+    metrics = registry.snapshot()["metrics"]
+    assert metrics["packets"] == {"type": "counter", "value": 3}
+    assert metrics["depth"]["value"] == 7
+    assert metrics["function"]["value"] == 1.5
+    assert metrics["latency"]["count"] == 3
+    assert metrics["latency"]["max"] == 5
+    assert metrics["latency"]["buckets"] == [[0.1, 1], [1, 1], ["inf", 1]]
+
+
+def test_dumper_file_and_socket(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("packets").inc(2)
+    registry.gauge("depth").set(np.float32(0.5))  # numpy scalars are serialized.
+
+    path = tmp_path.joinpath("metrics", "metrics.json")
+    socket_path = str(tmp_path.joinpath("metrics.sock"))
+    dumper = MetricsDumper(registry, path=path, socket_path=socket_path, interval=60)
+    dumper.start()
+    try:
+        for _ in range(500):  # the first dump is made by the thread.
+            if path.exists():
+                break
+            time.sleep(0.01)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(5)
+            client.connect(socket_path)
+            data = b""
+            while chunk := client.recv(4096):
+                data += chunk
+        served = json.loads(data)
+        assert served["metrics"]["packets"]["value"] == 2
+        assert served["metrics"]["depth"]["value"] == 0.5
+    finally:
+        registry.counter("packets").inc()
+        dumper.stop()
+
+    dumped = json.loads(path.read_text())
+    assert dumped["metrics"]["packets"]["value"] == 3  # the last values are dumped on stop.
+    assert not path.with_name(path.name + ".tmp").exists()
+    assert not tmp_path.joinpath("metrics.sock").exists()
@@ -0,0 +1,54 @@
+"""WorkerPool: results streamed per task, errors reported without stopping the other tasks."""
+import pytest
+
+from tools.pool_utils import WorkerPool, get_worker_pool, get_chunksize
+
+N_TASKS = 20
+
+
+def divide(a: int, b: int) -> float:
+    return a / b
+
+
+@pytest.mark.parametrize("kind", ["process", "thread"])
+def test_errors_are_reported_per_task(kind):
+    args = [(i, i % 5) for i in range(N_TASKS)]  # every 5th task divides by 0.
+
+    with WorkerPool(n_workers=2, kind=kind) as worker_pool:
+        results = list(worker_pool.imap_unordered(divide, args))
+
+    assert sorted(result.index for result in results) == list(range(N_TASKS))
+    for result in results:
+        assert result.args == args[result.index]
+        if result.args[1] == 0:
+            assert not result.ok
+            assert result.result is None
+            assert "ZeroDivisionError" in result.error
+        else:
+            assert result.ok
+            assert result.result == divide(*result.args)
+
+
+def test_pool_is_reused():
+    worker_pool = WorkerPool(n_workers=2, kind="thread")
+    assert list(worker_pool.imap_unordered(divide, [])) == []
+    assert worker_pool._pool is None  # started on first use.
+
+    for _ in range(2):
+        assert [result.result for result in worker_pool.imap_unordered(divide, [(1, 2)])] == [0.5]
+    pool = worker_pool.pool
+    assert worker_pool.pool is pool
+    worker_pool.close()
+    assert worker_pool._pool is None
+
+    assert get_worker_pool(2, kind="thread") is get_worker_pool(2, kind="thread")
+
+
+def test_invalid_kind():
+    with pytest.raises(ValueError):
+        WorkerPool(kind="fiber")
+
+
+def test_chunksize():
+    assert get_chunksize(1, 4) == 1
+    assert get_chunksize(10_000, 4) == 8
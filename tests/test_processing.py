@@ -0,0 +1,66 @@
+"""Synthetic HALO data (2048 spokes per rotation, spoke_number counting to 4095) through L0 and L1."""
+import numpy as np
+import xarray as xr
+
+from piradar.navico.navico_simulator import synthetic_data_packets, SPOKES_PER_ROTATION, SPOKES_PER_PACKET
+from tools.unpack_utils import FRAME_DTYPE
+from tools.processing_L0 import _radar_processing_L0
+from tools.processing_L1 import _radar_processing_L1
+from tools.grid_utils import open_L1_dataset
+
+N_ROTATIONS = 5
+PACKETS_PER_ROTATION = SPOKES_PER_ROTATION // SPOKES_PER_PACKET
+LOST_PACKET = 2 * PACKETS_PER_ROTATION + 10  # in the 3rd rotation.
+T0 = 1735689600  # 2025-01-01T00:00:00
+
+
+def write_raw_file(path, packets: np.ndarray, lost: list[int] = ()) -> np.ndarray:
+    """Frames of the data packets, as written by the RadarDataWriter."""
+    frames = np.zeros(len(packets), dtype=FRAME_DTYPE)
+    frames['frame_delimiter'] = b"FH"
+    frames['spoke_delimiter'] = b"SD"
+    frames['header']['time'] = T0 + np.arange(len(packets)) // PACKETS_PER_ROTATION
+    frames['header']['number_of_spokes'] = SPOKES_PER_PACKET
+    frames['header']['range'] = packets['spokes']['header']['small_range'][:, 0]
+    frames['header']['gain'] = 50
+    frames['spokes']['spoke_number'] = packets['spokes']['header']['spoke_number']
+    frames['spokes']['angle'] = packets['spokes']['header']['angle']
+    frames['spokes']['intensity'] = packets['spokes']['data']
+
+    np.delete(frames, lost).tofile(path)
+    return frames
+
+
+def test_synthetic_rotations_L0_L1(tmp_path):
+    packets = synthetic_data_packets(n_rotations=N_ROTATIONS, _range=1000)
+    raw_file = tmp_path.joinpath("20250101T000000_s01.raw")
+    frames = write_raw_file(raw_file, packets, lost=[LOST_PACKET])
+
+    L0_path = tmp_path.joinpath("L0")
+    L0_path.mkdir()
+    station, _, L0_file = _radar_processing_L0([str(raw_file)], L0_path, "st", 10.0, 48.5, -68.5, 0)
+
+    with xr.open_dataset(L0_file) as L0:
+        # One scan per rotation, the first is removed.
+        assert L0.sizes['scan'] == N_ROTATIONS - 1
+        np.testing.assert_array_equal(L0['raw_azimuth'].values, np.arange(0, 4096, 2))
+
+        intensity = frames['spokes']['intensity'].reshape(N_ROTATIONS, SPOKES_PER_ROTATION, 512)
+        missing_spoke = np.zeros((N_ROTATIONS, SPOKES_PER_ROTATION), dtype=bool)
+        missing_spoke.reshape(-1, SPOKES_PER_PACKET)[LOST_PACKET] = True
+        intensity[missing_spoke] = 0
+
+        np.testing.assert_array_equal(L0['missing_spoke'].values, missing_spoke[1:])
+        np.testing.assert_array_equal(L0['intensity'].values, intensity[1:])
+
+    L1_path = tmp_path.joinpath("L1", station)
+    L1_path.mkdir(parents=True)
+    [(_, start_time, end_time, number_of_scan, L1_file)] = _radar_processing_L1(
+        "20250101T00", [L0_file], station, L1_path
+    )
+
+    assert number_of_scan == 1
+    with open_L1_dataset(L1_file) as L1:
+        assert L1.sizes['azimuth'] == SPOKES_PER_ROTATION
+        assert L1['lon'].shape == L1['scan_mean'].shape[1:]
+        assert np.isfinite(L1['scan_mean']).all()
@@ -0,0 +1,40 @@
+"""ReceiveStats on synthetic HALO data packets (2048 spokes per rotation, spoke_number counting to 4095)."""
+from piradar.navico.navico_controller import ReceiveStats
+from piradar.navico.navico_simulator import synthetic_data_packets, SPOKES_PER_ROTATION, SPOKES_PER_PACKET
+
+N_ROTATIONS = 4
+PACKETS_PER_ROTATION = SPOKES_PER_ROTATION // SPOKES_PER_PACKET
+
+
+def test_rotations_on_angle_wrap():
+    stats = ReceiveStats()
+    for packet in synthetic_data_packets(n_rotations=N_ROTATIONS):
+        stats.update(packet.tobytes())
+
+    # A rotation is counted when the next one starts, and spoke_number only wraps every other rotation.
+    assert stats.rotations == N_ROTATIONS - 1
+    assert stats.spokes == N_ROTATIONS * SPOKES_PER_ROTATION
+    assert stats.lost_spokes == 0
+
+
+def test_lost_spokes():
+    lost_packets = {3, PACKETS_PER_ROTATION + 5, PACKETS_PER_ROTATION + 6}
+    stats = ReceiveStats()
+    for i, packet in enumerate(synthetic_data_packets(n_rotations=N_ROTATIONS)):
+        if i not in lost_packets:
+            stats.update(packet.tobytes())
+
+    assert stats.rotations == N_ROTATIONS - 1
+    assert stats.lost_spokes == len(lost_packets) * SPOKES_PER_PACKET
+    assert stats.spokes + stats.lost_spokes == N_ROTATIONS * SPOKES_PER_ROTATION
+    assert stats.drop_rate == len(lost_packets) / (N_ROTATIONS * PACKETS_PER_ROTATION)
+
+
+def test_reset_keeps_kernel_drop_counter():
+    stats = ReceiveStats()
+    stats.update_kernel_drop_counter(10)
+    stats.reset()
+    stats.update_kernel_drop_counter(15)
+
+    assert stats.kernel_drop_counter == 15
+    assert stats.kernel_drops == 5
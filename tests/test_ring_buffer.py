@@ -0,0 +1,110 @@
+"""PacketRing and SharedPacketRing: slot reuse across wrap-arounds, full ring, and a producer process."""
+import time
+import multiprocessing as mp
+
+import pytest
+
+from piradar.ring_buffer import PacketRing, SharedPacketRing
+
+N_SLOTS = 4
+SLOT_SIZE = 64
+
+
+def write(ring: PacketRing, packet: bytes) -> bool:
+    """As the producer does: False if the ring is full and the packet is dropped."""
+    slot = ring.write_slot()
+    if slot is None:
+        ring.drop()
+        return False
+    slot[:len(packet)] = packet
+    ring.commit(len(packet))
+    return True
+
+
+def read(ring: PacketRing, timeout: float = 1) -> bytes | None:
+    packet = ring.read(timeout)
+    if packet is None:
+        return None
+    packet = bytes(packet)
+    ring.release()
+    return packet
+
+
+def check_wrap_around(ring: PacketRing):
+    n_packets = 5 * N_SLOTS + 1
+    for i in range(n_packets):
+        packet = f"packet {i}".encode()
+        assert write(ring, packet)
+        assert ring.occupancy == 1
+        assert read(ring) == packet
+        assert ring.occupancy == 0
+
+    # Fill the ring across the end of the slots.
+    packets = [bytes([i]) * (i + 1) for i in range(N_SLOTS)]
+    for packet in packets:
+        assert write(ring, packet)
+    assert ring.is_full
+    assert ring.write_slot() is None
+    assert not write(ring, b"dropped")
+    assert ring.dropped == 1
+
+    assert [read(ring) for _ in range(N_SLOTS)] == packets
+    assert read(ring, timeout=0.01) is None
+    assert ring.max_occupancy == N_SLOTS
+
+
+def test_packet_ring_wrap_around():
+    check_wrap_around(PacketRing(N_SLOTS, SLOT_SIZE))
+
+
+def test_shared_packet_ring_wrap_around():
+    ring = SharedPacketRing(N_SLOTS, SLOT_SIZE)
+    try:
+        check_wrap_around(ring)
+    finally:
+        ring.close()
+
+
+def test_shared_packet_ring_counter_wrap_around():
+    ring = SharedPacketRing(N_SLOTS, SLOT_SIZE)
+    try:
+        ring.head = ring.tail = 2 ** 32 - 2  # the uint32 counters wrap around after 2 packets.
+        check_wrap_around(ring)
+        assert ring.head < N_SLOTS * 10
+    finally:
+        ring.close()
+
+
+def test_shared_packet_ring_n_slots_power_of_2():
+    with pytest.raises(ValueError):
+        SharedPacketRing(3, SLOT_SIZE)
+
+
+def produce(name: str, data_available: mp.Event, lock: mp.Lock, n_packets: int):
+    ring = SharedPacketRing(N_SLOTS, SLOT_SIZE, name=name, data_available=data_available, lock=lock)
+    for i in range(n_packets):
+        while ring.is_full:  # waits for the consumer instead of dropping.
+            time.sleep(1e-4)
+        assert write(ring, i.to_bytes(4, "little"))
+    ring.close()
+
+
+def test_shared_packet_ring_producer_process():
+    n_packets = 2000
+    mp_context = mp.get_context("fork")
+    ring = SharedPacketRing(N_SLOTS, SLOT_SIZE, mp_context=mp_context)
+    producer = mp_context.Process(target=produce, args=(ring.name, ring.data_available, ring.lock, n_packets))
+    producer.start()
+    try:
+        received = []
+        while len(received) < n_packets:
+            packet = read(ring, timeout=5)
+            if packet is None:  # a spurious wake-up, or the producer is stuck.
+                assert producer.is_alive() or ring.occupancy
+                continue
+            received.append(int.from_bytes(packet, "little"))
+        assert received == list(range(n_packets))
+    finally:
+        producer.join(10)
+        ring.close()
+    assert producer.exitcode == 0
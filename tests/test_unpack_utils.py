@@ -0,0 +1,92 @@
+"""Decoding of the .raw sweep files written by the RadarDataWriter, including truncated and corrupted ones."""
+import numpy as np
+
+from tools.unpack_utils import (
+    FRAME_DTYPE,
+    FRAME_SIZE,
+    SPOKES_PER_FRAME,
+    RawSweepFile,
+    find_frame_offsets,
+    decode_frames,
+    load_raw_file,
+)
+
+N_FRAMES = 6
+
+
+def make_frames(n_frames: int = N_FRAMES) -> np.ndarray:
+    frames = np.zeros(n_frames, dtype=FRAME_DTYPE)
+    frames['frame_delimiter'] = b"FH"
+    frames['spoke_delimiter'] = b"SD"
+    frames['header']['time'] = 1735689600 + np.arange(n_frames)
+    frames['header']['number_of_spokes'] = SPOKES_PER_FRAME
+    frames['header']['range'] = 1000
+    spoke_index = np.arange(n_frames * SPOKES_PER_FRAME).reshape(n_frames, SPOKES_PER_FRAME)
+    frames['spokes']['spoke_number'] = spoke_index
+    frames['spokes']['angle'] = 2 * spoke_index
+    frames['spokes']['intensity'] = (spoke_index % 256)[..., np.newaxis]
+    return frames
+
+
+def test_find_frame_offsets_contiguous():
+    buffer = make_frames().tobytes()
+
+    np.testing.assert_array_equal(find_frame_offsets(buffer), np.arange(N_FRAMES) * FRAME_SIZE)
+
+
+def test_find_frame_offsets_truncated_last_frame():
+    buffer = make_frames().tobytes()[:-100]
+
+    np.testing.assert_array_equal(find_frame_offsets(buffer), np.arange(N_FRAMES - 1) * FRAME_SIZE)
+
+
+def test_find_frame_offsets_skips_garbage():
+    frames = make_frames()
+    garbage = b"FHxx" + bytes(50)  # a delimiter not followed by a frame.
+    buffer = garbage + frames[:3].tobytes() + garbage + frames[3:].tobytes()
+
+    offsets = find_frame_offsets(buffer)
+
+    assert offsets.size == N_FRAMES
+    assert decode_frames(buffer, offsets).tobytes() == frames.tobytes()
+
+
+def test_find_frame_offsets_empty():
+    assert find_frame_offsets(b"").size == 0
+    assert find_frame_offsets(make_frames().tobytes()[:FRAME_SIZE - 1]).size == 0
+    assert decode_frames(b"").size == 0
+
+
+def test_raw_sweep_file_truncated(tmp_path):
+    frames = make_frames()
+    raw_file = tmp_path.joinpath("20250101T000000_s01.raw")
+    raw_file.write_bytes(frames.tobytes()[:-FRAME_SIZE // 2])  # e.g. power cut while writing.
+
+    with RawSweepFile(raw_file) as sweep:
+        assert sweep.n_frames == N_FRAMES - 1
+        assert sweep.n_spokes == (N_FRAMES - 1) * SPOKES_PER_FRAME
+        assert sweep.intensity.shape == (N_FRAMES - 1, SPOKES_PER_FRAME, 512)
+        assert not sweep.intensity.flags.writeable
+        np.testing.assert_array_equal(sweep.spoke_number, frames['spokes']['spoke_number'][:-1].ravel())
+        np.testing.assert_array_equal(sweep.raw_azimuth, frames['spokes']['angle'][:-1].ravel())
+        np.testing.assert_array_equal(sweep.range, frames['header']['range'][:-1])
+        np.testing.assert_array_equal(
+            sweep.time, np.repeat(frames['header']['time'][:-1].astype("datetime64[s]"), SPOKES_PER_FRAME)
+        )
+
+    data = load_raw_file(raw_file, is4bits=False)
+    np.testing.assert_array_equal(data['intensity'], frames['spokes']['intensity'][:-1].reshape(-1, 512))
+    assert load_raw_file(raw_file, is4bits=True)['intensity'].shape == ((N_FRAMES - 1) * SPOKES_PER_FRAME, 1024)
+
+
+def test_raw_sweep_file_empty_and_garbage(tmp_path):
+    empty_file = tmp_path.joinpath("empty.raw")
+    empty_file.write_bytes(b"")
+    garbage_file = tmp_path.joinpath("garbage.raw")
+    garbage_file.write_bytes(b"FH" + bytes(FRAME_SIZE))
+
+    for raw_file in [empty_file, garbage_file]:
+        with RawSweepFile(raw_file) as sweep:
+            assert sweep.n_frames == 0
+            assert sweep.spoke_number.size == 0
+            assert sweep.intensity.shape == (0, SPOKES_PER_FRAME, 512)
@@ -0,0 +1,121 @@
+"""RadarDataWriter overflow policies (block, drop_oldest, spill) with a bounded queue."""
+import threading
+import time
+
+import pytest
+import numpy as np
+
+from piradar.navico.navico_controller import RadarDataWriter, FrameData
+from piradar.navico.navico_simulator import synthetic_data_packets
+from tools.unpack_utils import RawSweepFile
+
+QUEUE_SIZE = 2
+N_FRAMES = 5
+
+
+def make_frames(n_frames: int = N_FRAMES) -> list[FrameData]:
+    packets = synthetic_data_packets(n_rotations=1, _range=1000)[:n_frames]
+    return [
+        FrameData(time=1735689600 + i, number_of_spokes=32, gain=50, _range=1000, heading=0, spokes=packet['spokes'])
+        for i, packet in enumerate(packets)
+    ]
+
+
+def written_spoke_numbers(output_file) -> np.ndarray:
+    with RawSweepFile(output_file.with_suffix(".raw")) as sweep:
+        return sweep.spoke_number
+
+
+def expected_spoke_numbers(frames: list[FrameData]) -> np.ndarray:
+    return np.concatenate([frame.spokes['header']['spoke_number'] for frame in frames])
+
+
+def run_writer(writer: RadarDataWriter, stream=None) -> threading.Event:
+    """Start the thread, close the raw file and wait until it is closed."""
+    writer.start_thread()
+    closed = writer.close_raw_file(stream)
+    assert closed.wait(10)
+    writer.stop()
+    writer.writer_thread.join()
+    return closed
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        RadarDataWriter(overflow_policy="ignore")
+
+
+def test_block(tmp_path):
+    writer = RadarDataWriter(queue_size=QUEUE_SIZE, overflow_policy="block")
+    output_file = tmp_path.joinpath("block")
+    frames = make_frames()
+
+    producer = threading.Thread(target=lambda: [writer.write_frame(output_file, frame) for frame in frames])
+    producer.start()
+    time.sleep(0.2)
+    assert producer.is_alive()  # waiting for the writer.
+    assert writer.queue_depth == QUEUE_SIZE
+
+    writer.start_thread()
+    producer.join(10)
+    assert not producer.is_alive()
+    run_writer(writer)
+
+    np.testing.assert_array_equal(written_spoke_numbers(output_file), expected_spoke_numbers(frames))
+    assert writer.stats.dropped_frames == 0
+
+
+def test_drop_oldest(tmp_path):
+    writer = RadarDataWriter(queue_size=QUEUE_SIZE + 1, overflow_policy="drop_oldest")
+    output_file = tmp_path.joinpath("drop_oldest")
+    report_path = tmp_path.joinpath("report.raw")
+    frames = make_frames()
+
+    writer.write_report(report_path, bytearray(b"report"))
+    for frame in frames:
+        writer.write_frame(output_file, frame)  # never blocks: the oldest frames are dropped.
+
+    assert writer.stats.dropped_frames == N_FRAMES - QUEUE_SIZE
+    assert writer.queue_depth == QUEUE_SIZE + 1
+
+    run_writer(writer)
+
+    # The report was the oldest task, but only frames are dropped.
+    assert report_path.read_bytes() == b"report"
+    np.testing.assert_array_equal(written_spoke_numbers(output_file), expected_spoke_numbers(frames[-QUEUE_SIZE:]))
+
+
+def test_drop_oldest_blocks_without_frames(tmp_path):
+    writer = RadarDataWriter(queue_size=QUEUE_SIZE, overflow_policy="drop_oldest")
+    closed = [writer.close_raw_file(stream) for stream in range(QUEUE_SIZE)]
+
+    last_close = threading.Thread(target=writer.close_raw_file, args=(QUEUE_SIZE,))
+    last_close.start()
+    time.sleep(0.2)
+    assert last_close.is_alive()  # close tasks are never dropped.
+
+    writer.start_thread()
+    last_close.join(10)
+    assert not last_close.is_alive()
+    assert all(event.wait(10) for event in closed)
+    writer.stop()
+    writer.writer_thread.join()
+    assert writer.stats.dropped_frames == 0
+
+
+def test_spill(tmp_path):
+    writer = RadarDataWriter(queue_size=QUEUE_SIZE, overflow_policy="spill")
+    output_file = tmp_path.joinpath("spill")
+    frames = make_frames()
+
+    for frame in frames:
+        writer.write_frame(output_file, frame)  # never blocks, nothing is dropped.
+
+    assert writer.stats.spilled_tasks == N_FRAMES - QUEUE_SIZE
+    assert writer.queue_depth == N_FRAMES
+
+    run_writer(writer)
+
+    # Spilled frames are written after the queued ones, in order.
+    np.testing.assert_array_equal(written_spoke_numbers(output_file), expected_spoke_numbers(frames))
+    assert writer.queue_depth == 0
@@ -0,0 +1,126 @@
+"""
+Lon/lat grids of the polar (azimuth, r_bins) grid of a station.
+
+A grid only depends on the station geometry (lat, lon, heading, range, azimuths and number of bins), which rarely
+changes, so it is computed once and cached: in memory (per process, e.g. per pool worker) and, with `grid_dir`,
+on disk as `lonlat_{key}.nc`, shared by the workers and the following runs.
+
+The L1 files reference their grid (`lonlat_grid` attribute, relative to the file) instead of storing the 2-D
+lon/lat arrays. `open_L1_dataset` opens an L1 file with its lon/lat coordinates.
+"""
+import os
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import xarray as xr
+
+from tools.coordinate_transform import xy_to_en
+
+GRID_DIR_NAME = "grids"
+
+_grids: dict[str, xr.Dataset] = {}  # {key or path: grid}
+
+
+def lonlat_grid_key(lat: float, lon: float, heading: float, _range: float, azimuth: np.ndarray, n_bins: int) -> str:
+    """The azimuths are hashed too: the same number of azimuths can be different angles."""
+    azimuth = np.asarray(azimuth, dtype=np.float64)
+    _hash = hashlib.sha1(np.array([lat, lon, heading, _range, azimuth.size, n_bins], dtype=np.float64).tobytes())
+    _hash.update(azimuth.tobytes())
+    return _hash.hexdigest()[:16]
+
+
+def compute_lonlat_grid(
+        lat: float, lon: float, heading: float, azimuth: np.ndarray, radius: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """(n_azimuth, n_bins) lon and lat grids. `azimuth` in radians (from the heading), `heading` in degrees."""
+    azimuth = np.asarray(azimuth)[:, None] + np.deg2rad(heading)
+    radius = np.asarray(radius)[None, :]
+
+    xy_grid = np.stack([radius * np.sin(azimuth), radius * np.cos(azimuth)], axis=-1)
+    en_grid = xy_to_en(points_xy=xy_grid.reshape(-1, 2), origin_en=np.array([lon, lat])).reshape(xy_grid.shape)
+
+    return en_grid[..., 0], en_grid[..., 1]
+
+
+def _write_grid(grid: xr.Dataset, path: Path):
+    """Atomically: the workers making the same grid at the same time each replace it with the same content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    grid.to_netcdf(tmp_path, engine="h5netcdf")
+    os.replace(tmp_path, path)
+
+
+def get_lonlat_grid(dataset: xr.Dataset, heading: float = None, grid_dir: str = None) -> tuple[xr.Dataset, Path]:
+    """
+    Lon/lat grid of a dataset with `azimuth` and `radius` coordinates and `lat`, `lon`, `heading`, `range`
+    attributes. Computed only if it isn't cached.
+
+    Parameters
+    ----------
+    heading:
+        Overrides the heading of the dataset.
+    grid_dir:
+        Directory of the grids on disk. Only cached in memory if None.
+
+    Returns
+    -------
+    grid:
+        `lon` and `lat` (azimuth, r_bins).
+    path:
+        Path of the grid on disk, None if `grid_dir` is None.
+    """
+    heading = dataset.attrs['heading'] if heading is None else heading
+    lat, lon, _range = dataset.attrs['lat'], dataset.attrs['lon'], dataset.attrs['range']
+    azimuth = dataset['azimuth'].values
+    radius = dataset['radius'].values
+
+    key = lonlat_grid_key(lat, lon, heading, _range, azimuth, radius.size)
+    path = Path(grid_dir).joinpath(f"lonlat_{key}.nc") if grid_dir is not None else None
+
+    grid = _grids.get(key)
+    if grid is None and path is not None and path.is_file():
+        grid = xr.load_dataset(path, engine="h5netcdf")
+
+    if grid is None:
+        lon_grid, lat_grid = compute_lonlat_grid(lat=lat, lon=lon, heading=heading, azimuth=azimuth, radius=radius)
+        grid = xr.Dataset(
+            {
+                'lon': (('azimuth', 'r_bins'), lon_grid),
+                'lat': (('azimuth', 'r_bins'), lat_grid),
+            },
+            coords={'azimuth': azimuth, 'radius': ('r_bins', radius)},
+            attrs={'lat': lat, 'lon': lon, 'heading': heading, 'range': _range},
+        )
+        if path is not None:
+            _write_grid(grid, path)
+
+    _grids[key] = grid
+    if path is not None and not path.is_file():  # cached in memory, but removed from disk.
+        _write_grid(grid, path)
+
+    return grid, path
+
+
+def reference_lonlat_grid(dataset: xr.Dataset, grid_dir: str, path: str) -> xr.Dataset:
+    """Store the grid of `dataset` in `grid_dir` and reference it from the dataset to be written at `path`."""
+    _, grid_path = get_lonlat_grid(dataset, grid_dir=grid_dir)
+
+    dataset = dataset.drop_vars(['lon', 'lat'], errors="ignore")
+    dataset.attrs['lonlat_grid'] = Path(os.path.relpath(grid_path, Path(path).parent)).as_posix()
+
+    return dataset
+
+
+def open_L1_dataset(path: str, **kwargs) -> xr.Dataset:
+    """`xr.open_dataset` of an L1 file, with the `lon` and `lat` coordinates of its referenced grid."""
+    dataset = xr.open_dataset(path, **kwargs)
+    if 'lon' in dataset or 'lonlat_grid' not in dataset.attrs:  # L1 files storing their grid.
+        return dataset
+
+    grid_path = str(Path(path).parent.joinpath(dataset.attrs['lonlat_grid']).resolve())
+    grid = _grids.get(grid_path)
+    if grid is None:
+        grid = _grids[grid_path] = xr.load_dataset(grid_path, engine="h5netcdf")
+
+    return dataset.assign_coords(lon=grid['lon'].variable, lat=grid['lat'].variable)
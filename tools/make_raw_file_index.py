@@ -9,5 +9,6 @@ for station, sub_dir in root_dirs.items():
     make_raw_file_index(
         station=station,
         root_dir="__path_to_raw_file__",
-        out_dir=r"__out__dir__root__"
+        out_dir=r"__out__dir__root__",
+        incremental=True,
     )
\ No newline at end of file
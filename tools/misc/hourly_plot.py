@@ -14,8 +14,9 @@ import cartopy.crs as ccrs
 import cartopy.io.shapereader as shapereader
 
 from tools.processing_L1 import compute_lonlat_coordinates
+from tools.grid_utils import GRID_DIR_NAME
 from tools.pool_utils import pool_function
-from tools.processing_utils import sel_file_by_time_slice
+from tools.processing_utils import load_index
 
 fig_save_root_path = r"C:\Users\guayj\Documents\workspace\figures\radar"
 
@@ -46,14 +47,15 @@ central_lat = np.mean(extent[2:])
 
 station = "ive"
 
+grid_dir = Path(root_path).joinpath("L1", GRID_DIR_NAME)
+
 fig_save_path = Path(fig_save_root_path).joinpath(station)
 fig_save_path.mkdir(parents=True, exist_ok=True)
 
 start_time = "2025-07-29T00:00:00"
 end_time = "2025-10-14T00:00:00"
 
-L1_index_df = pd.read_csv(Path(root_path).joinpath("L1", f'{station}_L1_index.csv'))
-L1_files = sel_file_by_time_slice(L1_index_df, start_time, end_time)['path'].values
+L1_files = load_index(Path(root_path).joinpath("L1", f'{station}_L1_index.csv'), start_time, end_time)['path'].values
 
 
 # ALWAYS 60 time
@@ -78,7 +80,7 @@ def hourly_plot(L1_file):
 
     #### pre data
     ds.attrs['heading'] = headings[station]
-    ds = compute_lonlat_coordinates(ds)
+    ds = compute_lonlat_coordinates(ds, grid_dir=grid_dir)  # same grid for every hour of the station.
 
     #### FIGURE
     plt.figure(figsize=(12, 8))
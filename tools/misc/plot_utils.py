@@ -23,7 +23,8 @@ import matplotlib.pyplot as plt
 import cartopy.crs as ccrs
 import cartopy.io.shapereader as shapereader
 
-from tools.processing_utils import sel_file_by_time_slice
+from tools.processing_utils import sel_file_by_time_slice, load_index
+from tools.grid_utils import open_L1_dataset
 
 L1_ROOT_DIR = r"E:\OPP\ppo-qmm_analyses\data\radar_2025-10-14"
 
@@ -40,7 +41,7 @@ def add_bank(ax):
 
 
 def get_station_L1_index_df(station: str) -> pd.DataFrame:
-    return pd.read_csv(Path(L1_ROOT_DIR).joinpath("L1", f'{station}_L1_index.csv'))
+    return load_index(Path(L1_ROOT_DIR).joinpath("L1", f'{station}_L1_index.csv'))
 
 
 def initiate_figure(extent):
@@ -68,7 +69,7 @@ def scatter_anim(L1_files, save_path):
 
     ds = xr.open_mfdataset(L1_files, preprocess=_prepros)
 
-    ds_lonlat = xr.open_dataset(L1_files[0])
+    ds_lonlat = open_L1_dataset(L1_files[0])
 
     print("L1 Data loaded")
 
@@ -140,7 +141,7 @@ def pcolormesh_anim(L1_files, save_path):
 
     ds = xr.open_mfdataset(L1_files, preprocess=_prepros)
 
-    ds_lonlat = xr.open_dataset(L1_files[0])
+    ds_lonlat = open_L1_dataset(L1_files[0])
 
     print("L1 Data loaded")
 
@@ -1,10 +1,18 @@
+import atexit
 import platform
+import functools
+import traceback
 import multiprocessing as mp
+from multiprocessing.pool import Pool, ThreadPool
+from dataclasses import dataclass
 
-from typing import Iterable
+from typing import Callable, Iterable, Iterator
 
 MAX_WIN32_WORKERS = 61
 
+MAX_CHUNKSIZE = 8
+CHUNKS_PER_WORKER = 4  # smaller chunks balance the load better, bigger ones cost less IPC.
+
 
 def __get_n_available_workers__():
     n_available_workers = mp.cpu_count()
@@ -24,10 +32,94 @@ def get_workers(n_workers=None):
 
 
 def pool_function(func, arg, n_workers=None):
-    pool = mp.Pool(get_workers(n_workers))
-    return pool.map(func, arg)
+    with mp.Pool(get_workers(n_workers)) as pool:
+        return pool.map(func, arg)
 
 
 def starpool_function(func, args: Iterable[Iterable], n_workers=None):
-    pool = mp.Pool(get_workers(n_workers))
-    return pool.starmap(func, args)
+    with mp.Pool(get_workers(n_workers)) as pool:
+        return pool.starmap(func, args)
+
+
+### Persistent pools, results streamed as they complete.
+@dataclass
+class TaskResult:
+    index: int  # position of the task in the args.
+    args: tuple
+    result: object = None
+    error: str = None  # formatted traceback if the task raised.
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _run_task(func: Callable, task: tuple[int, tuple]) -> TaskResult:
+    index, args = task
+    try:
+        return TaskResult(index=index, args=args, result=func(*args))
+    except Exception:
+        return TaskResult(index=index, args=args, error=traceback.format_exc())
+
+
+def get_chunksize(n_tasks: int, n_workers: int) -> int:
+    return max(1, min(MAX_CHUNKSIZE, n_tasks // (n_workers * CHUNKS_PER_WORKER)))
+
+
+class WorkerPool:
+    """
+    Reusable pool of processes (CPU bound tasks) or threads (I/O bound tasks, or tasks releasing the GIL).
+
+    `imap_unordered` yields a TaskResult per task as soon as it is done. A task raising doesn't stop the
+    others: its traceback is in `TaskResult.error`.
+    """
+    def __init__(self, n_workers: int = None, kind: str = "process"):
+        if kind not in ["process", "thread"]:
+            raise ValueError("kind must be 'process' or 'thread'.")
+        self.n_workers = get_workers(n_workers)
+        self.kind = kind
+        self._pool: Pool = None
+
+    @property
+    def pool(self) -> Pool:
+        if self._pool is None:  # started on first use.
+            self._pool = Pool(self.n_workers) if self.kind == "process" else ThreadPool(self.n_workers)
+        return self._pool
+
+    def imap_unordered(self, func: Callable, args: Iterable[tuple], chunksize: int = None) -> Iterator[TaskResult]:
+        args = list(args)
+        if not args:
+            return iter([])
+        if chunksize is None:
+            chunksize = get_chunksize(len(args), self.n_workers)
+        return self.pool.imap_unordered(functools.partial(_run_task, func), enumerate(args), chunksize=chunksize)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+_worker_pools: dict[tuple[str, int], WorkerPool] = {}
+
+
+def get_worker_pool(n_workers: int = None, kind: str = "process") -> WorkerPool:
+    """Shared pool, kept for the following calls (e.g. every station of a campaign). Closed at exit."""
+    key = (kind, get_workers(n_workers))
+    if key not in _worker_pools:
+        _worker_pools[key] = WorkerPool(n_workers=n_workers, kind=kind)
+    return _worker_pools[key]
+
+
+@atexit.register
+def close_worker_pools():
+    for worker_pool in _worker_pools.values():
+        worker_pool.close()
+    _worker_pools.clear()
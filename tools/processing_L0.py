@@ -1,14 +1,29 @@
+import csv
+import time
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 import datetime
 
+import h5netcdf
 import numpy as np
 import pandas as pd
 import xarray as xr
-import scipy as sp
 
-from tools.unpack_utils import load_raw_file
-from tools.pool_utils import starpool_function
-from tools.processing_utils import load_raw_file_index, sel_file_by_time_slice
+from tools.unpack_utils import RawSweepFile
+from tools.pool_utils import get_worker_pool
+from tools.processing_utils import (
+    load_raw_file_index,
+    source_signature,
+    signature_matches,
+    read_index,
+    write_index,
+    write_columnar_index,
+)
+
+N_RAW_AZIMUTHS = 4096  # raw azimuths are in [0, 4095]
+
+# n_sources, source_size and source_mtime_ns describe the raw files of the scan (see `source_signature`).
+L0_INDEX_COLUMNS = ['station', 'timestamp', 'path', 'n_sources', 'source_size', 'source_mtime_ns']
 
 
 def radar_processing_L0(
@@ -21,6 +36,7 @@ def radar_processing_L0(
         lat: float,
         lon: float,
         time_offset: int,
+        incremental: bool = False,
         ):
     """
 
@@ -36,25 +52,46 @@ def radar_processing_L0(
     lon
     time_offset: In minutes:
         realtime = radar_time - time_offset
+    incremental:
+        Only the scans that are new, or whose raw files changed (number, size or mtime), since the existing
+        L0 index was written are processed. The other rows of the index are kept. An interrupted run is
+        resumed by running it again.
 
     Returns
     -------
 
     """
 
-    rf_index_df = load_raw_file_index(raw_file_index)
-
-    rf_index_df = sel_file_by_time_slice(dataframe=rf_index_df, start_time=start_time, end_time=end_time)
+    rf_index_df = load_raw_file_index(raw_file_index, start_time=start_time, end_time=end_time)
 
     args_list = []
+    signatures = []
 
     L0_out_path = Path(out_root_dir).joinpath("L0")
+    L0_index_path = L0_out_path.joinpath(f'{station}_L0_index.csv')
+
+    previous_index = {}  # {path: row}
+    if incremental and L0_index_path.is_file():
+        previous_index = {str(row['path']): row for row in read_index(L0_index_path).to_dict('records')}
 
     for ts, group in rf_index_df.groupby('timestamp'):
         _date = str(ts).split(" ")[0]
         out_path = L0_out_path.joinpath(station, _date)
+
+        signature = source_signature(group)
+        save_path = str(make_L0_path(out_path, station, group['path'].values))
+        previous_row = previous_index.get(save_path)
+        if (
+                previous_row is not None
+                and Path(save_path).is_file()
+                and signature_matches(previous_row, signature)
+        ):
+            continue  # up to date, its row is kept.
+        previous_index.pop(save_path, None)
+
         out_path.mkdir(parents=True, exist_ok=True)
 
+        signatures.append(signature)
         args_list.append(
             (
                 group['path'].values,
@@ -67,11 +104,38 @@ def radar_processing_L0(
             )
         )
 
-    L0_file_index = starpool_function(_radar_processing_L0, args_list)
-
-    df = pd.DataFrame(L0_file_index, columns=['station', 'timestamp', 'path'])
+    if incremental:
+        print(f"{station} | L0: {len(args_list)} scans to process, {len(previous_index)} rows kept")
+
+    # The rows are written as the scans are done, so the index of an interrupted run is still valid.
+    L0_out_path.mkdir(parents=True, exist_ok=True)
+    write_index(L0_index_path, L0_INDEX_COLUMNS, previous_index.values())
+    n_files = n_failed = n_skipped = 0
+    t0 = time.perf_counter()
+    with open(L0_index_path, "a", newline="") as f:
+        index_writer = csv.writer(f)
+
+        for task in get_worker_pool().imap_unordered(_radar_processing_L0, args_list):
+            n_files += len(task.args[0])
+            if not task.ok:
+                n_failed += 1
+                print(f"{station} | L0 failed for {task.args[0][0]}:\n{task.error}")
+            elif task.result is None:
+                n_skipped += 1
+            else:
+                index_writer.writerow([*task.result, *signatures[task.index].values()])
+                f.flush()
+
+    elapsed_time = time.perf_counter() - t0
+    print(
+        f"{station} | L0: {len(args_list)} scans, {n_files} files in {elapsed_time:.1f} s "
+        f"({n_files / elapsed_time if elapsed_time else 0:.1f} files/s), {n_failed} failed, {n_skipped} skipped"
+    )
 
-    df.to_csv(L0_out_path.joinpath(f'{station}_L0_index.csv'), index=False)
+    # Sorted by time once done.
+    df = read_index(L0_index_path).sort_values('timestamp')
+    write_index(L0_index_path, L0_INDEX_COLUMNS, df.to_dict('records'))
+    write_columnar_index(L0_index_path, df)
 
 
 def _radar_processing_L0(
@@ -81,7 +145,8 @@ def _radar_processing_L0(
         heading: float,
         lat: float,
         lon: float,
-        time_offset: int
+        time_offset: int,
+        rotation_callback: Callable = None,
 ) -> xr.Dataset:
     """
 
@@ -95,6 +160,8 @@ def _radar_processing_L0(
     lon
     time_offset: in minutes.
         realtime = radar_time - time_offset
+    rotation_callback:
+        Called with the rotation after each rotation is written (e.g. to throttle the processing).
 
     Returns
     -------
@@ -102,212 +169,274 @@ def _radar_processing_L0(
     """
     ts = Path(raw_files[0]).stem.split("_")[0]
 
-    data = load_raw_scans(raw_files)
-
-    try:
-        fill_data_for_missing_spoke(data)
+    ### OUTPUT TO NETCDF ###
+    save_path = make_L0_path(out_path, station, raw_files)
 
-        pad_data_for_incomplete_scan(data)
+    writer = L0ScanWriter(path=save_path, ts=ts, heading=heading, lat=lat, lon=lon, time_offset=time_offset)
 
-        correct_azimuth_misalignment(data)
+    rotations = assemble_rotations(iter_raw_frames(raw_files))
 
-        dataset = make_dataset_volume(data=data, ts=ts, heading=heading)
+    # Removing the first scan as a precaution (it is still used for the coordinates).
+    first_rotation = next(rotations, None)
+    if first_rotation is None:
+        print(ts, "No spoke found in raw files.", "error in radar_scan_processing_L0")
+        return None
+    writer.accumulate(first_rotation)
 
-        if time_offset:# not None or 0
-            dt = np.timedelta64(time_offset * 60, 's')
-            dataset['time'].values = dataset['time'].values - dt
-            dataset['scan_time'].values = dataset['scan_time'].values - dt
+    with writer:
+        for rotation in rotations:
+            writer.append(rotation)
+            if rotation_callback is not None:
+                rotation_callback(rotation)
 
-    except ValueError as e:
-        print(ts, e, "error in radar_scan_processing_L0")
+    if writer.n_scan == 0:
+        print(ts, "No complete scan found in raw files.", "error in radar_scan_processing_L0")
         return None
 
-    # Removing the first scan as a precaution
-    dataset = dataset.isel(scan=slice(1, None))
+    print(f"{station} | {ts} | L0 Done")
 
-    # add metadata
-    dataset.attrs['lat'] = lat
-    dataset.attrs['lon'] = lon
-    dataset.attrs['processing'] = "piradar L0"
-    dataset.attrs['processing_date'] = datetime.datetime.now().date().isoformat()
+    return station, str(writer.time), save_path
 
-    ### OUTPUT TO NETCDF ###
+
+def make_L0_path(out_path: str, station: str, raw_files: list[str]) -> Path:
+    ts = Path(raw_files[0]).stem.split("_")[0]
     fname = "_".join([
         station,
         "L0",
         ts,
     ])
+    return Path(out_path).joinpath(f"{fname}.nc")
 
-    encoding = {'intensity': {'zlib':True, 'complevel': 9}}
-    save_path = Path(out_path).joinpath(f"{fname}.nc")
-    dataset.to_netcdf(save_path, engine="h5netcdf", encoding=encoding)
-
-    print(f"{station} | {ts} | L0 Done")
-
-    return station, str(dataset.time.values), save_path
-
-
-def load_raw_scans(raw_files: list[str]) -> dict[np.ndarray]:
-
-    data = {
-        "range": [],
-        "time": [],
-        "spoke_number": [],
-        "raw_azimuth": [],
-        "intensity": [],
-    }
 
+def iter_raw_frames(raw_files: list[str]) -> Iterator[np.ndarray]:
+    """Yield the frames (`FRAME_DTYPE` records) of the raw files, one memory mapped file at a time."""
     for raw_file in raw_files:
-        frames = load_raw_file(raw_file=raw_file, is4bits=False)
-
-        for frame in frames:
-            data['range'].append(frame['range'])
-            data['time'] += frame['time']
-            data['spoke_number'] += frame['spoke_number']
-            data['raw_azimuth'] += frame['raw_azimuth']
-            data['intensity'] += frame['intensity']
-
-    # Convert to numpy array with proper types.
-    data['spoke_number'] = np.array(data['spoke_number'], dtype=np.uint16)
-    data['raw_azimuth'] = np.array(data['raw_azimuth'], dtype=float)
-    data['intensity'] = np.array(data['intensity'], dtype=float)
-    data['time'] = np.array(data['time'], dtype='datetime64[s]')
-    data['range'] = np.array(data['range'], dtype=float) # may int ? FIXME
-
-    return data
+        with RawSweepFile(raw_file) as sweep:
+            yield from sweep.frames
+
+
+def detect_raw_azimuth_step(raw_azimuth: np.ndarray) -> int:
+    """Most frequent step between consecutive raw azimuths: 2 on HALO (2048 spokes per rotation)."""
+    steps = np.diff(raw_azimuth.astype(np.int64)) % N_RAW_AZIMUTHS
+    u_steps, c_steps = np.unique(steps[steps > 0], return_counts=True)
+    return int(u_steps[np.argmax(c_steps)]) if u_steps.size else 1
+
+
+def new_rotation(radar_range: float, raw_azimuth_step: int) -> dict:
+    n_azimuth = -(-N_RAW_AZIMUTHS // raw_azimuth_step)
+    return {
+        "range": radar_range,
+        "raw_azimuth_step": raw_azimuth_step,
+        "time": np.full(n_azimuth, np.datetime64("NaT"), dtype="datetime64[s]"),
+        "raw_azimuth": np.zeros(n_azimuth, dtype=np.int64),
+        "intensity": np.zeros((n_azimuth, 512), dtype=np.uint8),
+        "missing_spoke": np.ones(n_azimuth, dtype=bool),
+    }
 
 
-def fill_data_for_missing_spoke(data: dict[np.ndarray]):
+def assemble_rotations(frames: Iterable[np.ndarray]) -> Iterator[dict]:
     """
-    inplace modification
-    """
-
-    _diff = np.diff(data['spoke_number'])
-
-    idx = np.where((_diff != 1) & (_diff != -4095))[0]
-
-    n_missing = (_diff[idx] - 1) % 4096
-
-    u_raw_azimuth, c_raw_azimuth = np.unique(np.diff(data['raw_azimuth']), equal_nan=False, return_counts=True)
-    raw_azimuth_step = u_raw_azimuth[np.argmax(c_raw_azimuth)]
-
-    for i in reversed(range(len(idx))):
-        insert_index = idx[i] + 1
-
-        _missing_spoke_number = np.arange(n_missing[i]) + data['spoke_number'][idx[i]] + 1
-        _missing_spoke_number = _missing_spoke_number % 4096
-        data['spoke_number'] = np.insert(data['spoke_number'], insert_index, _missing_spoke_number)
-
-        _filled_azimuth = np.arange(n_missing[i]) * raw_azimuth_step + data['raw_azimuth'][idx[i]] + raw_azimuth_step
-        _filled_azimuth = _filled_azimuth % 4096
-
-        data['raw_azimuth'] = np.insert(data['raw_azimuth'], insert_index, _filled_azimuth)
+    Yield each rotation as soon as its last spoke is received, that is when the raw azimuth wraps around.
+    The last rotation, possibly incomplete, is yielded once `frames` is exhausted.
 
-        _nan_intensity = np.ones((n_missing[i], data['intensity'].shape[1])) * np.nan
-        data['intensity'] = np.insert(data['intensity'], insert_index, _nan_intensity, axis=0)
+    The spoke_number can't be used for this: on HALO it counts up to 4095 while a rotation is 2048 spokes
+    (raw azimuth step of 2).
 
-        _missing_time = np.ones(n_missing[i]) * np.nan
-        _missing_time = _missing_time.astype("datetime64[s]")
-        data['time'] = np.insert(data['time'], insert_index, _missing_time)
-
-
-def pad_data_for_incomplete_scan(data: dict):
+    Rotations are dict of (n_azimuth, ...) arrays indexed by raw_azimuth // raw_azimuth_step, the step being
+    detected on the first frame. See `new_rotation`.
+    """
+    rotation = None
+    raw_azimuth_step = None
+    last_raw_azimuth = None
 
-    _mod = data['spoke_number'].shape[0] % 4096
-    if _mod == 0:
-        return
+    for frame in frames:
+        raw_azimuth = frame['spokes']['angle'].astype(np.int64)
+        if raw_azimuth_step is None:
+            raw_azimuth_step = detect_raw_azimuth_step(raw_azimuth)
 
-    pad_length = 4096 - _mod
+        # Going back by more than half a turn is a wrap, not jitter.
+        _diff = np.diff(raw_azimuth, prepend=raw_azimuth[0] if last_raw_azimuth is None else last_raw_azimuth)
+        wraps = np.flatnonzero(_diff < -N_RAW_AZIMUTHS // 2)
+        last_raw_azimuth = raw_azimuth[-1]
 
-    u_raw_azimuth, c_raw_azimuth = np.unique(np.diff(data['raw_azimuth']), equal_nan=False, return_counts=True)
-    raw_azimuth_step = u_raw_azimuth[np.argmax(c_raw_azimuth)]
+        if rotation is None:
+            rotation = new_rotation(float(frame['header']['range']), raw_azimuth_step)
 
-    _missing_spoke_number = np.arange(pad_length) + data['spoke_number'][-1] + 1
-    _missing_spoke_number = _missing_spoke_number % 4096
-    data['spoke_number'] = np.append(data['spoke_number'], _missing_spoke_number)
+        for i, segment in enumerate(np.split(np.arange(raw_azimuth.size), wraps)):
+            if i > 0:  # segment starts with a wrap.
+                yield rotation
+                rotation = new_rotation(float(frame['header']['range']), raw_azimuth_step)
 
-    _filled_azimuth = np.arange(pad_length) * raw_azimuth_step + data['raw_azimuth'][-1] + raw_azimuth_step
-    _filled_azimuth = _filled_azimuth % 4096
-    data['raw_azimuth'] = np.append(data['raw_azimuth'], _filled_azimuth)
+            azimuth_index = raw_azimuth[segment] // raw_azimuth_step
+            rotation['intensity'][azimuth_index] = frame['spokes']['intensity'][segment]
+            rotation['raw_azimuth'][azimuth_index] = raw_azimuth[segment]
+            rotation['time'][azimuth_index] = np.datetime64(int(frame['header']['time']), 's')
+            rotation['missing_spoke'][azimuth_index] = False
 
-    _nan_intensity = np.ones((pad_length, data['intensity'].shape[1])) * np.nan
-    data['intensity'] = np.append(data['intensity'], _nan_intensity, axis=0)
+    if rotation is not None:
+        yield rotation
 
-    _missing_time = np.ones(pad_length) * np.nan
-    _missing_time = _missing_time.astype("datetime64[s]")
-    data['time'] = np.append(data['time'], _missing_time)
 
-    pass
+class L0ScanWriter:
+    """
+    Append rotations to a L0 NetCDF file along the (unlimited) `scan` dimension.
 
+    The file is created by xarray on the first `append`, the following rotations are written in place with h5netcdf.
+    `raw_azimuth` and `scan_time`, which depend on every rotation, are written on `close`. Rotations passed to
+    `accumulate` are only used for those coordinates.
+    """
 
-def correct_azimuth_misalignment(data: dict):
+    def __init__(self, path: str, ts: str, heading: float, lat: float, lon: float, time_offset: int = 0):
+        self.path = Path(path)
+        self.ts = ts
+        self.heading = heading
+        self.lat = lat
+        self.lon = lon
+        self.time_offset = np.timedelta64((time_offset or 0) * 60, 's')
+
+        self.n_scan = 0
+        self.time = None
+        self.radar_range = None
+
+        self._file: h5netcdf.File = None
+
+        self.raw_azimuth_step = None
+
+        self._time_sum: np.ndarray = None
+        self._time_count: np.ndarray = None
+        self._received_azimuth_index = []
+        self._received_raw_azimuth = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def accumulate(self, rotation: dict):
+        if self.radar_range is None:
+            self.radar_range = rotation['range']
+            self.raw_azimuth_step = rotation['raw_azimuth_step']
+            self._time_sum = np.zeros(rotation['missing_spoke'].size, dtype=np.float64)
+            self._time_count = np.zeros(rotation['missing_spoke'].size, dtype=np.int64)
+
+        received = ~rotation['missing_spoke']
+        self._time_sum[received] += rotation['time'][received].astype(np.int64)
+        self._time_count[received] += 1
+        self._received_azimuth_index.append(np.flatnonzero(received))
+        self._received_raw_azimuth.append(rotation['raw_azimuth'][received])
+
+    def append(self, rotation: dict):
+        self.accumulate(rotation)
+
+        if self._file is None:
+            self._create(rotation)
+        else:
+            self._file.resize_dimension('scan', self.n_scan + 1)
+            self._file['intensity'][self.n_scan] = rotation['intensity']
+            self._file['missing_spoke'][self.n_scan] = rotation['missing_spoke']
+
+        self.n_scan += 1
+
+    def _create(self, rotation: dict):
+        n_azimuth = rotation['missing_spoke'].size
+        cube = {
+            "range": [self.radar_range],
+            "raw_azimuth": np.arange(n_azimuth) * self.raw_azimuth_step,  # written on close.
+            "time": rotation['time'][np.newaxis],
+            "intensity": rotation['intensity'][np.newaxis],
+            "missing_spoke": rotation['missing_spoke'][np.newaxis],
+        }
+        dataset = make_scan_dataset(cube=cube, ts=self.ts, heading=self.heading)
 
-    spoke_number = data['spoke_number']
-    raw_azimuth = data['raw_azimuth']
+        dataset['time'].values = dataset['time'].values - self.time_offset
+        self.time = dataset.time.values
 
-    # Step 1: Detect cycle length
-    unique_X, counts = np.unique(spoke_number, return_counts=True)
+        # add metadata
+        dataset.attrs['lat'] = self.lat
+        dataset.attrs['lon'] = self.lon
+        dataset.attrs['processing'] = "piradar L0"
+        dataset.attrs['processing_date'] = datetime.datetime.now().date().isoformat()
 
-    if np.unique(counts).shape != (1,):
+        encoding = {
+            'intensity': {'zlib': True, 'complevel': 9, 'chunksizes': (1, n_azimuth, 512)},
+            'missing_spoke': {'zlib': True, 'complevel': 9, 'chunksizes': (1, n_azimuth)},
+            'scan_time': {**dataset['scan_time'].encoding, 'dtype': 'float64'},  # NaN for never received spokes.
+        }
+        dataset.to_netcdf(self.path, engine="h5netcdf", encoding=encoding, unlimited_dims=['scan'])
 
-        print(f"size: {spoke_number.shape}")
-        print(f"unique_count {np.unique(counts)}")
-        print(f"Nx: {counts.max()}, Lx: {spoke_number.shape[0] // np.unique(counts)}")
+        self._file = h5netcdf.File(self.path, 'a')
 
-        raise ValueError("Invalid dimensions. Scans don't have the same number of spokes.")
+    def close(self):
+        if self._file is None:
+            return
 
-    Nx = counts.max()
-    Lx = spoke_number.shape[0] // Nx
+        raw_azimuth_coord = compute_raw_azimuth_coord(
+            azimuth_index=np.concatenate(self._received_azimuth_index),
+            raw_azimuth=np.concatenate(self._received_raw_azimuth),
+            raw_azimuth_step=self.raw_azimuth_step,
+        )
+        self._file['raw_azimuth'][:] = raw_azimuth_coord.astype(np.uint16)
 
-    if spoke_number.shape[0] != Nx * Lx:
-        raise ValueError("Invalid dimensions. Scans don't have the same number of spokes.")
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scan_time = np.floor(self._time_sum / self._time_count)  # second resolution, like the datetime64[s] mean.
+        scan_time -= self.time_offset / np.timedelta64(1, 's')
+        self._file['scan_time'][:] = scan_time  # seconds since 1970-01-01
 
-    raw_azimuth_cycles = raw_azimuth.reshape(Nx, Lx)
+        self._file.close()
+        self._file = None
 
-    raw_azimuth_mode = sp.stats.mode(raw_azimuth_cycles, axis=0, keepdims=False).mode
 
-    raw_azimuth[:] = np.tile(raw_azimuth_mode, Nx).flatten()
+def compute_raw_azimuth_coord(azimuth_index: np.ndarray, raw_azimuth: np.ndarray, raw_azimuth_step: int) -> np.ndarray:
+    """
+    Most frequent raw azimuth of each azimuth index (the smallest one on ties). The raw azimuths of an index
+    are in [index * raw_azimuth_step, (index + 1) * raw_azimuth_step), so the coordinate has unique values.
 
+    Indexes that were never received get the most frequent offset from `index * raw_azimuth_step`.
+    """
+    n_azimuth = -(-N_RAW_AZIMUTHS // raw_azimuth_step)
 
-def make_dataset_volume(data: dict, ts, heading=0) -> xr.Dataset:
+    keys, counts = np.unique(azimuth_index * 2 ** 16 + raw_azimuth, return_counts=True)
+    key_azimuth_index, key_raw_azimuth = np.divmod(keys, 2 ** 16)
 
-    uniques, count = np.unique(data['raw_azimuth'], return_counts=True)
-    n_azimuth = len(uniques)
-    n_scan = count.max()
+    order = np.lexsort((-counts, key_azimuth_index))
+    received, first = np.unique(key_azimuth_index[order], return_index=True)
 
-    raw_azimuth_coord = data['raw_azimuth'][:n_azimuth]
+    u_offset, c_offset = np.unique(raw_azimuth % raw_azimuth_step, return_counts=True)
+    offset = u_offset[np.argmax(c_offset)] if u_offset.size else 0
 
-    intensity = data['intensity'].reshape((n_scan, n_azimuth, data['intensity'].shape[1]))
+    raw_azimuth_coord = np.arange(n_azimuth, dtype=np.int64) * raw_azimuth_step + offset
+    raw_azimuth_coord[received] = key_raw_azimuth[order][first]
 
-    # Set nan fill values to 0 for encoding.
-    intensity[~np.isfinite(intensity)] = 0
+    return raw_azimuth_coord
 
-    intensity = intensity.astype(np.uint8)
 
-    frame_time = data['time'].reshape((n_scan, n_azimuth))
+def make_scan_dataset(cube: dict, ts, heading=0) -> xr.Dataset:
 
     scan_time = xr.DataArray(
-        frame_time.astype('datetime64[s]'),
+        cube['time'].astype('datetime64[s]'),
         dims=["scan", 'azimuth']
     ).mean("scan")
 
     dataset = xr.Dataset(
         {
-            "intensity": (["scan", "raw_azimuth", "r_bins"], intensity),
+            "intensity": (["scan", "raw_azimuth", "r_bins"], cube['intensity']),
+            "missing_spoke": (["scan", "raw_azimuth"], cube['missing_spoke']),
             "scan_time": scan_time
         },
         coords={
-            "raw_azimuth": raw_azimuth_coord.astype("uint16"),
+            "raw_azimuth": cube['raw_azimuth'].astype("uint16"),
             "time": np.datetime64(f"{ts[:4]}-{ts[4:6]}-{ts[6:8]}T{ts[9:11]}:{ts[11:13]}:{ts[13:15]}", 's')
         },
         attrs={
-            "range": data['range'][0],
+            "range": cube['range'][0],
             'heading': heading,
         }
     )
-
     dataset['intensity'].encoding['dtype'] = "uint8"
 
+    dataset['missing_spoke'].attrs['description'] = "True where the spoke was not received. Intensity is set to 0."
+
     dataset['time'].attrs["standard_name"] = "time"
 
     dataset['time'].encoding['units'] = 'seconds since 1970-01-01 00:00:00'
@@ -1,3 +1,4 @@
+import csv
 import datetime
 
 import numpy as np
@@ -6,56 +7,109 @@ from pathlib import Path
 
 import xarray as xr
 
-from tools.coordinate_transform import xy_to_en
+from tools.grid_utils import GRID_DIR_NAME, get_lonlat_grid, reference_lonlat_grid
 
-from tools.pool_utils import starpool_function
+from tools.pool_utils import get_worker_pool
 
 from tools.unpack_utils import convert_raw_azimuth, compute_radius
 
-from tools.processing_utils import sel_file_by_time_slice
-
-
-def radar_processing_L1(station: str, L0_file_index: str, out_root_dir: str, start_time: str=None, end_time: str=None):
+from tools.processing_utils import (
+    load_index,
+    source_signature,
+    signature_matches,
+    read_index,
+    write_index,
+    write_columnar_index,
+)
+
+# n_sources, source_size and source_mtime_ns describe the L0 files of the hour (see `source_signature`).
+L1_INDEX_COLUMNS = [
+    'station', 'start_time', 'end_time', 'number_of_scan', 'path', 'hour', 'n_sources', 'source_size', 'source_mtime_ns'
+]
+
+
+def radar_processing_L1(
+        station: str,
+        L0_file_index: str,
+        out_root_dir: str,
+        start_time: str = None,
+        end_time: str = None,
+        incremental: bool = False,
+):
+        """
+
+        incremental:
+            Only the hours whose L0 files changed (number, size or mtime) since the existing L1 index was
+            written are processed. The other rows of the index are kept. An interrupted run is resumed by
+            running it again.
+        """
 
         # OUTPUT PATH
         L1_out_path = Path(out_root_dir).joinpath("L1")
         out_path = L1_out_path.joinpath(station)
         out_path.mkdir(parents=True, exist_ok=True)
+        L1_index_path = L1_out_path.joinpath(f'{station}_L1_index.csv')
 
         # Getting L0 files from L0 INDEX
-        L0_index_df = pd.read_csv(L0_file_index)
-        L0_index_df = sel_file_by_time_slice(dataframe=L0_index_df, start_time=start_time, end_time=end_time)
+        L0_index_df = load_index(L0_file_index, start_time=start_time, end_time=end_time)
+
+        previous_index = {}  # {hour: rows}
+        if incremental and L1_index_path.is_file():
+            previous_index_df = read_index(L1_index_path)
+            if 'hour' in previous_index_df:  # Indexes made before the incremental mode are remade.
+                for row in previous_index_df.to_dict('records'):
+                    previous_index.setdefault(str(row['hour']), []).append(row)
 
         # GROUPING L0 FILES BY HOURS
         L0_index_df['date'] = L0_index_df['timestamp'].dt.date
         L0_index_df['hour'] = L0_index_df['timestamp'].dt.hour
 
         hourly_L0_args_list = []
+        signatures = []
 
         for date, date_group in L0_index_df.groupby('date'):
             for hour, hour_group in date_group.groupby('hour'):
+                _hour = f"{date}T{hour:02}".replace('-', '')
+
+                signature = source_signature(hour_group)
+                previous_rows = previous_index.get(_hour)
+                if previous_rows and all(
+                        Path(row['path']).is_file()
+                        and signature_matches(row, signature)
+                        for row in previous_rows
+                ):
+                    continue  # up to date, its rows are kept.
+                previous_index.pop(_hour, None)
+
+                signatures.append(signature)
                 hourly_L0_args_list.append([
-                    f"{date}T{hour:02}".replace('-', ''),
+                    _hour,
                     hour_group['path'].values,
                     station,
                     out_path
                 ])
 
-        # POOLING THE PROCESSING OVER THE L0 HOURLY GROUPS
-        _L1_file_index_nested = starpool_function(
-            _radar_processing_L1,
-            hourly_L0_args_list
-        ) # List of List are returned making _L1_file_index_nested a List of List of List of Args. (3 layers)
+        if incremental:
+            print(f"{station} | L1: {len(hourly_L0_args_list)} hours to process, {len(previous_index)} hours kept")
 
-        # Unpacking to List of List of Args (2 layers | 2D array)
-        L1_file_index = []
-        for x in _L1_file_index_nested:
-            L1_file_index += x
+        # POOLING THE PROCESSING OVER THE L0 HOURLY GROUPS
+        # The rows are written as the hours are done, so the index of an interrupted run is still valid.
+        write_index(L1_index_path, L1_INDEX_COLUMNS, [row for rows in previous_index.values() for row in rows])
+        with open(L1_index_path, "a", newline="") as f:
+            index_writer = csv.writer(f)
 
-        # SAVING L1 INDEX FILES
-        df = pd.DataFrame(L1_file_index, columns=['station', 'start_time', 'end_time', 'number_of_scan', 'path'])
+            for task in get_worker_pool().imap_unordered(_radar_processing_L1, hourly_L0_args_list):
+                if not task.ok:
+                    print(f"{station} | L1 failed for {task.args[0]}:\n{task.error}")
+                    continue
+                for L1_index_metadata in task.result:  # one file per range.
+                    index_writer.writerow([*L1_index_metadata, task.args[0], *signatures[task.index].values()])
+                f.flush()
 
-        df.to_csv(L1_out_path.joinpath(f'{station}_L1_index.csv'), index=False)
+        # SAVING L1 INDEX FILES, sorted by time once done.
+        df = read_index(L1_index_path).sort_values('start_time')
+        write_index(L1_index_path, L1_INDEX_COLUMNS, df.to_dict('records'))
+        write_columnar_index(L1_index_path, df)
 
 
 def _radar_processing_L1(date, L0_files, station, out_path) -> xr.Dataset:
@@ -93,11 +147,13 @@ def _radar_processing_L1(date, L0_files, station, out_path) -> xr.Dataset:
 
         ds = ds.interpolate_na('azimuth')
 
-        ds = compute_lonlat_coordinates(ds)
+        _out_path = _out_paths[_range]
+
+        # The lon/lat grid is shared by the files of the same geometry: referenced, not stored in each file.
+        ds = reference_lonlat_grid(ds, grid_dir=out_path.parent.joinpath(GRID_DIR_NAME), path=_out_path)
 
         encoding = {"scan_mean": dict(zlib=True, complevel=9), "scan_std": dict(zlib=True, complevel=9)}
 
-        _out_path = _out_paths[_range]
         ds.to_netcdf(_out_path, engine="h5netcdf", encoding=encoding)
 
         L1_index_metadata.append(
@@ -159,26 +215,8 @@ def sort_by_azimuth(dataset: xr.Dataset) -> xr.Dataset:
     return dataset
 
 
-def compute_lonlat_coordinates(dataset: xr.Dataset) -> xr.Dataset:
-    azimuth = dataset['azimuth'] + np.deg2rad(dataset.attrs['heading'])
-
-    x_grid = dataset['radius'] * np.sin(azimuth)
-    y_grid = dataset['radius'] * np.cos(azimuth)
-
-    xy_grid = np.array([x_grid, y_grid]).T
-
-    origin_en = np.array([
-        dataset.attrs['lon'],
-        dataset.attrs['lat']
-    ])
-    en_grid = xy_to_en(points_xy=xy_grid, origin_en=origin_en)
-
-    lon_grid = en_grid[..., 0]
-    lat_grid = en_grid[..., 1]
-
-    dataset['lon'] = xr.DataArray(lon_grid, dims=('azimuth', "r_bins"))
-    dataset['lat'] = xr.DataArray(lat_grid, dims=('azimuth', "r_bins"))
-
-    return dataset.set_coords(['lon', 'lat'])
-
+def compute_lonlat_coordinates(dataset: xr.Dataset, grid_dir: str = None) -> xr.Dataset:
+    """Add the `lon` and `lat` (azimuth, r_bins) coordinates. The grid is cached (see `tools.grid_utils`)."""
+    grid, _ = get_lonlat_grid(dataset, grid_dir=grid_dir)
 
+    return dataset.assign_coords(lon=grid['lon'].variable, lat=grid['lat'].variable)
@@ -1,25 +1,158 @@
-import datetime
+import os
+import csv
+import time
+import struct
+import zipfile
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+from tools.pool_utils import get_worker_pool
+from tools.unpack_utils import read_raw_file_summary
 
-def make_raw_file_index(station, root_dir, out_dir):
-    file_index = []
 
-    for rf in Path(root_dir).rglob("*.raw"):
-        scan_ts = datetime.datetime.strptime(rf.stem.split("_")[0], "%Y%m%dT%H%M%S")
+RAW_INDEX_COLUMNS = [
+    'station', 'timestamp', 'path', 'size', 'mtime_ns', 'n_frames', 'first_time', 'last_time', 'dir_mtime_ns'
+]
+RAW_INDEX_DTYPES = {'size': 'Int64', 'mtime_ns': 'Int64', 'n_frames': 'Int64', 'dir_mtime_ns': 'Int64'}
 
-        file_index.append([station, scan_ts, rf])
+# A directory is only trusted by an incremental rescan if its files were last modified this long before the
+# previous index was written: a file still being recorded grows without changing the directory mtime.
+RESCAN_SETTLE_TIME = 600  # seconds
 
-    df = pd.DataFrame(file_index, columns=['station', 'timestamp', 'path'])
 
-    df.to_csv(Path(out_dir).joinpath(f'{station}_raw_index.csv'), index=False)
+def _scan_directory(path: str) -> tuple[list[tuple[str, int]], list[tuple[str, str, int, int]]]:
+    """Subdirectories (path, mtime_ns) and `.raw` files (path, name, size, mtime_ns) of a directory."""
+    subdirs, raw_files = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                subdirs.append((entry.path, entry.stat().st_mtime_ns))
+            elif entry.name.endswith(".raw") and entry.is_file():
+                stat = entry.stat()
+                raw_files.append((entry.path, entry.name, stat.st_size, stat.st_mtime_ns))
+    return subdirs, raw_files
 
 
-def load_raw_file_index(path) -> pd.DataFrame:
+def _read_previous_raw_index(index_path: Path) -> tuple[dict[str, pd.DataFrame], dict[str, dict]]:
+    """Rows of the previous index of the directories that can be kept as is, and the rows of every file by path."""
+    if not index_path.is_file():
+        return {}, {}
+    dataframe = pd.read_csv(index_path, dtype=RAW_INDEX_DTYPES)
+    if not set(RAW_INDEX_COLUMNS).issubset(dataframe.columns):  # index made by a previous version: remade.
+        return {}, {}
+
+    settled_ns = os.stat(index_path).st_mtime_ns - RESCAN_SETTLE_TIME * 10 ** 9
+    dataframe['dir'] = dataframe['path'].map(os.path.dirname)
+
+    settled_dirs = {}
+    for _dir, group in dataframe.groupby('dir'):
+        if group['mtime_ns'].max() < settled_ns:
+            settled_dirs[_dir] = group.drop(columns='dir')
+    files = {row['path']: row for row in dataframe.drop(columns='dir').to_dict('records')}
+
+    return settled_dirs, files
+
+
+def make_raw_file_index(station, root_dir, out_dir, incremental: bool = False, n_workers: int = None):
+    """
+    Index of the `.raw` files of `root_dir` (recursive): `{out_dir}/{station}_raw_index.csv`.
+
+    The directories are listed with `os.scandir` and the files summarized (size, mtime, number of frames and
+    time of the first and last frames) by a pool of threads, which hides the latency of a network share.
+
+    incremental:
+        Update the existing index. The directories (e.g. the day/hour directories of the writer) whose mtime
+        didn't change are not listed, their rows are kept. In the other directories, only the files whose size
+        or mtime changed are read. The directories holding raw files are assumed to have no subdirectories.
+    """
+    index_path = Path(out_dir).joinpath(f'{station}_raw_index.csv')
+    t0 = time.perf_counter()
+
+    settled_dirs, previous_files = _read_previous_raw_index(index_path) if incremental else ({}, {})
+
+    worker_pool = get_worker_pool(n_workers, kind="thread")
+
+    # WALKING THE DIRECTORIES, one level at a time.
+    kept_rows = []
+    raw_files = []  # (path, name, size, mtime_ns, dir_mtime_ns)
+    n_listed = 0
+    directories = [(str(root_dir), os.stat(root_dir).st_mtime_ns)]
+    while directories:
+        to_list = []
+        for _dir, dir_mtime_ns in directories:
+            previous_rows = settled_dirs.get(_dir)
+            if previous_rows is not None and (previous_rows['dir_mtime_ns'] == dir_mtime_ns).all():
+                kept_rows.append(previous_rows)
+            else:
+                to_list.append((_dir, dir_mtime_ns))
+
+        directories = []
+        for task in worker_pool.imap_unordered(_scan_directory, [(_dir,) for _dir, _ in to_list]):
+            if not task.ok:
+                print(f"{station} | Failed to list {task.args[0]}:\n{task.error}")
+                continue
+            subdirs, files = task.result
+            directories += subdirs
+            raw_files += [(*file, to_list[task.index][1]) for file in files]
+        n_listed += len(to_list)
+
+    dataframe = pd.DataFrame(raw_files, columns=['path', 'name', 'size', 'mtime_ns', 'dir_mtime_ns'])
+    dataframe['station'] = station
+
+    # Scan timestamps from the file names ("%Y%m%dT%H%M%S_s00.raw").
+    dataframe['timestamp'] = pd.to_datetime(
+        dataframe['name'].str.split("_").str[0], format="%Y%m%dT%H%M%S", errors="coerce"
+    )
+    invalid_names = dataframe['timestamp'].isna()
+    if invalid_names.any():
+        print(f"{station} | {invalid_names.sum()} files without a timestamp in their name are not indexed.")
+        dataframe = dataframe[~invalid_names].reset_index(drop=True)
+
+    # SUMMARIZING THE NEW AND MODIFIED FILES
+    summaries = [{'n_frames': None, 'first_time': None, 'last_time': None} for _ in range(len(dataframe))]
+    to_read = []
+    for i, (path, size, mtime_ns) in enumerate(zip(dataframe['path'], dataframe['size'], dataframe['mtime_ns'])):
+        previous_row = previous_files.get(path)
+        if (
+                previous_row is not None
+                and (previous_row['size'], previous_row['mtime_ns']) == (size, mtime_ns)
+                and pd.notna(previous_row['n_frames'])  # not read by the previous scan.
+        ):
+            summaries[i] = {key: previous_row[key] for key in summaries[i]}
+        else:
+            to_read.append(i)
+
+    for task in worker_pool.imap_unordered(read_raw_file_summary, [(dataframe['path'][i],) for i in to_read]):
+        if not task.ok:
+            print(f"{station} | Failed to read {task.args[0]}:\n{task.error}")
+            continue
+        summaries[to_read[task.index]] = task.result
+
+    for column in ['n_frames', 'first_time', 'last_time']:
+        dataframe[column] = [summary[column] for summary in summaries]
+
+    dataframe = pd.concat([dataframe[RAW_INDEX_COLUMNS], *kept_rows], ignore_index=True)
+    for column in ['timestamp', 'first_time', 'last_time']:
+        dataframe[column] = pd.to_datetime(dataframe[column])
+    dataframe = dataframe.astype(RAW_INDEX_DTYPES).sort_values(['timestamp', 'path'])
+
+    # SAVING, atomically: the previous index is kept if this is interrupted.
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    dataframe.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+    write_columnar_index(index_path, dataframe)
+
+    print(
+        f"{station} | raw index: {len(dataframe)} files, {n_listed} directories listed, "
+        f"{len(kept_rows)} directories kept, {len(to_read)} files read in {time.perf_counter() - t0:.1f} s"
+    )
+
+
+def load_raw_file_index(path, start_time: str = None, end_time: str = None) -> pd.DataFrame:
     required_cols = ["station", "timestamp", "path"]
 
-    dataframe = pd.read_csv(path)
+    dataframe = load_index(path, start_time=start_time, end_time=end_time)
 
     for col in required_cols:
         if not col in dataframe:
@@ -27,31 +160,251 @@ def load_raw_file_index(path) -> pd.DataFrame:
     return dataframe
 
 
+def source_signature(group: pd.DataFrame) -> dict[str, int]:
+    """
+    Number of files, total size and latest mtime (ns) of the files of an index group. Used to detect the
+    sources that changed since an output was made. The `size` and `mtime_ns` columns are used if the
+    index has them, otherwise the files are stat'ed (missing files count as empty).
+    """
+    if 'size' in group and 'mtime_ns' in group:
+        sizes, mtimes = group['size'].to_numpy(), group['mtime_ns'].to_numpy()
+    else:
+        sizes, mtimes = [], []
+        for path in group['path']:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            sizes.append(stat.st_size)
+            mtimes.append(stat.st_mtime_ns)
+
+    return {
+        'n_sources': len(group),
+        'source_size': int(sum(sizes)),
+        'source_mtime_ns': int(max(mtimes, default=0)),
+    }
+
+
+def signature_matches(row: dict, signature: dict[str, int]) -> bool:
+    """
+    True if the index `row` was made from the sources of `signature`. Missing or empty (NA) signature
+    cells, e.g. rows of an index made before the signatures were recorded, count as changed.
+    """
+    for column, value in signature.items():
+        previous_value = row.get(column)
+        if previous_value is None or pd.isna(previous_value) or previous_value != value:
+            return False
+    return True
+
+
+SIGNATURE_DTYPES = {'n_sources': 'Int64', 'source_size': 'Int64', 'source_mtime_ns': 'Int64'}
+
+
+def read_index(path) -> pd.DataFrame:
+    """L0/L1 index, with the source signature columns (if any) read as exact integers."""
+    return pd.read_csv(path, dtype=SIGNATURE_DTYPES)
+
+
+def write_index(path, columns: list[str], rows):
+    """Header and rows (dicts), atomically: the previous index is kept if this is interrupted."""
+    tmp_path = Path(path).with_name(Path(path).name + ".tmp")
+    with open(tmp_path, "w", newline="") as f:
+        index_writer = csv.writer(f)
+        index_writer.writerow(columns)
+        for row in rows:
+            index_writer.writerow([row.get(column) for column in columns])
+    os.replace(tmp_path, path)
+
+
+def _as_datetime(values: pd.Series) -> pd.Series:
+    return values if pd.api.types.is_datetime64_dtype(values) else values.astype("datetime64[s]")
+
+
+def _time_slice(
+        times: np.ndarray, start_time: str = None, end_time: str = None, end_times: np.ndarray = None
+) -> tuple[slice, np.ndarray | None]:
+    """
+    Rows of `times` (sorted, datetime64) in [start_time, end_time], found by binary search.
+
+    With `end_times` (e.g. files spanning [times, end_times]), the rows overlapping [start_time, end_time]. Since
+    `end_times` isn't necessarily sorted, the slice is found with its running maximum and `mask` selects the
+    rows of the slice that do overlap (None if they all do).
+
+    The slice is never reversed (start > stop), e.g. if start_time > end_time: no row is selected.
+    """
+    start = np.datetime64(pd.Timestamp(start_time)) if start_time is not None else None
+    end = np.datetime64(pd.Timestamp(end_time)) if end_time is not None else None
+
+    stop = np.searchsorted(times, end, side='right') if end is not None else len(times)
+    if start is not None and end is not None and start > end:
+        return slice(stop, stop), None
+    if start is None:
+        return slice(0, stop), None
+    if end_times is None:
+        _start = np.searchsorted(times, start, side='left')
+        return slice(_start, max(_start, stop)), None
+
+    end_times_max = np.maximum.accumulate(end_times.astype("datetime64[ns]").view(np.int64))
+    _start = np.searchsorted(end_times_max, start.astype("datetime64[ns]").view(np.int64), side='left')
+    _slice = slice(_start, max(_start, stop))
+    mask = end_times[_slice] >= start
+    return _slice, None if mask.all() else mask
+
+
 def sel_file_by_time_slice(dataframe: pd.DataFrame, start_time: str = None, end_time: str = None) -> pd.DataFrame:
 
     if "timestamp" in dataframe:
-        dataframe['timestamp'] = dataframe['timestamp'].astype("datetime64[s]")
-        dataframe = dataframe[
-            dataframe['timestamp'].between(
-                start_time or dataframe['timestamp'].min(), end_time or dataframe['timestamp'].max()
-            )
-        ]
+        dataframe['timestamp'] = _as_datetime(dataframe['timestamp'])
+        if not dataframe['timestamp'].is_monotonic_increasing:
+            dataframe = dataframe.sort_values('timestamp', kind='stable')
+        _slice, mask = _time_slice(dataframe['timestamp'].to_numpy(), start_time, end_time)
     elif "start_time" in dataframe and 'end_time' in dataframe:
-        dataframe['start_time'] = dataframe['start_time'].astype("datetime64[s]")
-        dataframe['end_time'] = dataframe['end_time'].astype("datetime64[s]")
-        dataframe = dataframe[
-            ((start_time or dataframe['start_time'].min()) <= dataframe['end_time'])
-            &
-            ((end_time or dataframe['end_time'].max()) >= dataframe['start_time'])
-        ]
+        dataframe['start_time'] = _as_datetime(dataframe['start_time'])
+        dataframe['end_time'] = _as_datetime(dataframe['end_time'])
+        if not dataframe['start_time'].is_monotonic_increasing:
+            dataframe = dataframe.sort_values('start_time', kind='stable')
+        _slice, mask = _time_slice(
+            dataframe['start_time'].to_numpy(), start_time, end_time, end_times=dataframe['end_time'].to_numpy()
+        )
     else:
         raise ValueError("`timestamps` or `start_time` and `end_time` are required to slice.")
 
+    dataframe = dataframe.iloc[_slice]
+    if mask is not None:
+        dataframe = dataframe[mask]
+
     if dataframe.empty:
         raise ValueError("No values exist for the given start_time and end_time")
 
     return dataframe.reset_index()
 
+
+### Columnar indexes
+# Each index (`.csv`) is also saved as a `.npz`, sorted by time: the time columns as datetime64[ns], the text columns
+# as a UTF-8 blob and offsets. A time range is then found by binary search and only its rows are decoded.
+TIME_COLUMNS = ['timestamp', 'start_time', 'end_time', 'first_time', 'last_time']
+
+ZIP_LOCAL_HEADER_SIZE = 30  # fixed part, followed by the file name and extra field.
+
+
+def columnar_index_path(path) -> Path:
+    return Path(path).with_suffix(".npz")
+
+
+def write_columnar_index(path, dataframe: pd.DataFrame):
+    """Save the index `dataframe` as the `.npz` of the index `path`, atomically."""
+    dataframe = dataframe.copy()
+    for column in TIME_COLUMNS:
+        if column in dataframe:
+            dataframe[column] = pd.to_datetime(dataframe[column], format="ISO8601").astype("datetime64[ns]")
+    sort_column = 'timestamp' if 'timestamp' in dataframe else 'start_time'
+    dataframe = dataframe.sort_values(sort_column, kind='stable')
+
+    arrays = {'__columns__': np.array([str(column) for column in dataframe.columns])}
+    for column in dataframe.columns:
+        values = dataframe[column]
+        if column in TIME_COLUMNS:
+            arrays[column] = values.to_numpy("datetime64[ns]")
+        elif pd.api.types.is_integer_dtype(values):
+            arrays[column] = values.to_numpy("int64", na_value=0)
+            if values.isna().any():
+                arrays[f"{column}__na"] = values.isna().to_numpy()
+        elif pd.api.types.is_float_dtype(values) or pd.api.types.is_bool_dtype(values):
+            arrays[column] = values.to_numpy()
+        else:
+            encoded = [str(value).encode() for value in values]
+            arrays[f"{column}__offsets"] = np.concatenate([[0], np.cumsum([len(value) for value in encoded])])
+            arrays[f"{column}__blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    npz_path = columnar_index_path(path)
+    tmp_path = npz_path.with_name(npz_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, npz_path)
+
+
+def _mmap_npz(npz_path: Path) -> dict[str, np.ndarray]:
+    """
+    Arrays of an uncompressed `.npz` (`np.savez`), memory mapped: reading a slice only reads its pages, instead of
+    the whole array as `np.load` does.
+    """
+    arrays = {}
+    with zipfile.ZipFile(npz_path) as archive, open(npz_path, "rb") as f:
+        for info in archive.infolist():
+            f.seek(info.header_offset)
+            name_size, extra_size = struct.unpack("<HH", f.read(ZIP_LOCAL_HEADER_SIZE)[-4:])
+            f.seek(info.header_offset + ZIP_LOCAL_HEADER_SIZE + name_size + extra_size)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            name = info.filename.removesuffix(".npy")
+            if dtype.itemsize * int(np.prod(shape)) == 0:  # empty arrays cannot be mapped.
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(
+                    npz_path, dtype=dtype, mode="r", offset=f.tell(), shape=shape, order="F" if fortran_order else "C"
+                )
+    return arrays
+
+
+def _read_columnar_index(npz_path: Path, start_time: str = None, end_time: str = None) -> pd.DataFrame:
+    npz = _mmap_npz(npz_path)
+    columns = [str(column) for column in npz['__columns__']]
+
+    if 'timestamp' in columns:
+        _slice, mask = _time_slice(npz['timestamp'], start_time, end_time)
+    else:
+        _slice, mask = _time_slice(npz['start_time'], start_time, end_time, end_times=npz['end_time'])
+
+    # Copies of the rows, so the file isn't kept mapped (it couldn't be replaced on Windows).
+    data = {}
+    for column in columns:
+        if f"{column}__blob" in npz:
+            offsets = np.array(npz[f"{column}__offsets"][_slice.start: _slice.stop + 1])
+            blob = npz[f"{column}__blob"][offsets[0]: offsets[-1]].tobytes()
+            offsets = offsets - offsets[0]
+            data[column] = [blob[i0:i1].decode() for i0, i1 in zip(offsets[:-1], offsets[1:])]
+        elif f"{column}__na" in npz:
+            data[column] = pd.arrays.IntegerArray(np.array(npz[column][_slice]), np.array(npz[f"{column}__na"][_slice]))
+        else:
+            data[column] = np.array(npz[column][_slice])
+    del npz
+
+    dataframe = pd.DataFrame(data, columns=columns)
+    if mask is not None:
+        dataframe = dataframe[mask].reset_index(drop=True)
+    return dataframe
+
+
+def load_index(path, start_time: str = None, end_time: str = None) -> pd.DataFrame:
+    """
+    Rows of the raw, L0 or L1 index `path` (`.csv`) in [start_time, end_time], sorted by time.
+
+    Read from the `.npz` of the index, which is (re)made from the `.csv` if missing or older.
+    """
+    path = Path(path)
+    npz_path = columnar_index_path(path)
+
+    if not npz_path.is_file() or (path.is_file() and os.stat(path).st_mtime_ns > os.stat(npz_path).st_mtime_ns):
+        dataframe = pd.read_csv(path, dtype={**RAW_INDEX_DTYPES, **SIGNATURE_DTYPES})
+        try:
+            write_columnar_index(path, dataframe)
+        except OSError as e:  # e.g. read-only share.
+            print(f"Failed to write the columnar index of {path}: {e}")
+            return sel_file_by_time_slice(dataframe, start_time=start_time, end_time=end_time)
+
+    dataframe = _read_columnar_index(npz_path, start_time=start_time, end_time=end_time)
+
+    if dataframe.empty:
+        raise ValueError("No values exist for the given start_time and end_time")
+
+    return dataframe
+
+
 if __name__ == "__main__":
     root_path = Path(r"\\nas4\DATA\measurements\radars\2025-10-14_IML-2025-053_PPO_Perley\IR\data")
 
@@ -66,5 +419,6 @@ if __name__ == "__main__":
         make_raw_file_index(
             station=station,
             root_dir=root_dirs[station],
-            out_dir=r"E:\OPP\ppo-qmm_analyses\data\radar_2025-10-14"
+            out_dir=r"E:\OPP\ppo-qmm_analyses\data\radar_2025-10-14",
+            incremental=True,
         )
\ No newline at end of file
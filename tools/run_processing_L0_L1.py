@@ -29,7 +29,8 @@ if __name__ == "__main__":
             heading=metadata['heading'],
             lat=metadata['lat'],
             lon=metadata['lon'],
-            time_offset=metadata['time_offset']
+            time_offset=metadata['time_offset'],
+            incremental=True,
         )
 
     for station in stations_metadata.keys():
@@ -44,4 +45,5 @@ if __name__ == "__main__":
             station=station,
             L0_file_index=L0_file_index,
             out_root_dir=root_path,
+            incremental=True,
         )
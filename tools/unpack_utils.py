@@ -1,3 +1,5 @@
+import os
+import mmap
 import datetime
 import struct
 import numpy as np
@@ -12,46 +14,214 @@ SPOKE_DATA_FORMAT = "<HH512B"
 SPOKE_DATA_SIZE = struct.calcsize(SPOKE_DATA_FORMAT)
 
 
-def load_raw_file(raw_file: str, is4bits: bool):
-    frames = []
-    with open(raw_file, "rb") as f:
-        while f.read(1):
-            f.seek(-1, 1)
+SPOKES_PER_FRAME = 32
+FRAME_SIZE = len(FRAME_DELIMITER) + FRAME_HEADER_SIZE + len(SPOKE_DATA_DELIMITER) + SPOKES_PER_FRAME * SPOKE_DATA_SIZE
+
+# Numpy equivalent of FRAME_HEADER_FORMAT and SPOKE_DATA_FORMAT (packed, little endian).
+FRAME_HEADER_DTYPE = np.dtype([
+    ("time", "<u4"),
+    ("number_of_spokes", "u1"),
+    ("range", "<u2"),
+    ("heading", "<u2"),
+    ("gain", "<u2"),
+])
+SPOKE_DATA_DTYPE = np.dtype([
+    ("spoke_number", "<u2"),
+    ("angle", "<u2"),
+    ("intensity", "u1", (512,)),
+])
+FRAME_DTYPE = np.dtype([
+    ("frame_delimiter", "S2"),
+    ("header", FRAME_HEADER_DTYPE),
+    ("spoke_delimiter", "S2"),
+    ("spokes", SPOKE_DATA_DTYPE, (SPOKES_PER_FRAME,)),
+])
+
+
+def find_frame_offsets(buffer: bytes) -> np.ndarray:
+    """Return the byte offset of every complete frame in `buffer`.
+
+    Frames are walked one after the other (a frame is `FRAME_SIZE` bytes long). If the bytes at the expected
+    position are not a `FH ... SD` frame, the next `FH` delimiter is searched for, so garbage or truncated frames
+    are skipped without looking for delimiters inside the spokes data.
+    """
+    offsets = []
+    size = len(buffer)
+    sd_offset = len(FRAME_DELIMITER) + FRAME_HEADER_SIZE
+    sd_size = len(SPOKE_DATA_DELIMITER)
+
+    pointer = buffer.find(FRAME_DELIMITER)
+    while 0 <= pointer and pointer + FRAME_SIZE <= size:
+        if buffer[pointer + sd_offset: pointer + sd_offset + sd_size] == SPOKE_DATA_DELIMITER:
+            offsets.append(pointer)
+            pointer += FRAME_SIZE
+            if buffer[pointer: pointer + len(FRAME_DELIMITER)] == FRAME_DELIMITER:
+                continue
+        pointer = buffer.find(FRAME_DELIMITER, pointer + 1)
+
+    return np.array(offsets, dtype=np.int64)
+
+
+def decode_frames(buffer: bytes, offsets: np.ndarray = None) -> np.ndarray:
+    """View the frames of `buffer` as a `FRAME_DTYPE` array. No copy is made if the frames are contiguous."""
+    if offsets is None:
+        offsets = find_frame_offsets(buffer)
+
+    if offsets.size == 0:
+        return np.empty(0, dtype=FRAME_DTYPE)
+
+    if np.all(offsets == offsets[0] + np.arange(offsets.size) * FRAME_SIZE):
+        return np.frombuffer(buffer, dtype=FRAME_DTYPE, count=offsets.size, offset=int(offsets[0]))
+
+    return np.concatenate([np.frombuffer(buffer, dtype=FRAME_DTYPE, count=1, offset=int(o)) for o in offsets])
+
+
+class RawSweepFile:
+    """Read-only, memory mapped `.raw` sweep file.
+
+    The frame offsets are computed once on open. Frames are then `FRAME_DTYPE` views of the mapped file; data is only
+    copied when a per spoke array is requested.
+
+    The mapping is closed by `close()` (or on `with` exit) unless views of it are still alive, in which case it is
+    released when the last view is garbage collected.
+    """
+
+    def __init__(self, raw_file: str):
+        self.path = raw_file
+        self._mmap = None
+
+        with open(raw_file, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:  # empty files cannot be mapped.
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        buffer = self._mmap if self._mmap is not None else b""
+
+        self.offsets = find_frame_offsets(buffer)
+        self.frames = decode_frames(buffer, self.offsets)
+        self.frames.flags.writeable = False  # frames are copied when offsets are not contiguous.
 
-            if f.read(2) == FRAME_DELIMITER:
-                raw_header = f.read(FRAME_HEADER_SIZE)
-                try:
-                    unpacked_header = struct.unpack(FRAME_HEADER_FORMAT, raw_header)
-                except struct.error:
-                    print("Error unpacking header", f.tell(), len(raw_header), raw_header, raw_file)
+    def __enter__(self):
+        return self
 
-                unpacked_frame = {
-                    "range": unpacked_header[2],
-                    "time": datetime.datetime.fromtimestamp(unpacked_header[0], datetime.UTC).strftime(
-                        "%Y-%m-%dT%H:%M:%S"),
-                    "spoke_number": [],
-                    "raw_azimuth": [],
-                    "intensity": []
-                }
+    def __exit__(self, *args):
+        self.close()
 
-                if f.read(2) == SPOKE_DATA_DELIMITER:
-                    for i in range(32):
-                        _raw_spoke = f.read(SPOKE_DATA_SIZE)
-                        unpacked_spoke = struct.unpack(SPOKE_DATA_FORMAT, _raw_spoke)
+    def close(self):
+        self.frames = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
 
-                        unpacked_frame["spoke_number"].append(unpacked_spoke[0])
-                        unpacked_frame["raw_azimuth"].append(unpacked_spoke[1])
+    @property
+    def n_frames(self) -> int:
+        return self.frames.size
+
+    @property
+    def n_spokes(self) -> int:
+        return self.frames.size * SPOKES_PER_FRAME
+
+    @property
+    def intensity(self) -> np.ndarray:
+        """Read-only (n_frames, 32, 512) uint8 view of the spokes intensity.
+
+        Flattening to (n_spokes, 512) requires a copy since the frames headers sit between each block of 32 spokes.
+        """
+        return self.frames['spokes']['intensity']
+
+    @property
+    def range(self) -> np.ndarray:
+        """(n_frames,) uint16"""
+        return np.ascontiguousarray(self.frames['header']['range'])
+
+    @property
+    def time(self) -> np.ndarray:
+        """(n_spokes,) datetime64[s]"""
+        return np.repeat(self.frames['header']['time'].astype("datetime64[s]"), SPOKES_PER_FRAME)
+
+    @property
+    def spoke_number(self) -> np.ndarray:
+        """(n_spokes,) uint16"""
+        return np.ascontiguousarray(self.frames['spokes']['spoke_number'].reshape(self.n_spokes))
+
+    @property
+    def raw_azimuth(self) -> np.ndarray:
+        """(n_spokes,) uint16"""
+        return np.ascontiguousarray(self.frames['spokes']['angle'].reshape(self.n_spokes))
+
+    def to_arrays(self, is4bits: bool) -> dict[np.ndarray]:
+        intensity = np.ascontiguousarray(self.intensity.reshape(self.n_spokes, self.intensity.shape[-1]))
+        if is4bits:
+            intensity = unpack_4bit_gray_scale(intensity)
+
+        return {
+            "range": self.range,
+            "time": self.time,
+            "spoke_number": self.spoke_number,
+            "raw_azimuth": self.raw_azimuth,
+            "intensity": intensity,
+        }
+
+
+def load_raw_file(raw_file: str, is4bits: bool) -> dict[np.ndarray]:
+    """Decode a `.raw` sweep file.
+
+    Returns
+    -------
+    dict of arrays:
+        range: (n_frames,) uint16
+        time: (n_spokes,) datetime64[s]
+        spoke_number: (n_spokes,) uint16
+        raw_azimuth: (n_spokes,) uint16
+        intensity: (n_spokes, 512) uint8, or (n_spokes, 1024) if is4bits.
+    """
+    with RawSweepFile(raw_file) as sweep:
+        return sweep.to_arrays(is4bits=is4bits)
+
+
+def _is_frame(buffer: bytes) -> bool:
+    sd_offset = len(FRAME_DELIMITER) + FRAME_HEADER_SIZE
+    return (
+        len(buffer) == FRAME_SIZE
+        and buffer[:len(FRAME_DELIMITER)] == FRAME_DELIMITER
+        and buffer[sd_offset: sd_offset + len(SPOKE_DATA_DELIMITER)] == SPOKE_DATA_DELIMITER
+    )
+
+
+def read_raw_file_summary(raw_file: str) -> dict:
+    """Number of frames and time of the first and last frames of a `.raw` sweep file.
+
+    Only the first and last frames are read when the file is a whole number of frames starting and ending
+    with a frame, which is what the writer produces. Other files (garbage, truncated or short frames) are
+    fully scanned.
+
+    Returns
+    -------
+    dict:
+        n_frames: int
+        first_time, last_time: datetime64[s], NaT if there is no frame.
+    """
+    with open(raw_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        first_frame = f.read(FRAME_SIZE)
+        f.seek(max(size - FRAME_SIZE, 0))
+        last_frame = f.read(FRAME_SIZE)
 
-                        if is4bits:
-                            unpacked_frame["intensity"].append(unpack_4bit_gray_scale(unpacked_spoke[2:]))
-                        else:
-                            unpacked_frame["intensity"].append(unpacked_spoke[2:])
+    if size and size % FRAME_SIZE == 0 and _is_frame(first_frame) and _is_frame(last_frame):
+        n_frames = size // FRAME_SIZE
+        times = decode_frames(first_frame + last_frame, np.array([0, FRAME_SIZE]))['header']['time']
+    else:
+        with RawSweepFile(raw_file) as sweep:
+            n_frames = sweep.n_frames
+            times = sweep.frames['header']['time'][[0, -1]].copy() if n_frames else None
 
-                time = datetime.datetime.fromtimestamp(unpacked_header[0], datetime.UTC).strftime("%Y-%m-%dT%H:%M:%S")
-                unpacked_frame["time"] = 32 * [time]
+    if times is None:
+        return {"n_frames": 0, "first_time": np.datetime64("NaT", "s"), "last_time": np.datetime64("NaT", "s")}
 
-                frames.append(unpacked_frame)
-    return frames
+    times = times.astype("datetime64[s]")
+    return {"n_frames": int(n_frames), "first_time": times[0], "last_time": times[-1]}
 
 
 def unpack_raw_frame(raw_frame, is4bits=True) -> dict[int]:
@@ -86,13 +256,13 @@ def unpack_raw_frame(raw_frame, is4bits=True) -> dict[int]:
     return unpacked_frame
 
 
-def unpack_4bit_gray_scale(data: bytes):
-    data_4bit = []
-    for _bytes in data:
-        low_nibble = _bytes & 0x0F
-        high_nibble = (_bytes >> 4) & 0x0F
+def unpack_4bit_gray_scale(data: np.ndarray) -> np.ndarray:
+    """Split each byte in (high nibble, low nibble). The last dimension is doubled."""
+    data = np.asarray(data, dtype=np.uint8)
 
-        data_4bit.extend([high_nibble, low_nibble])
+    data_4bit = np.empty(data.shape[:-1] + (2 * data.shape[-1],), dtype=np.uint8)
+    data_4bit[..., 0::2] = data >> 4
+    data_4bit[..., 1::2] = data & 0x0F
 
     return data_4bit
 